@@ -124,6 +124,56 @@ def eps_for_Model(Model, n_node, time_limit=0.5):
 
 # }}}
 
+# simulator {{{
+
+def connectivity_for_n_node(n_node):
+    from tvb.datatypes.connectivity import Connectivity
+    try:
+        conn = Connectivity.from_file('connectivity_%d.zip' % (n_node, ))
+    except Exception:
+        # surrogate with 10 % density and tract lengths up to 150 mm
+        rng = numpy.random.RandomState(42)
+        weights = rng.uniform(size=(n_node, n_node)) * (rng.uniform(size=(n_node, n_node)) < 0.1)
+        tract_lengths = rng.uniform(5.0, 150.0, size=(n_node, n_node))
+        conn = Connectivity(weights=weights, tract_lengths=tract_lengths,
+                            centres=rng.randn(n_node, 3))
+    conn.speed = numpy.r_[3.0]
+    return conn
+
+def sps_for_Simulator(n_node, use_numba, time_limit=2.0):
+    from tvb.simulator import simulator, coupling, integrators, monitors
+    sim = simulator.Simulator(connectivity=connectivity_for_n_node(n_node),
+                              coupling=coupling.Linear(a=numpy.r_[1e-3], use_numba=use_numba),
+                              integrator=integrators.HeunDeterministic(dt=0.1),
+                              monitors=(monitors.TemporalAverage(period=1.0), ))
+    sim.configure()
+    # throw one away in case of initialization
+    sim.run(simulation_length=10.0)
+    # start timing
+    tic = time.time()
+    n_step = 0
+    while (time.time() - tic) < time_limit:
+        sim.run(simulation_length=100.0)
+        n_step += 1000
+    toc = time.time()
+    return n_step / (toc - tic)
+
+def sps_report_for_simulator(n_nodes=(76, 192, 998), use_numbas=(False, True)):
+    sys.stdout.write('%30s' % ('n_node \\ use_numba',))
+    [sys.stdout.write('%8s' % (u, )) for u in use_numbas]
+    sys.stdout.write('\n')
+    sys.stdout.flush()
+    for n_node in n_nodes:
+        sys.stdout.write('%30d' % (n_node, ))
+        for use_numba in use_numbas:
+            sps = sps_for_Simulator(n_node, use_numba)
+            sys.stdout.write('%8.2f' % (sps / 1e3, ))
+            sys.stdout.flush()
+        sys.stdout.write('\n')
+        sys.stdout.flush()
+
+# }}}
+
 def eps_report_for_components(comps, eps_func):
     n_nodes = [2 << i for i in range(14)]
     sys.stdout.write('%30s' % ('n_node',))
@@ -150,5 +200,7 @@ if __name__ == '__main__':
     from tvb.simulator.integrators import RungeKutta4thOrderDeterministic
     integs = list(integrators()) + [RungeKutta4thOrderDeterministic]
     eps_report_for_components(integs, eps_for_Integrator)
+    print 'benchmarking simulator steps'
+    sps_report_for_simulator()
 
 # vim: sw=4 sts=4 ai et foldmethod=marker
@@ -36,16 +36,22 @@ temporal_correlations.CrossCorrelation dataype.
 
 """
 
+import multiprocessing
+import multiprocessing.pool
 import numpy
 import tvb.datatypes.time_series as time_series
 import tvb.datatypes.temporal_correlations as temporal_correlations
 import tvb.basic.traits.core as core
+import tvb.basic.traits.types_basic as basic
 import tvb.basic.traits.util as util
-from scipy.signal.signaltools import correlate
+from scipy.fftpack import next_fast_len
 from tvb.basic.logger.builder import get_logger
 
 LOG = get_logger(__name__)
 
+# Upper bound, in bytes, on the intermediate spectra held by all worker threads at once.
+MAX_BLOCK_MEMORY = 2 ** 28
+
 
 
 
@@ -56,13 +62,23 @@ class CrossCorrelate(core.Type):
     Return a CrossCorrelation DataType. It contains the cross-correlation
     sequences for all possible combinations of the nodes.
     
-    See: http://www.scipy.org/doc/api_docs/SciPy.signal.signaltools.html#correlate
+    The sequences match those of scipy.signal.correlate(..., mode="same"),
+    but are computed from the spectra of the nodes, each channel being
+    transformed only once.
     """
 
     time_series = time_series.TimeSeries(
         label="Time Series",
         required=True,
         doc="""The time-series for which the cross correlation sequences are calculated.""")
+
+    max_lag = basic.Float(
+        label="Maximum lag (ms)",
+        default=None,
+        required=False,
+        doc="""When given, only the offsets between -max_lag and max_lag are
+        computed and stored. Default is None, meaning all the offsets of a
+        sequence as long as the time-series.""")
     
     
     def evaluate(self):
@@ -77,23 +93,17 @@ class CrossCorrelate(core.Type):
         LOG.info("result shape will be: %s" % str(result_shape))
         
         result = numpy.zeros(result_shape)
+        lags = self._lags(self.time_series.data.shape[0])
         
-        #TODO: For region level, 4s, 2000Hz, this takes ~3hours...(which makes node_coherence seem positively speedy...)
-        # Probably best to add a keyword for offsets, so we just compute +- some "small" range...
-        # One inter-node correlation, across offsets, for each state-var & mode.
         for mode in range(result_shape[4]):
             for var in range(result_shape[3]):
                 data = self.time_series.data[:, var, :, mode]
                 data = data - data.mean(axis=0)[numpy.newaxis, :]
-                #TODO: Work out a way around the 4 level loop:
-                for n1 in range(result_shape[1]):
-                    for n2 in range(result_shape[2]):
-                        result[:, n1, n2, var, mode] = correlate(data[:, n1], data[:, n2], mode="same")
+                result[:, :, :, var, mode] = cross_correlate(data, lags)
         
         util.log_debug_array(LOG, result, "result")
         
-        offset = (self.time_series.sample_period *
-                  numpy.arange(-numpy.floor(result_shape[0] / 2.0), numpy.ceil(result_shape[0] / 2.0)))
+        offset = self.time_series.sample_period * lags
 
         cross_corr = temporal_correlations.CrossCorrelation(
             source=self.time_series,
@@ -102,11 +112,21 @@ class CrossCorrelate(core.Type):
             use_storage=False)
         
         return cross_corr
+
+
+    def _lags(self, tpts):
+        """Offsets, in samples, of the computed cross-correlation sequences."""
+        lags = numpy.arange(-numpy.floor(tpts / 2.0), numpy.ceil(tpts / 2.0))
+        if self.max_lag is not None:
+            max_lag = numpy.floor(self.max_lag / self.time_series.sample_period)
+            lags = lags[numpy.abs(lags) <= max_lag]
+        return lags
     
     
     def result_shape(self, input_shape):
         """Returns the shape of the main result of ...."""
-        result_shape = (input_shape[0], input_shape[2], input_shape[2], input_shape[1], input_shape[3])
+        result_shape = (len(self._lags(input_shape[0])), input_shape[2], input_shape[2],
+                        input_shape[1], input_shape[3])
         return result_shape
     
     
@@ -119,3 +139,65 @@ class CrossCorrelate(core.Type):
 
 
 
+def cross_correlate(data, lags, n_threads=None, max_memory=MAX_BLOCK_MEMORY):
+    """
+    Cross-correlation sequences, at the given integer offsets, of all pairs of
+    the columns of data (time, nodes); returns an array (lags, nodes, nodes)
+    whose [:, n1, n2] entry equals correlate(data[:, n1], data[:, n2]) at those
+    offsets.
+
+    Every channel is Fourier transformed once, padded just enough for the
+    largest offset not to wrap around. The pair spectra are then formed for
+    blocks of first nodes, sized to stay within max_memory over the n_threads
+    blocks processed concurrently, and transformed back. When only a few
+    offsets are requested they are evaluated directly as a product with the
+    corresponding Fourier basis rather than by a full inverse transform.
+    """
+    tpts, nodes = data.shape
+    lags = numpy.asarray(lags, dtype=int)
+    nfft = next_fast_len(int(tpts + numpy.abs(lags).max()))
+    spectra = numpy.fft.rfft(data, nfft, axis=0)
+    nfreq = spectra.shape[0]
+    result = numpy.empty((len(lags), nodes, nodes))
+
+    if len(lags) < 2 * numpy.log2(nfft):
+        # real part of the inverse transform at the requested offsets only
+        weights = numpy.full((nfreq, 1), 2.0 / nfft)
+        weights[0] /= 2.0
+        if nfft % 2 == 0:
+            weights[-1] /= 2.0
+        phase = 2.0 * numpy.pi * numpy.arange(nfreq)[:, numpy.newaxis] * lags[numpy.newaxis, :] / nfft
+        basis_real = (weights * numpy.cos(phase)).T
+        basis_imag = (weights * numpy.sin(phase)).T
+
+        def inverse(pair_spectra):
+            flat = pair_spectra.reshape((nfreq, -1))
+            sequences = numpy.dot(basis_real, flat.real) - numpy.dot(basis_imag, flat.imag)
+            return sequences.reshape((len(lags),) + pair_spectra.shape[1:])
+        block_bytes = 16 * nfreq * nodes
+    else:
+        def inverse(pair_spectra):
+            return numpy.fft.irfft(pair_spectra, nfft, axis=0)[lags % nfft]
+        block_bytes = (16 * nfreq + 8 * nfft) * nodes
+
+    if n_threads is None:
+        n_threads = multiprocessing.cpu_count()
+    block = int(max(1, min(nodes, max_memory // (n_threads * block_bytes))))
+
+    def correlate_block(start):
+        sl = slice(start, start + block)
+        pair_spectra = spectra[:, sl, numpy.newaxis] * spectra[:, numpy.newaxis, :].conj()
+        result[:, sl] = inverse(pair_spectra)
+
+    starts = range(0, nodes, block)
+    if n_threads > 1 and len(starts) > 1:
+        pool = multiprocessing.pool.ThreadPool(min(n_threads, len(starts)))
+        try:
+            pool.map(correlate_block, starts)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        for start in starts:
+            correlate_block(start)
+    return result
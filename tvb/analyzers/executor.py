@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+#
+#
+#  TheVirtualBrain-Scientific Package. This package holds all simulators, and 
+# analysers necessary to run brain-simulations. You can use it stand alone or
+# in conjunction with TheVirtualBrain-Framework Package. See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+#   CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+
+"""
+Evaluate an analyzer in parallel, over independent slices of its TimeSeries.
+
+Most analyzers loop over the state variables and modes of their time series,
+and some treat each node independently. evaluate_parallel splits the time
+series into (state-variable, mode, node-block) slices, evaluates the analyzer
+on each slice in a pool of worker processes, or threads, and assembles the
+slice results into the result datatype of the whole time series. Worker
+processes are forked after the time series is set aside for them, so they
+read it without a copy; where processes cannot be forked, the time series is
+copied once into shared memory, rather than pickled to each worker. The
+number of workers is bounded so that the slices being evaluated fit in a
+memory budget, estimated with the analyzer's result size.
+
+"""
+
+import os
+import inspect
+import multiprocessing
+import multiprocessing.sharedctypes
+import multiprocessing.pool
+import numpy
+import tvb.datatypes.time_series as time_series
+import tvb.basic.traits.types_basic as basic
+from tvb.basic.logger.builder import get_logger
+
+
+LOG = get_logger(__name__)
+
+MAX_MEMORY = 2 ** 30
+
+#: For each analyzer that can be sliced, the result attributes assembled from
+#: the slices, with the axes of their state-variable, mode and node dimensions.
+#: The node axis is None when the nodes of a slice are not independent.
+SLICE_AXES = {
+    "NodeCovariance": {"array_data": (2, 3, None)},
+    "CorrelationCoefficient": {"array_data": (2, 3, None)},
+    "PCA": {"weights": (2, 3, None), "fractions": (1, 2, None)},
+    "RandomizedPCA": {"weights": (2, 3, None), "fractions": (1, 2, None)},
+    "IncrementalPCA": {"weights": (2, 3, None), "fractions": (1, 2, None)},
+    "FFT": {"array_data": (1, 3, 2), "average_power": (1, 3, 2), "normalised_average_power": (1, 3, 2)},
+    "ContinuousWaveletTransform": {"array_data": (2, 4, 3), "power": (2, 4, 3)},
+}
+
+# time series shared with the worker processes, set by _init_worker
+_SHARED = {}
+
+
+
+def evaluate_parallel(analyzer, processes=None, use_threads=False, max_memory=MAX_MEMORY):
+    """
+    Evaluate analyzer, whose class must be in SLICE_AXES, with its time series
+    split in slices evaluated by a pool of processes, or threads, and return
+    the same result datatype as analyzer.evaluate().
+
+    processes defaults to the number of CPUs, and is reduced so that the
+    slices evaluated at once, with their results, fit in max_memory bytes.
+    """
+    name = analyzer.__class__.__name__
+    if name not in SLICE_AXES:
+        raise ValueError("%s cannot be evaluated by slices, it should be one of %s."
+                         % (name, ", ".join(sorted(SLICE_AXES))))
+    axes = SLICE_AXES[name]
+
+    data = analyzer.time_series.data
+    n_time, n_var, n_node, n_mode = data.shape
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+
+    node_split = all(node_axis is not None for _, _, node_axis in axes.values())
+    n_blocks = min(n_node, -(-processes // (n_var * n_mode))) if node_split else 1
+    edges = numpy.linspace(0, n_node, n_blocks + 1).astype(int)
+    slices = [(var, mode, slice(start, stop)) for var in range(n_var) for mode in range(n_mode)
+              for start, stop in zip(edges[:-1], edges[1:])]
+
+    block_shape = (n_time, 1, edges[1], 1)
+    slice_memory = numpy.prod(block_shape) * data.itemsize + _result_size(analyzer, block_shape)
+    processes = int(max(1, min(processes, len(slices), max_memory // max(slice_memory, 1))))
+    LOG.info("Evaluating %s on %d slices with %d %s." % (name, len(slices), processes,
+                                                          "threads" if use_threads else "processes"))
+
+    params = dict((key, getattr(analyzer, key)) for key in analyzer.trait if key != "time_series")
+    for key, value in params.items():
+        # enumerates read back as arrays, but are set from lists
+        if isinstance(analyzer.trait[key], basic.Enumerate) and value is not None:
+            params[key] = numpy.asarray(value).tolist()
+    ts_params = dict(sample_period=analyzer.time_series.sample_period,
+                     start_time=analyzer.time_series.start_time)
+    args = [(analyzer.__class__, params, ts_params, tuple(axes), index) for index in slices]
+
+    if processes <= 1:
+        _SHARED["data"] = data
+        try:
+            results = map(_evaluate_slice_star, args[1:])
+            template = _evaluate_slice(analyzer.__class__, params, ts_params, slices[0])
+        finally:
+            _SHARED.clear()
+    else:
+        if use_threads:
+            _SHARED["data"] = data
+            pool = multiprocessing.pool.ThreadPool(processes)
+        elif hasattr(os, "fork"):
+            # the forked workers inherit the time series
+            _SHARED["data"] = data
+            pool = multiprocessing.Pool(processes)
+        else:
+            # a copy of the time series, in memory shared with the spawned workers
+            shared = multiprocessing.sharedctypes.RawArray("b", data.nbytes)
+            _init_worker(shared, data.shape, data.dtype)
+            _SHARED["data"][:] = data
+            pool = multiprocessing.Pool(processes, _init_worker, (shared, data.shape, data.dtype))
+        try:
+            pending = pool.map_async(_evaluate_slice_star, args[1:])
+            # the first slice gives the result datatype, evaluated while the pool works
+            template = _evaluate_slice(analyzer.__class__, params, ts_params, slices[0])
+            results = pending.get()
+        finally:
+            pool.close()
+            pool.join()
+            _SHARED.clear()
+
+    results = [dict((key, getattr(template, key)) for key in axes)] + results
+    for key, (var_axis, mode_axis, node_axis) in axes.items():
+        first = results[0][key]
+        if first.size == 0:
+            continue
+        shape = list(first.shape)
+        shape[var_axis], shape[mode_axis] = n_var, n_mode
+        if node_axis is not None:
+            shape[node_axis] = n_node
+        assembled = numpy.empty(shape, first.dtype)
+        for (var, mode, nodes), result in zip(slices, results):
+            index = [slice(None)] * len(shape)
+            index[var_axis], index[mode_axis] = slice(var, var + 1), slice(mode, mode + 1)
+            if node_axis is not None:
+                index[node_axis] = nodes
+            assembled[tuple(index)] = result[key]
+        setattr(template, key, assembled)
+    template.source = analyzer.time_series
+    return template
+
+
+def _result_size(analyzer, input_shape):
+    """
+    Memory used by the result of analyzer for an input of input_shape, from its
+    extended_result_size, or result_size, method, whose other arguments are
+    taken by name from the analyzer or from its time series.
+    """
+    size = getattr(analyzer, "extended_result_size", None) or getattr(analyzer, "result_size", None)
+    if size is None:
+        return 0
+    names = inspect.getargspec(size).args[2:]
+    values = [getattr(analyzer if hasattr(analyzer, key) else analyzer.time_series, key) for key in names]
+    try:
+        return size(input_shape, *values)
+    except Exception:
+        LOG.warning("Could not estimate the result size of %s." % analyzer.__class__.__name__)
+        return 0
+
+
+def _init_worker(shared, shape, dtype):
+    "Read the time series from the shared memory buffer."
+    _SHARED["data"] = numpy.frombuffer(shared, dtype=dtype).reshape(shape)
+
+
+def _evaluate_slice(cls, params, ts_params, index):
+    "Evaluate an analyzer of class cls on one (var, mode, nodes) slice of the shared time series."
+    var, mode, nodes = index
+    data = _SHARED["data"][:, var:var + 1, nodes, mode:mode + 1]
+    sub_series = time_series.TimeSeries(data=data, use_storage=False, **ts_params)
+    sub_series.configure()
+    return cls(time_series=sub_series, **params).evaluate()
+
+
+def _evaluate_slice_star(args):
+    "Evaluate a slice, returning the result arrays named in args, for use with Pool.map."
+    cls, params, ts_params, keys, index = args
+    result = _evaluate_slice(cls, params, ts_params, index)
+    return dict((key, getattr(result, key)) for key in keys)
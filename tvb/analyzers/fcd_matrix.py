@@ -114,27 +114,13 @@ class FcdCalculator(core.Type):
         result_shape = self.result_shape(input_shape)
 
         fcd = np.zeros(result_shape)
-        fc_stream = {}  # dict where the fc calculated over the sliding window will be stored
-        start = -sp  # in order to well initialize the first starting point of the FC stream
+        # window k covers the samples [int(k * sp), int(k * sp + sw)] inclusive
+        starts = (np.arange(result_shape[0]) * sp).astype(int)
+        ends = np.minimum((np.arange(result_shape[0]) * sp + sw).astype(int) + 1, input_shape[0])
         for mode in range(result_shape[3]):
             for var in range(result_shape[2]):
-                for nfcd in range(result_shape[0]):
-                    start += sp
-                    current_slice = tuple([slice(int(start), int(start+sw) + 1), slice(var, var + 1),
-                                           slice(input_shape[2]), slice(mode, mode + 1)])
-                    data = self.time_series.read_data_slice(current_slice).squeeze()
-                    fc = np.corrcoef(data.T)
-                    # the triangular part of the fc is organized as a vector, excluding the diagonal (always ones)
-                    triangular = np.triu_indices(len(fc), 1)
-                    fc_stream[nfcd] = fc[triangular]
-                for i in range(result_shape[0]):
-                    j = i
-                    while j < result_shape[0]:
-                        fci = fc_stream[i]
-                        fcj = fc_stream[j]
-                        fcd[i, j, var, mode] = np.corrcoef(fci, fcj)[0, 1]
-                        fcd[j, i, var, mode] = fcd[i, j, var, mode]
-                        j += 1
+                fc_stream = sliding_fc(self.time_series, var, mode, starts, ends)
+                fcd[:, :, var, mode] = fc_correlation(fc_stream)
 
         util.log_debug_array(LOG, fcd, "FCD")
 
@@ -210,6 +196,78 @@ class FcdCalculator(core.Type):
 
 
 # Methods:
+def sliding_fc(time_series, var, mode, starts, ends, chunk_size=None):
+    """
+    Compute the FC of each window [starts[k], ends[k]) as the upper triangle (diagonal excluded) of the
+    Pearson correlation matrix, arranged in the rows of the returned (windows, pairs) array. Both starts
+    and ends must be non decreasing.
+
+    The data are read once, in chunks of chunk_size time points, while running sums of the samples and of
+    their outer products are accumulated; the moments of a window are the difference of these sums taken
+    at its two extremes, so only the sums at the starts of the windows still open are held in memory.
+    """
+    n_node = time_series.read_data_shape()[2]
+    triangular = np.triu_indices(n_node, 1)
+    fc_stream = np.empty((len(starts), len(triangular[0])))
+    boundaries = np.unique(np.r_[starts, ends])
+    # the sums are taken around the mean of the first window, to limit cancellation in the differences
+    offset = time_series.read_data_slice((slice(starts[0], ends[0]), slice(var, var + 1),
+                                          slice(n_node), slice(mode, mode + 1)))[:, 0, :, 0].mean(axis=0)
+    open_sums = {}  # start of an open window -> sums at that point
+    i_start = i_end = 0
+    for t, sum1, sum2 in running_sums(time_series, var, mode, boundaries, offset, chunk_size):
+        while i_end < len(ends) and ends[i_end] == t:
+            start_sum1, start_sum2 = open_sums[starts[i_end]]
+            n = float(t - starts[i_end])
+            mean = (sum1 - start_sum1) / n
+            cov = (sum2 - start_sum2) / n - np.outer(mean, mean)
+            std = np.sqrt(np.diag(cov))
+            fc_stream[i_end] = (cov / np.outer(std, std))[triangular]
+            i_end += 1
+            if i_end == len(starts) or starts[i_end] != starts[i_end - 1]:
+                del open_sums[starts[i_end - 1]]
+        if i_start < len(starts) and starts[i_start] == t:
+            open_sums[t] = sum1.copy(), sum2.copy()
+            while i_start < len(starts) and starts[i_start] == t:
+                i_start += 1
+    return fc_stream
+
+
+def running_sums(time_series, var, mode, points, offset=0.0, chunk_size=None):
+    """
+    For each of the increasing time indices in points, yield the index and the sums of the samples of var
+    and mode minus offset, and of their outer products, over the time points from points[0] up to that
+    index. The data are read in chunks of chunk_size time points, and the yielded sums are updated in place.
+    """
+    n_node = time_series.read_data_shape()[2]
+    if chunk_size is None:
+        chunk_size = max(1024, 2 ** 20 // n_node)
+    sum1, sum2 = np.zeros((n_node,)), np.zeros((n_node, n_node))
+    t = data_start = points[0]
+    data = np.empty((0, n_node))
+    for point in points:
+        while t < point:
+            if t == data_start + len(data):
+                data_start = t
+                data = time_series.read_data_slice((slice(t, min(t + chunk_size, points[-1])), slice(var, var + 1),
+                                                    slice(n_node), slice(mode, mode + 1)))[:, 0, :, 0] - offset
+            segment = data[t - data_start:point - data_start]
+            sum1 += segment.sum(axis=0)
+            sum2 += np.dot(segment.T, segment)
+            t += len(segment)
+        yield point, sum1, sum2
+
+
+def fc_correlation(fc_stream):
+    """
+    Pearson correlation between every pair of rows of fc_stream, computed as one product of the
+    centred, normalised rows.
+    """
+    centred = fc_stream - fc_stream.mean(axis=1)[:, np.newaxis]
+    centred /= np.sqrt(np.sum(centred ** 2, axis=1))[:, np.newaxis]
+    return np.clip(np.dot(centred, centred.T), -1.0, 1.0)
+
+
 def spectral_dbscan(fcd, n_dim=2, eps=0.3, min_samples=50):
     fcd = fcd - fcd.min()
     se = SpectralEmbedding(n_dim, affinity="precomputed")
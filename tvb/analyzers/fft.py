@@ -36,7 +36,6 @@ Calculate an FFT on a TimeSeries DataType and return a FourierSpectrum DataType.
 """
 
 import numpy
-from scipy import signal as sp_signal
 from tvb.basic.logger.builder import get_logger
 import tvb.datatypes.time_series as time_series
 import tvb.datatypes.spectral as spectral
@@ -47,6 +46,7 @@ import tvb.basic.traits.util as util
 
 LOG = get_logger(__name__)
 SUPPORTED_WINDOWING_FUNCTIONS = ("hamming", "bartlett", "blackman", "hanning")
+SUPPORTED_OUTPUTS = ("complex128", "complex64", "average_power")
 
 
 
@@ -85,6 +85,16 @@ class FFT(core.Type):
              Default is None, possibilities are: 'hamming'; 'bartlett';
             'blackman'; and 'hanning'. See, numpy.<function_name>.""",
         order=3)
+
+    output = basic.String(
+        label="Output",
+        default="complex128",
+        required=False,
+        doc="""Type of the computed spectrum: 'complex128' (default) or
+            'complex64' Fourier coefficients of each segment, or only their
+            'average_power' over segments, accumulated as the segments are
+            transformed, which does not grow with the number of segments.""",
+        order=4)
     
     
     def evaluate(self):
@@ -95,61 +105,96 @@ class FFT(core.Type):
         cls_attr_name = self.__class__.__name__ + ".time_series"
         self.time_series.trait["data"].log_debug(owner=cls_attr_name)
         
-        tpts = self.time_series.data.shape[0]
-        time_series_length = tpts * self.time_series.sample_period
-        
-        #Segment time-series, overlapping if necessary
-        nseg = int(numpy.ceil(time_series_length / self.segment_length))
-        if nseg > 1:
-            seg_tpts = numpy.ceil(self.segment_length / self.time_series.sample_period)
-            overlap = (seg_tpts * nseg - tpts) / (nseg - 1.0)
-            starts = [max(seg * (seg_tpts - overlap), 0) for seg in range(nseg)]
-            segments = [self.time_series.data[start:start + seg_tpts]
-                        for start in starts]
-            segments = [segment[:, :, :, numpy.newaxis] for segment in segments]
-            time_series = numpy.concatenate(segments, axis=4)
-        else:
-            self.segment_length = time_series_length
-            time_series = self.time_series.data[:, :, :, numpy.newaxis]
-            seg_tpts = time_series.shape[0]
-        
+        self._check_output()
+        ts_shape = self.time_series.read_data_shape()
+        seg_tpts, starts = self._segments(ts_shape[0])
         LOG.debug("Segment length being used is: %s" % self.segment_length)
         
-        #Base-line correct the segmented time-series  
-        time_series = sp_signal.detrend(time_series, axis=0)
-        util.log_debug_array(LOG, time_series, "time_series")
+        nfreq = seg_tpts // 2
+        if self.output == "average_power":
+            result = numpy.zeros((nfreq, ) + tuple(ts_shape[1:]))
+        else:
+            result = numpy.zeros((nfreq, ) + tuple(ts_shape[1:]) + (len(starts), ), dtype=self.output)
+        window_mask = self._window_mask(seg_tpts)
         
-        #Apply windowing function
-        if self.window_function is not None and self.window_function != [None]:
-            if self.window_function not in SUPPORTED_WINDOWING_FUNCTIONS:
-                LOG.error("Windowing function is: %s" % self.window_function)
-                LOG.error("Must be in: %s" % str(SUPPORTED_WINDOWING_FUNCTIONS))
+        #Transform one segment, read as a slice of the time-series, at a time
+        for seg, start in enumerate(starts):
+            segment = numpy.array(self.time_series.read_data_slice((slice(start, start + seg_tpts), )),
+                                  dtype=numpy.float64)
+            #Base-line correct the segment, in place
+            detrend_linear(segment)
+            if window_mask is not None:
+                segment *= window_mask
+            spectrum = numpy.fft.rfft(segment, axis=0)[1:nfreq + 1]
+            if self.output == "average_power":
+                result += numpy.abs(spectrum) ** 2
             else:
-                window_function = eval("".join(("numpy.", self.window_function[0])))
-                window_mask = numpy.reshape(window_function(seg_tpts),
-                                            (seg_tpts, 1, 1, 1, 1))
-                time_series = time_series * window_mask
-
-        #Calculate the FFT
-        result = numpy.fft.fft(time_series, axis=0)
-        nfreq = result.shape[0] / 2
-        result = result[1:nfreq + 1, :]
+                result[..., seg] = spectrum
         util.log_debug_array(LOG, result, "result")
-
+        
+        if self.output == "average_power":
+            result /= len(starts)
+            spectra = spectral.FourierSpectrum(source=self.time_series,
+                                               segment_length=self.segment_length,
+                                               average_power=result,
+                                               use_storage=False)
+            spectra.compute_normalised_average_power()
+            return spectra
+        
         spectra = spectral.FourierSpectrum(source=self.time_series,
                                            segment_length=self.segment_length,
                                            array_data=result,
                                            use_storage=False)
-
+        
         return spectra
     
     
+    def _check_output(self):
+        "Raise a ValueError if output is not one of SUPPORTED_OUTPUTS."
+        if self.output not in SUPPORTED_OUTPUTS:
+            msg = "Output is %r, must be in: %s" % (self.output, str(SUPPORTED_OUTPUTS))
+            LOG.error(msg)
+            raise ValueError(msg)
+    
+    
+    def _segments(self, tpts):
+        """
+        Number of time points of the segments, and their starts, overlapping if
+        necessary to cover the time-series.
+        """
+        time_series_length = tpts * self.time_series.sample_period
+        nseg = int(numpy.ceil(time_series_length / self.segment_length))
+        if nseg > 1:
+            seg_tpts = int(numpy.ceil(self.segment_length / self.time_series.sample_period))
+            overlap = (seg_tpts * nseg - tpts) / (nseg - 1.0)
+            starts = [int(max(seg * (seg_tpts - overlap), 0)) for seg in range(nseg)]
+        else:
+            self.segment_length = time_series_length
+            seg_tpts = tpts
+            starts = [0]
+        return seg_tpts, starts
+    
+    
+    def _window_mask(self, seg_tpts):
+        "The windowing function over a segment, broadcastable to its shape, or None."
+        if self.window_function is None or self.window_function == [None]:
+            return None
+        if self.window_function not in SUPPORTED_WINDOWING_FUNCTIONS:
+            LOG.error("Windowing function is: %s" % self.window_function)
+            LOG.error("Must be in: %s" % str(SUPPORTED_WINDOWING_FUNCTIONS))
+            return None
+        window_function = getattr(numpy, self.window_function[0])
+        return numpy.reshape(window_function(seg_tpts), (seg_tpts, 1, 1, 1))
+    
+    
     def result_shape(self, input_shape, segment_length, sample_period):
         """Returns the shape of the main result (complex array) of the FFT."""
         freq_len = (segment_length / sample_period) / 2.0
         freq_len = int(min((input_shape[0], freq_len)))
         nseg = max((1, int(numpy.ceil(input_shape[0] * sample_period / segment_length))))
         result_shape = (freq_len, input_shape[1], input_shape[2], input_shape[3], nseg)
+        if self.output == "average_power":
+            result_shape = result_shape[:-1]
         return result_shape
     
     
@@ -158,8 +203,10 @@ class FFT(core.Type):
         Returns the storage size in Bytes of the main result (complex array) of 
         the FFT.
         """
+        self._check_output()
+        itemsize = 8.0 if self.output == "average_power" else numpy.dtype(self.output).itemsize
         result_size = numpy.prod(self.result_shape(input_shape, segment_length,
-                                                   sample_period)) * 2.0 * 8.0  # complex*Bytes
+                                                   sample_period)) * itemsize  # Bytes
         return result_size
 
 
@@ -171,6 +218,9 @@ class FFT(core.Type):
         """
         result_shape = self.result_shape(input_shape, segment_length, sample_period)
         result_size = self.result_size(input_shape, segment_length, sample_period)
+        if self.output == "average_power":
+            # Average power and normalised average power only
+            return 2.0 * result_size + result_shape[0] * 8.0
         extend_size = result_size           # Main array
         extend_size += 0.5 * result_size    # Amplitude
         extend_size += 0.5 * result_size    # Phase
@@ -181,3 +231,14 @@ class FFT(core.Type):
         return extend_size
 
 
+
+def detrend_linear(data):
+    """
+    Remove, in place, the least-squares line fitted along the first axis of
+    data, as scipy.signal.detrend does without copying the array.
+    """
+    t = numpy.arange(data.shape[0]) - (data.shape[0] - 1) / 2.0
+    slope = numpy.tensordot(t, data, axes=(0, 0)) / numpy.sum(t ** 2)
+    data -= data.mean(axis=0)
+    data -= t.reshape((-1, ) + (1, ) * (data.ndim - 1)) * slope
+    return data
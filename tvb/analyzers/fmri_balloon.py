@@ -61,6 +61,7 @@ import tvb.datatypes.arrays as arrays
 import tvb.basic.traits.core as core
 import tvb.basic.traits.types_basic as basic
 import tvb.simulator.integrators as integrators_module
+from tvb.simulator.common import iround
 from tvb.basic.logger.builder import get_logger
 
 LOG = get_logger(__name__)
@@ -93,6 +94,16 @@ class BalloonModel(core.Type):
         If none is provided, by default, the TimeSeries sample period is used.""",
         order=2)
 
+    sample_period = basic.Float(
+        label="Sample period of result (s)",
+        default=None,
+        required=False,
+        doc="""The sampling period of the computed BOLD signal (s), which
+        should be an integral multiple of dt. The signal is decimated while it
+        is integrated, only the retained samples being stored. If none is
+        provided, the BOLD signal is sampled at every integration step.""",
+        order=-1)
+
     integrator = integrators_module.Integrator(
         label="Integration scheme",
         default=integrators_module.HeunDeterministic,
@@ -219,101 +230,139 @@ class BalloonModel(core.Type):
         """
         cls_attr_name = self.__class__.__name__ + ".time_series"
         self.time_series.trait["data"].log_debug(owner=cls_attr_name)
+        return self.evaluate_batch([self.time_series])[0]
+
+
+    def evaluate_batch(self, time_series_list):
+        """
+        Calculate the simulated BOLD signals of several time series at once,
+        all with the same parameters. The time series must have the same
+        number of time points; the integration time step, if not given, is the
+        sample period of the first one.
+        """
 
         #NOTE: Just using the first state variable, although in the Bold monitor
         #      input is the sum over the state-variables. Only time-series
         #      from basic monitors should be used as inputs.
 
-        neural_activity, t_int = self.input_transformation(self.time_series, self.neural_input_transformation)
-        input_shape = neural_activity.shape
-        result_shape = self.result_shape(input_shape)
-        LOG.debug("Result shape will be: %s" % str(result_shape))
+        inputs = [self.input_transformation(ts, self.neural_input_transformation) for ts in time_series_list]
+        input_shapes = [neural_activity.shape for neural_activity, _ in inputs]
+        if len(set(shape[0] for shape in input_shapes)) > 1:
+            msg = "Time series processed in a batch must have the same number of time points."
+            LOG.error(msg)
+            raise ValueError(msg)
+        LOG.debug("Result shapes will be: %s" % str([self.result_shape(shape) for shape in input_shapes]))
 
         if self.dt is None:
-            self.dt = self.time_series.sample_period / 1000.    # (s) integration time step
+            self.dt = time_series_list[0].sample_period / 1000.    # (s) integration time step
             msg = "Integration time step size for the balloon model is %s seconds" % str(self.dt)
             LOG.debug(msg)
 
         #NOTE: Avoid upsampling ...
-        if self.dt < (self.time_series.sample_period / 1000.):
+        if any(self.dt < (ts.sample_period / 1000.) for ts in time_series_list):
             msg = "Integration time step shouldn't be smaller than the sampling period of the input signal." 
             LOG.error(msg)
 
-        balloon_nvar = 4           
-
-        #NOTE: hard coded initial conditions
-        state = numpy.zeros((input_shape[0], balloon_nvar, input_shape[2], input_shape[3]))  # s
-        state[0, 1, :] = 1.  # f
-        state[0, 2, :] = 1.  # v
-        state[0, 3, :] = 1.  # q
+        # decimation of the BOLD signal
+        istep = 1 if self.sample_period is None else max(1, iround(self.sample_period / self.dt))
 
-        # BOLD model coefficients
+        # BOLD model coefficients, for every node and mode of each time series
         k = self.compute_derived_parameters()
-        k1, k2, k3 = k[0], k[1], k[2]
+        k1, k2, k3 = [numpy.hstack([numpy.broadcast_to(numpy.reshape(ki, (-1, 1)), shape[2:]).ravel()
+                                    for shape in input_shapes]) for ki in k]
 
         # prepare integrator
         self.integrator.dt = self.dt
         self.integrator.configure()
         LOG.debug("Integration time step size will be: %s seconds" % str(self.integrator.dt))
 
-        scheme = self.integrator.scheme
-
-        # NOTE: the following variables are not used in this integration but
-        # required due to the way integrators scheme has been defined.
-
-        local_coupling = 0.0
-        stimulus = 0.0
-
         # Do some checks:
-        if numpy.isnan(neural_activity).any():
+        if any(numpy.isnan(neural_activity).any() for neural_activity, _ in inputs):
             LOG.warning("NaNs detected in the neural activity!!")
 
-        # normalise the time-series.
-        neural_activity = neural_activity - neural_activity.mean(axis=0)[numpy.newaxis, :]
+        # normalise the time-series, and put the nodes and modes of all of them side by side
+        neural_activity = numpy.hstack([(neural_activity - neural_activity.mean(axis=0)[numpy.newaxis, :])
+                                        [:, 0].reshape((neural_activity.shape[0], -1))
+                                        for neural_activity, _ in inputs])
 
         # solve equations
-        for step in range(1, t_int.shape[0]):
-            state[step, :] = scheme(state[step - 1, :], self.balloon_dfun,
-                                    neural_activity[step, :], local_coupling, stimulus)
-            if numpy.isnan(state[step, :]).any():
-                LOG.warning("NaNs detected...")
+        y_bold = self.integrate(neural_activity, k1, k2, k3, istep)
+        if numpy.isnan(y_bold).any():
+            LOG.warning("NaNs detected...")
+        LOG.debug("Max value: %s" % str(y_bold.max()))
+
+        bold_signals = []
+        start = 0
+        for (_, t_int), shape in zip(inputs, input_shapes):
+            nchan = shape[2] * shape[3]
+            y_b = y_bold[:, start:start + nchan].reshape((-1, 1) + shape[2:])
+            start += nchan
+            bold_signals.append(time_series.TimeSeriesRegion(
+                data=y_b,
+                time=t_int[::istep],
+                sample_period=self.dt * istep,
+                sample_period_unit='s',
+                use_storage=False))
+
+        return bold_signals
+
+
+    def integrate(self, neural_activity, k1, k2, k3, istep=1):
+        """
+        Integrate the balloon model driven by neural_activity, (time, channels),
+        from its resting state, returning the BOLD signal of every channel every
+        istep time steps. k1, k2 and k3 are the BOLD coefficients of each channel.
 
-        # NOTE: just for the sake of clarity, define the variables used in the BOLD model
-        s = state[:, 0, :]
-        f = state[:, 1, :]
-        v = state[:, 2, :]
-        q = state[:, 3, :]
+        With the default Heun scheme, all the channels are integrated by a
+        compiled kernel if Numba is available; otherwise, and for other
+        integrators, the integrator steps through its scheme.
+        """
+        nonlinear = self.bold_model == "nonlinear"
+        n_out = len(range(0, neural_activity.shape[0], istep))
+
+        kernel = None
+        if type(self.integrator) is integrators_module.HeunDeterministic \
+                and self.integrator.clamped_state_variable_values is None:
+            kernel = _balloon_heun()
+        if kernel is not None:
+            y_bold = numpy.empty((n_out, neural_activity.shape[1]))
+            kernel(numpy.ascontiguousarray(neural_activity, dtype=numpy.float64), self.dt, istep,
+                          self.tau_s, self.tau_f, self.tau_o, self.alpha, self.E0, self.V0,
+                          k1, k2, k3, bool(nonlinear), y_bold)
+            return y_bold
 
-        #import pdb; pdb.set_trace()
+        #NOTE: hard coded initial conditions
+        state = numpy.ones((4, neural_activity.shape[1]))
+        state[0] = 0.  # s
+
+        # NOTE: the following variables are not used in this integration but
+        # required due to the way integrators scheme has been defined.
+
+        local_coupling = 0.0
+        stimulus = 0.0
+
+        v, q = numpy.empty((2, n_out, neural_activity.shape[1]))
+        v[0], q[0] = state[2], state[3]
+        # neural_activity has as many time points as t_int, whatever the input transformation
+        for step in range(1, neural_activity.shape[0]):
+            state = self.integrator.scheme(state, self.balloon_dfun,
+                                           neural_activity[step][numpy.newaxis], local_coupling, stimulus)
+            if step % istep == 0:
+                v[step // istep], q[step // istep] = state[2], state[3]
 
         # BOLD models
-        if self.bold_model == "nonlinear":
+        if nonlinear:
             """
             Non-linear BOLD model equations.
             Page 391. Eq. (13) top in [Stephan2007]_
             """
-            y_bold = numpy.array(self.V0 * (k1 * (1. - q) + k2 * (1. - q / v) + k3 * (1. - v)))
-            y_b = y_bold[:, numpy.newaxis, :, :]
-            LOG.debug("Max value: %s" % str(y_b.max()))
-
+            return self.V0 * (k1 * (1. - q) + k2 * (1. - q / v) + k3 * (1. - v))
         else:
             """
             Linear BOLD model equations.
             Page 391. Eq. (13) bottom in [Stephan2007]_ 
             """
-            y_bold = numpy.array(self.V0 * ((k1 + k2) * (1. - q) + (k3 - k2) * (1. - v)))
-            y_b = y_bold[:, numpy.newaxis, :, :]
-
-        sample_period = 1. / self.dt
-
-        bold_signal = time_series.TimeSeriesRegion(
-            data=y_b,
-            time=t_int,
-            sample_period=sample_period,
-            sample_period_unit='s',
-            use_storage=False)
-
-        return bold_signal
+            return self.V0 * ((k1 + k2) * (1. - q) + (k3 - k2) * (1. - v))
 
 
     def compute_derived_parameters(self):
@@ -422,4 +471,61 @@ class BalloonModel(core.Type):
         such as ..., etc.
         """
         extend_size = self.result_size(input_shape)  # Currently no derived attributes.
-        return extend_size
\ No newline at end of file
+        return extend_size
+
+
+
+_BALLOON_HEUN = []
+
+
+def _balloon_heun():
+    """
+    Compiled Heun integration of the balloon model, or None if Numba is not
+    available, in which case the integrator scheme is used instead.
+    """
+    if _BALLOON_HEUN:
+        return _BALLOON_HEUN[0]
+    try:
+        from numba import njit, prange
+    except ImportError:
+        LOG.warning("Numba not available, the balloon model will be integrated with NumPy.")
+        _BALLOON_HEUN.append(None)
+        return None
+
+    @njit
+    def balloon_dfun(s, f, v, q, x, tau_s, tau_f, tau_o, alpha, E0):
+        "Scalar form of BalloonModel.balloon_dfun."
+        ds = x - (1. / tau_s) * s - (1. / tau_f) * (f - 1)
+        df = s
+        dv = (1. / tau_o) * (f - v ** (1. / alpha))
+        dq = (1. / tau_o) * ((f * (1. - (1. - E0) ** (1. / f)) / E0) - (v ** (1. / alpha)) * (q / v))
+        return ds, df, dv, dq
+
+    @njit(parallel=True)
+    def balloon_heun(x, dt, istep, tau_s, tau_f, tau_o, alpha, E0, V0, k1, k2, k3, nonlinear, bold):
+        """
+        Heun integration of the balloon model for each column of x, from the
+        resting state; the BOLD signal is written to bold every istep steps.
+        """
+        for c in prange(x.shape[1]):
+            s = 0.0
+            f = 1.0
+            v = 1.0
+            q = 1.0
+            for t in range(x.shape[0]):
+                if t > 0:
+                    ds1, df1, dv1, dq1 = balloon_dfun(s, f, v, q, x[t, c], tau_s, tau_f, tau_o, alpha, E0)
+                    ds2, df2, dv2, dq2 = balloon_dfun(s + dt * ds1, f + dt * df1, v + dt * dv1, q + dt * dq1,
+                                                      x[t, c], tau_s, tau_f, tau_o, alpha, E0)
+                    s += (ds1 + ds2) * dt / 2.0
+                    f += (df1 + df2) * dt / 2.0
+                    v += (dv1 + dv2) * dt / 2.0
+                    q += (dq1 + dq2) * dt / 2.0
+                if t % istep == 0:
+                    if nonlinear:
+                        bold[t // istep, c] = V0 * (k1[c] * (1. - q) + k2[c] * (1. - q / v) + k3[c] * (1. - v))
+                    else:
+                        bold[t // istep, c] = V0 * ((k1[c] + k2[c]) * (1. - q) + (k3[c] - k2[c]) * (1. - v))
+
+    _BALLOON_HEUN.append(balloon_heun)
+    return balloon_heun
@@ -35,8 +35,10 @@ Useful graph analyses.
 
 """
 
+import multiprocessing
 import numpy
-import networkx
+import scipy.sparse
+from scipy.sparse import csgraph
 
 
 def betweenness_bin(A):
@@ -55,50 +57,78 @@ def betweenness_bin(A):
 
     Betweenness centrality may be normalised to the range [0,1] as
     BC/[(N-1)(N-2)], where N is the number of nodes in the network.
+
+    Computed with Brandes' algorithm on the sparse binary graph: breadth-first
+    searches from batches of sources count the shortest paths, whose 
+    dependencies are then accumulated from the farthest nodes back.
     
     Original Mika Rubinov, UNSW/U Cambridge, 2007-2012 - From BCT 2012-12-04
 
 
     **Reference:**    [1] Kintali (2008) arXiv:0809.1906v2 [cs.DS] (generalization to directed and disconnected graphs)
+                      [2] Brandes (2001) J Math Sociol 25:163-177.
     
     **Author:**        Paula Sanz Leon
     
     """
     
-    n   = len(A)
-    I   = numpy.eye(n)        # logical ID matrix                                        
-    d   = 1                   # path length
-    number_of_paths_d         = A.copy()           # number of paths of length |d|
-    number_of_shortest_paths_d= A.copy()           # number of shortest paths of length |d|
-    number_of_shortest_paths  = A.copy()           # number of shortest paths of any length
-    length_of_shortest_paths  = A.copy()           # length of shortest paths
-        
-    number_of_shortest_paths[numpy.where(I)] = 1
-    length_of_shortest_paths[numpy.where(I)] = 1
+    G = _binary_csr(A)
+    n = G.shape[0]
+    betweenness = numpy.zeros(n)
+    # the sources are processed in batches, as many breadth-first searches at once
+    batch = int(max(1, min(n, 2 ** 20 // max(n, 1))))
+    for start in range(0, n, batch):
+        sources = numpy.arange(start, min(start + batch, n))
+        distance, sigma = _shortest_path_counts(G, sources)
+        # accumulate dependencies from the farthest nodes back to the sources (Brandes, 2001)
+        dependency = numpy.zeros(distance.shape)
+        for d in xrange(distance.max(), 1, -1):
+            at_d = distance == d
+            w = numpy.zeros(distance.shape)
+            w[at_d] = (1.0 + dependency[at_d]) / sigma[at_d]
+            dependency += G.dot(w.T).T * sigma * (distance == d - 1)
+        betweenness += dependency.sum(axis=0)
+    return betweenness
+
+
+
+def _binary_csr(A):
+    """
+    Binary CSR adjacency matrix of A, without self connections.
+    """
+    A = numpy.asarray(A)
+    rows, cols = numpy.nonzero(A)
+    off_diagonal = rows != cols
+    rows, cols = rows[off_diagonal], cols[off_diagonal]
+    return scipy.sparse.csr_matrix((numpy.ones(len(rows)), (rows, cols)), shape=A.shape)
 
-    #compute the number of shortest paths and their lengths
-    while numpy.any(number_of_shortest_paths_d):
-        d += 1
-        number_of_paths_d          = numpy.dot(number_of_paths_d, A)
-        number_of_shortest_paths_d = number_of_paths_d * (length_of_shortest_paths == 0)
-        number_of_shortest_paths  += number_of_shortest_paths_d
-        length_of_shortest_paths   = length_of_shortest_paths + d * (number_of_shortest_paths_d != 0)
 
-    length_of_shortest_paths[length_of_shortest_paths == 0] = numpy.inf       # length for disconnected vertices is inf
-    length_of_shortest_paths[numpy.where(I)] = 0.0
-    number_of_shortest_paths[number_of_shortest_paths == 0] = 1.0  # number of shortest paths for disconn vertices is 1
 
-    dependency = numpy.zeros((n, n))  # node on node dependency
-    diam = d - 1                      # graph diameter
-    
-    #calculate dependency
-    for d in xrange(diam, 1, -1):
-        temp = (numpy.dot(((length_of_shortest_paths == d) * (1 + dependency) / number_of_shortest_paths), A.T)
-                * ((length_of_shortest_paths == (d - 1)) * number_of_shortest_paths))
-                #temp: dependencies on vertices |d-1| from source
-        dependency += temp
-                
-    return dependency.sum(axis=0)
+def _shortest_path_counts(G, sources):
+    """
+    Breadth-first searches from each of the sources at once, on the sparse
+    binary adjacency matrix G.
+
+    :returns: distance and number of shortest paths, (len(sources), n) arrays,
+              from each source to every node; unreachable nodes are at distance -1
+              with no path.
+    """
+    GT = G.T.tocsr()
+    rows = numpy.arange(len(sources))
+    distance = numpy.full((len(sources), G.shape[0]), -1, dtype=numpy.int64)
+    sigma = numpy.zeros(distance.shape)
+    distance[rows, sources] = 0
+    sigma[rows, sources] = 1.0
+    frontier = sigma.copy()
+    d = 0
+    while frontier.any():
+        d += 1
+        frontier = GT.dot(frontier.T).T
+        frontier[distance >= 0] = 0.0
+        reached = frontier > 0
+        distance[reached] = d
+        sigma[reached] = frontier[reached]
+    return distance, sigma
 
 
 
@@ -126,7 +156,7 @@ def efficiency_bin(A, compute_local_efficiency=False):
     **References:** [1] Latora and Marchiori (2001) Phys Rev Lett 87:198701.
     
     
-    .. note:: Algorithm: algebraic path count
+    .. note:: Algorithm: breadth-first search on the sparse binary graph
     .. note:: Original: Mika Rubinov, UNSW, 2008-2010 - From BCT 2012-12-04
     .. note:: Tested with  Numpy 1.7
     
@@ -181,21 +211,10 @@ def distance_inv(G):
     :param G: binary undirected connection matrix
     :returns: D: matrix of inverse distances
     """
-    L = numpy.zeros(G.shape)
-    D = numpy.eye(G.shape[0])
-    n = 1
-    nPATH = G.copy()                     # n-path matrix
-    L[nPATH != 0] = 1.                   # shortest n-path matrix
-
-    while L.sum() != 0:
-        D += n * L
-        n += 1
-        nPATH = numpy.dot(nPATH, G)
-        L = (nPATH > 0) * (D == 0)
-
-    D[D == 0] = numpy.inf
-    D = 1 / D                                # invert distance
-    D = D - numpy.eye(G.shape[0])
+    D = csgraph.shortest_path(_binary_csr(G), unweighted=True)
+    with numpy.errstate(divide='ignore'):
+        D = 1.0 / D                          # invert distance
+    numpy.fill_diagonal(D, 0.0)
     return D
 
 
@@ -215,8 +234,6 @@ def get_components_sizes(A):
         - size  of the largest component
     
     :raises: Value Error - If A is not square.
-              
-    .. warning::       Requires NetworkX
 
     **Author:**        Paula Sanz Leon
     
@@ -233,19 +250,10 @@ def get_components_sizes(A):
     else:
         pass
 
-    # Binarize without modifying the original matrix (in case A is weighted)
-    temp_A = A.copy()
-    temp_A[temp_A > 0] = 1.0    
-
-    # Set diagonal elements to one
-    if numpy.diag(A).sum() != A.shape[0]:
-       numpy.fill_diagonal(temp_A, 1.0)
-    
-    # build a networkX graph to get largest connected component.
-    components = networkx.connected_components(networkx.from_numpy_matrix(numpy.matrix(temp_A)))
-    # For the time being returns the size of the largest component
-    component_sizes = [len(x) for x in components][0]
-    return component_sizes
+    # Components are those of the undirected graph; a node without connections is
+    # a component of its own, as if its diagonal element were one.
+    labels = csgraph.connected_components(_binary_csr(A), directed=False)[1]
+    return numpy.bincount(labels).max()
 
 
 
@@ -277,43 +285,98 @@ def sequential_random_deletion(white_matter, random_sequence, nor):
     
     """
 
+    return _random_deletion(white_matter.weights, random_sequence, nor)
+
+
+
+def _random_deletion(weights, random_sequence, nor):
+    """
+    Lesion of the weights in the order of random_sequence, see sequential_random_deletion.
+
+    Strength and degree are updated by removing the connections of the deleted
+    node only, and efficiency and components are computed on the sparse graph
+    of the remaining nodes.
+    """
     node_strength = numpy.zeros((nor, nor - 2))
     node_degree   = numpy.zeros((nor, nor - 2))
     global_efficieny = numpy.zeros(nor - 2)
     largest_component = numpy.zeros(nor - 2)
-    temp_strength = white_matter.weights.copy()
-    temp_degree   = white_matter.weights.copy()
-    temp_degree[temp_degree > 0.0] = 1.0
+    temp_strength = numpy.array(weights, dtype=numpy.float64)
+    temp_degree   = (temp_strength > 0.0) * 1.0
+    strength = temp_strength.sum(axis=1) + temp_strength.sum(axis=0)
+    degree   = temp_degree.sum(axis=1) + temp_degree.sum(axis=0)
+    remaining = numpy.ones(nor, dtype=bool)
 
     for i, idx in enumerate(random_sequence):
-            # delete rows
-            temp_strength[idx, :] = 0.0
-            temp_degree[idx, :]   = 0.0
-        
-            # delete columns
-            temp_strength[:, idx] = 0.0
-            temp_degree[:, idx]   = 0.0
-        
-            # strength
-            in_strength     =  temp_strength.sum(axis=1)  
-            out_strength    =  temp_strength.sum(axis=0)
-            node_strength[:, i] = in_strength + out_strength
-        
-            # degree
-            in_degree       = temp_degree.sum(axis=1)
-            out_degree      = temp_degree.sum(axis=0)
-            node_degree[:, i] = in_degree + out_degree
-        
-            # efficiency
-            global_efficieny[i] = efficiency_bin(temp_degree)
-        
-            # largest connected component
-            largest_component[i] = get_components_sizes(temp_degree)
-            
+            # remove the connections of the deleted node from the other nodes
+            strength -= temp_strength[:, idx] + temp_strength[idx, :]
+            degree   -= temp_degree[:, idx] + temp_degree[idx, :]
+            strength[idx] = 0.0
+            degree[idx]   = 0.0
+            temp_strength[idx, :] = temp_strength[:, idx] = 0.0
+            temp_degree[idx, :]   = temp_degree[:, idx]   = 0.0
+            remaining[idx] = False
+
+            node_strength[:, i] = strength
+            node_degree[:, i]   = degree
+
+            # efficiency, over all the pairs of the original nodes
+            remaining_graph = temp_degree[numpy.ix_(remaining, remaining)]
+            global_efficieny[i] = distance_inv(remaining_graph).sum() / (nor ** 2 - nor)
+
+            # largest connected component, deleted nodes being components of their own
+            largest_component[i] = get_components_sizes(remaining_graph) if remaining.any() else 1
+
     return node_strength, node_degree, global_efficieny, largest_component
 
 
 
+def _random_deletion_star(args):
+    "Unpack arguments of _random_deletion, for use with Pool.map."
+    return _random_deletion(*args)
+
+
+
+def random_deletion_ensemble(white_matter, number_of_sequences, nor=None, processes=None, seed=None):
+    """
+    
+    Run sequential_random_deletion for several random deletion sequences.
+    
+    The sequences are independent, and are distributed over a pool of
+    processes workers when processes is greater than one; None uses as many
+    workers as there are CPUs.
+    
+    :param white_matter: a connectivity DataType that has a 'weights' attribute.
+    :param number_of_sequences: int; number of random deletion sequences.
+    :param nor:      number of nodes of the original connectivity matrix, by default
+                     that of the weights.
+    :param seed:     seed of the random number generator drawing the sequences.
+    
+    :returns: the results of sequential_random_deletion stacked along a first
+              dimension of length number_of_sequences, followed by the
+              sequences themselves (number_of_sequences, number_of_nodes - 2).
+    
+    """
+    weights = numpy.asarray(white_matter.weights)
+    nor = nor or weights.shape[0]
+    random_state = numpy.random.RandomState(seed)
+    sequences = numpy.array([random_state.permutation(nor)[:nor - 2] for _ in range(number_of_sequences)])
+    args = [(weights, sequence, nor) for sequence in sequences]
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if processes > 1 and number_of_sequences > 1:
+        pool = multiprocessing.Pool(min(processes, number_of_sequences))
+        try:
+            results = pool.map(_random_deletion_star, args)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = map(_random_deletion_star, args)
+    return tuple(numpy.array(result) for result in zip(*results)) + (sequences, )
+
+
+
 def sequential_targeted_deletion(white_matter, nor):
     """
     
@@ -324,6 +387,11 @@ def sequential_targeted_deletion(white_matter, nor):
     betweenness centrality). The single node with the highest degree, strength or 
     centrality is removed.
 
+    Unlike deletion in a random order, the next target depends on the metrics of
+    the lesioned network, so the betweenness centrality has to be computed anew at
+    each step; it is computed on the graph of the remaining nodes only, as are the
+    efficiency and the components.
+
     
     :param white_matter: tvb Connectivity datatype (yes, it's an example for TVB!)
                   a connectivity datatype that has a 'weights' attribute.
@@ -351,51 +419,42 @@ def sequential_targeted_deletion(white_matter, nor):
     node_betweenness_centrality = numpy.zeros((nor, nor - 2))
     global_efficiency = numpy.zeros((nor - 2, 3))
     largest_component = numpy.zeros((nor - 2, 3))
-    temp_strength = white_matter.weights.copy()
-    temp_degree   = white_matter.weights.copy()
-    temp_bc       = white_matter.weights.copy()
-    temp_degree[temp_degree > 0.0] = 1.0
+    # one lesioned matrix, and its remaining nodes, per strategy: strength, degree & betweenness
+    temp_strength = numpy.array(white_matter.weights, dtype=numpy.float64)
+    temp_degree   = (temp_strength > 0.0) * 1.0
+    temp_bc       = temp_strength.copy()
+    remaining = numpy.ones((3, nor), dtype=bool)
+    degree   = temp_degree.sum(axis=1) + temp_degree.sum(axis=0)
 
     for idx in range(nor - 2):
 
-            # strength
-            in_strength     = temp_strength.sum(axis=1)
-            out_strength    = temp_strength.sum(axis=0)
-            node_strength[:, idx] = in_strength + out_strength
-        
-            # degree
-            in_degree       = temp_degree.sum(axis=1)
-            out_degree      = temp_degree.sum(axis=0)
-            node_degree[:, idx] = in_degree + out_degree
-            
-            # betweeness centrality
-            
-            node_betweenness_centrality[:, idx] = betweenness_bin(temp_bc)
-            
+            # strength is summed anew, as rounding errors of an update would change which
+            # of several nodes of equal strength is targeted; integer degrees are updated
+            node_strength[:, idx] = temp_strength.sum(axis=1) + temp_strength.sum(axis=0)
+            node_degree[:, idx] = degree
+
+            # betweeness centrality, on the graph of the remaining nodes
+            bc_nodes, = numpy.nonzero(remaining[2])
+            node_betweenness_centrality[bc_nodes, idx] = betweenness_bin(temp_bc[numpy.ix_(bc_nodes, bc_nodes)])
+
             # define target index
-            sorted_strength_indices    = numpy.argsort(node_strength[:, idx])
-            sorted_degree_indices      = numpy.argsort(node_degree[:, idx])
-            sorted_bc_indices          = numpy.argsort(node_betweenness_centrality[:, idx])
-            
-            # lesion
-            temp_strength[sorted_strength_indices[-1], :] = 0.0
-            temp_strength[:, sorted_strength_indices[-1]] = 0.0
+            targets = (numpy.argsort(node_strength[:, idx])[-1],
+                       numpy.argsort(node_degree[:, idx])[-1],
+                       numpy.argsort(node_betweenness_centrality[:, idx])[-1])
 
-            temp_degree[sorted_degree_indices[-1], :] = 0.0
-            temp_degree[:, sorted_degree_indices[-1]] = 0.0
-            
-            temp_bc[sorted_bc_indices[-1], :] = 0.0
-            temp_bc[:, sorted_bc_indices[-1]] = 0.0
-            
-            # global efficiency (BU)
-            global_efficiency[idx, 0] = efficiency_bin(temp_strength)  # compute the global eff of the binary matrix ver
-            global_efficiency[idx, 1] = efficiency_bin(temp_degree)
-            global_efficiency[idx, 2] = efficiency_bin(temp_bc)
-        
-            # largest connected component (BU)
-            largest_component[idx, 0] = get_components_sizes(temp_strength)
-            largest_component[idx, 1] = get_components_sizes(temp_degree)
-            largest_component[idx, 2] = get_components_sizes(temp_bc)
-            
-    return node_strength, node_degree, node_betweenness_centrality, global_efficiency, largest_component
+            # lesion, removing the connections of the target from the degree of the other nodes
+            degree   -= temp_degree[:, targets[1]] + temp_degree[targets[1], :]
+            degree[targets[1]] = 0.0
+
+            for strategy, (temp, target) in enumerate(zip((temp_strength, temp_degree, temp_bc), targets)):
+                temp[target, :] = temp[:, target] = 0.0
+                remaining[strategy, target] = False
+                remaining_graph = temp[numpy.ix_(remaining[strategy], remaining[strategy])]
 
+                # global efficiency (BU), over all the pairs of the original nodes
+                global_efficiency[idx, strategy] = distance_inv(remaining_graph > 0.0).sum() / (nor ** 2 - nor)
+
+                # largest connected component (BU), deleted nodes being components of their own
+                largest_component[idx, strategy] = get_components_sizes(remaining_graph)
+
+    return node_strength, node_degree, node_betweenness_centrality, global_efficiency, largest_component
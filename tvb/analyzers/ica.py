@@ -39,6 +39,7 @@ IndependentComponents datatype.
 import numpy
 from sklearn.decomposition import fastica
 import tvb.datatypes.time_series as time_series
+from tvb.analyzers.pca import read_blocks, randomized_eigh
 import tvb.datatypes.mode_decompositions as mode_decompositions
 import tvb.basic.traits.core as core
 import tvb.basic.traits.types_basic as basic
@@ -126,4 +127,143 @@ class fastICA(core.Type):
         n += numpy.prod((n_comp, n_node, n_svar, n_mode)) # whitening
         n += numpy.prod((n_time, n_comp, n_svar, n_mode)) # sources
 
-        return n * 8
\ No newline at end of file
+        return n * 8
+
+
+
+class MiniBatchICA(core.Type):
+    """
+    Takes a TimeSeries datatype (x) and returns the first n_components unmixed
+    temporal sources (S) and the estimated unmixing, as fastICA does, without
+    holding the time series in memory.
+
+    The data is whitened with its leading principal components, found by
+    randomized subspace iteration over blocks of time points, then each
+    iteration of the symmetric FastICA fixed point (logcosh contrast) estimates
+    its expectations on a mini-batch of batch_size consecutive time points,
+    drawn at random. Memory is proportional to n_components times the number
+    of nodes, plus the batch.
+
+    See also: fastICA, pca.RandomizedPCA
+    """
+
+    time_series = time_series.TimeSeries(
+        label="Time Series",
+        required=True,
+        doc="The timeseries to which the ICA is to be applied.")
+
+    n_components = basic.Integer(
+        label="Number of principal components to unmix.",
+        default=10,
+        required=True,
+        doc="Number of leading principal components to unmix.")
+
+    batch_size = basic.Integer(
+        label="Batch size",
+        default=4096,
+        required=False,
+        doc="Number of time points used by each iteration of the fixed point.")
+
+    max_iter = basic.Integer(
+        label="Maximum number of iterations",
+        default=200,
+        required=False,
+        order=-1,
+        doc="Maximum number of fixed point iterations.")
+
+    tol = basic.Float(
+        label="Tolerance",
+        default=1e-4,
+        required=False,
+        order=-1,
+        doc="Tolerance on the change of the unmixing matrix between iterations.")
+
+    def evaluate(self):
+        "Run mini-batch FastICA on the given time series data."
+
+        n_time, n_svar, n_node, n_mode = self.time_series.read_data_shape()
+        n_comp = min(self.n_components, n_node)
+
+        if n_time < n_comp:
+            msg = ("ICA requires more time points (received %d) than number of components (received %d)."
+                   " Please run a longer simulation, use a higher sampling frequency or specify a lower"
+                   " number of components to extract.")
+            msg %= n_time, n_comp
+            raise ValueError(msg)
+
+        W = numpy.zeros((n_comp, n_comp, n_svar, n_mode))  # unmixing
+        K = numpy.zeros((n_comp, n_node, n_svar, n_mode)) # whitening matrix
+        src = numpy.zeros((n_time, n_comp, n_svar, n_mode)) # component time series
+
+        for mode in range(n_mode):
+            for var in range(n_svar):
+                sl = Ellipsis, var, mode
+                mean = sum(block.sum(axis=0) for block in read_blocks(self.time_series, var, mode)) / n_time
+                # whitening by PCA, with the scaling of sklearn's fastica
+                eigenvalues, eigenvectors = randomized_eigh(self.time_series, var, mode, n_comp, mean, 1.0)
+                K[sl] = (eigenvectors / numpy.sqrt(eigenvalues)).T
+                W[sl] = self._unmixing(var, mode, mean, K[sl] * numpy.sqrt(n_time))
+                unmixing = numpy.dot(W[sl], K[sl])
+                start = 0
+                for block in read_blocks(self.time_series, var, mode):
+                    src[start:start + block.shape[0], :, var, mode] = numpy.dot(block - mean, unmixing.T)
+                    start += block.shape[0]
+
+        util.log_debug_array(LOG, W, "unmixing")
+
+        return mode_decompositions.IndependentComponents(source=self.time_series, component_time_series=src,
+            prewhitening_matrix=K, unmixing_matrix=W, n_components=n_comp, use_storage=False)
+
+    def _unmixing(self, var, mode, mean, whitening):
+        "Symmetric FastICA fixed point, with expectations taken over random mini-batches."
+        n_time = self.time_series.read_data_shape()[0]
+        n_comp, n_node = whitening.shape
+        batch_size = min(self.batch_size, n_time)
+        random_state = numpy.random.RandomState(42)
+        W = _sym_decorrelation(random_state.normal(size=(n_comp, n_comp)))
+        for _ in range(self.max_iter):
+            start = random_state.randint(n_time - batch_size + 1)
+            batch = self.time_series.read_data_slice((slice(start, start + batch_size), slice(var, var + 1),
+                                                      slice(n_node), slice(mode, mode + 1)))[:, 0, :, 0]
+            X = numpy.dot(whitening, (batch - mean).T)
+            gwtx = numpy.tanh(numpy.dot(W, X))
+            g_wtx = (1 - gwtx ** 2).mean(axis=-1)
+            W1 = _sym_decorrelation(numpy.dot(gwtx, X.T) / batch_size - g_wtx[:, numpy.newaxis] * W)
+            lim = max(abs(abs(numpy.diag(numpy.dot(W1, W.T))) - 1))
+            W = W1
+            if lim < self.tol:
+                break
+        else:
+            LOG.warning("MiniBatchICA did not converge in %d iterations, consider increasing the batch size "
+                        "or the tolerance." % self.max_iter)
+        return W
+
+    def result_shape(self, input_shape):
+        "Returns the shape of the unmixing matrix."
+        n = min(self.n_components, input_shape[2])
+        return n, n, input_shape[1], input_shape[3]
+
+    def result_size(self, input_shape):
+        "Returns the storage size in bytes of the unmixing matrix of the ICA analysis, assuming 64-bit float."
+        return numpy.prod(self.result_shape(input_shape)) * 8
+
+    def extended_result_size(self, input_shape):
+        """
+        Returns the storage size in bytes of the extended result of the ICA.
+        """
+
+        n_time, n_svar, n_node, n_mode = input_shape
+        n_comp = min(self.n_components, n_node)
+
+        n = numpy.prod(self.result_shape(input_shape))
+        n += numpy.prod((n_comp, n_node, n_svar, n_mode)) # whitening
+        n += numpy.prod((n_time, n_comp, n_svar, n_mode)) # sources
+
+        return n * 8
+
+
+
+def _sym_decorrelation(W):
+    "Symmetric decorrelation, W <- (W W^T)^{-1/2} W."
+    s, u = numpy.linalg.eigh(numpy.dot(W, W.T))
+    return numpy.dot(numpy.dot(u * (1.0 / numpy.sqrt(s)), u.T), W)
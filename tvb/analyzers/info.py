@@ -37,13 +37,29 @@ TODO: Convert sampen to a traited class
 .. moduleauthor:: Marmaduke Woodman <marmaduke.woodman@univ-amu.fr>
 
 """
+import multiprocessing
 import numpy
+from numpy.lib.stride_tricks import as_strided
+from scipy.spatial import cKDTree
 
 
+def _count_matches(y, n, r):
+    """
+    Count the pairs of distinct templates of length n of y, i.e. of its
+    subsequences y[i:i + n], whose Chebyshev distance is less than r.
+
+    The templates are put in a k-d tree, and the pairs are counted by a dual
+    tree traversal, which accepts or rejects whole groups of templates at once
+    instead of comparing every pair.
+    """
+    templates = as_strided(y, shape=(y.size - n + 1, n), strides=y.strides * 2)
+    tree = cKDTree(templates)
+    # count_neighbors counts distances up to r inclusive, and each pair twice
+    count = tree.count_neighbors(tree, numpy.nextafter(r, 0), p=numpy.inf)
+    return (count - templates.shape[0]) // 2
 
-def sampen(y, m=2, r=None, qse=False, taus=1, info=False,
-           tile=numpy.tile, na=numpy.newaxis, abs=numpy.abs,
-           log=numpy.log, r_=numpy.r_):
+
+def sampen(y, m=2, r=None, qse=False, taus=1, info=False):
     """
     Computes (quadratic) sample entropy of a given input signal y, with
     embedding dimension n, and a match tolerance of r (ref 2). If an array
@@ -71,43 +87,66 @@ def sampen(y, m=2, r=None, qse=False, taus=1, info=False,
 
     """
 
-    # if multiple scales given, run on each
-    if type(taus) in (list, numpy.ndarray):
-        return numpy.array([sampen(y, m=m, r=r, qse=qse, taus=int(tau)) for tau in taus])
-
-    # helper function to reformat arrays for matching
-    subseq = lambda y, n: y[tile(r_[0:n], (y.size - n + 1, 1)) + r_[0:y.size - n + 1][:, na]]
-
     # default value of r
     if r is None:
         r = 0.15 * y.std()
 
+    # if multiple scales given, run on each
+    if type(taus) in (list, numpy.ndarray):
+        return numpy.array([sampen(y, m=m, r=r, qse=qse, taus=int(tau)) for tau in taus])
+
     # if we have a scale factor, coarsen time series 
+    y = numpy.asarray(y, dtype=numpy.float64)
     if taus > 1:
         y = y[:y.shape[0] / taus * taus].reshape((-1, taus)).mean(axis=1)
 
-    # compute embedding of signal dims m, m+1, initialize match counts to 0
-    Y1 = subseq(y, m)
-    Y2 = subseq(y, m + 1)
-    c1 = 0
-    c2 = 0
-
-    # check for matches
-    for i in range(Y1.shape[0] - 1):
-        c1 += (abs(tile(Y1[i], (Y1.shape[0] - i - 1, 1)) - Y1[i + 1:]) < r).all(axis=1).sum()
-
-    for i in range(Y2.shape[0] - 1):
-        c2 += (abs(tile(Y2[i], (Y2.shape[0] - i - 1, 1)) - Y2[i + 1:]) < r).all(axis=1).sum()
+    # count matches of the embeddings of signal in dims m, m+1
+    c1 = _count_matches(y, m, r)
+    c2 = _count_matches(y, m + 1, r)
 
     # ref 2, last paragraph of methods, warn inaccurate estimate
     if c2 < 5:
         print "m+1 template match count is low, %d < 5" % c2
 
     p = c2 * 1.0 / c1
-    e = -log(p / (2 * r) if qse else p)
+    e = -numpy.log(p / (2 * r) if qse else p)
 
     if info:
         return e, p, c2, c1
     else:
         return e
 
+
+def _sampen_star(args):
+    "Unpack arguments of sampen, for use with Pool.map."
+    y, kwds = args
+    return sampen(y, **kwds)
+
+
+def sampen_nodes(data, m=2, r=None, qse=False, taus=1, processes=None):
+    """
+    Computes the sample entropy, at each scale in taus, of every signal of data,
+    whose first dimension is time, e.g. the (time, state variables, nodes, modes)
+    data of a TimeSeries. The result has the scales along its first dimension,
+    followed by the remaining dimensions of data. When r is None, the tolerance
+    of each signal is 0.15 times its own standard deviation.
+
+    The signals are distributed over a pool of processes workers when processes
+    is greater than one; None uses as many workers as there are CPUs.
+    """
+    data = numpy.asarray(data)
+    signals = data.reshape((data.shape[0], -1)).T
+    taus = numpy.atleast_1d(taus)
+    args = [(y, dict(m=m, r=r, qse=qse, taus=taus)) for y in signals]
+    if processes is None:
+        processes = multiprocessing.cpu_count()
+    if processes > 1 and len(signals) > 1:
+        pool = multiprocessing.Pool(min(processes, len(signals)))
+        try:
+            entropies = pool.map(_sampen_star, args)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        entropies = map(_sampen_star, args)
+    return numpy.array(entropies).T.reshape((len(taus),) + data.shape[1:])
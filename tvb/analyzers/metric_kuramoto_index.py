@@ -35,9 +35,10 @@ Filler analyzer: Takes a TimeSeries object and returns a Float.
 
 """
 
-import cmath
 import numpy
+import scipy.signal
 import tvb.analyzers.metrics_base as metrics_base
+import tvb.basic.traits.types_basic as basic
 from tvb.basic.filters.chain import FilterChain
 from tvb.basic.logger.builder import get_logger
 
@@ -45,6 +46,36 @@ LOG = get_logger(__name__)
 
 
 
+def phases(x, y=None, axis=0):
+    """
+    Phases of oscillators: the angles of the points (x, y), or, when y is not
+    given, the angles of the analytic signal of x along the time axis (Hilbert
+    transform, after removing the temporal mean).
+    """
+    if y is not None:
+        return numpy.arctan2(y, x)
+    return numpy.angle(scipy.signal.hilbert(x - x.mean(axis=axis, keepdims=True), axis=axis))
+
+
+def order_parameter(theta, node_axis=2, window=None):
+    """
+    Kuramoto order parameter r of the phases theta, of shape (time, ...),
+    over the nodes axis. When window is a number of time points, r is averaged
+    over sliding windows of that length, by cumulative sums, giving one value
+    per window start.
+    """
+    r = numpy.abs(numpy.exp(1j * theta).mean(axis=node_axis))
+    if window is None:
+        return r
+    window = int(window)
+    if not 0 < window <= r.shape[0]:
+        raise ValueError("The window should be between 1 and %d time points long." % r.shape[0])
+    csum = numpy.cumsum(r, axis=0)
+    csum = numpy.concatenate((numpy.zeros((1, ) + r.shape[1:]), csum), axis=0)
+    return (csum[window:] - csum[:-window]) / window
+
+
+
 class KuramotoIndex(metrics_base.BaseTimeseriesMetricAlgorithm):
     """
     Return the Kuramoto synchronization index. 
@@ -80,6 +111,14 @@ class KuramotoIndex(metrics_base.BaseTimeseriesMetricAlgorithm):
                                 fields=[FilterChain.datatype + '._nr_dimensions', FilterChain.datatype + '._length_2d'])
 
 
+    use_hilbert = basic.Bool(
+        label="Hilbert phases",
+        default=False,
+        required=False, order=4,
+        doc="""Take the phases of each state variable from its analytic signal,
+        instead of the angles of pairs of consecutive state variables.""")
+
+
     def evaluate(self):
         """
         Kuramoto Synchronization Index
@@ -88,23 +127,26 @@ class KuramotoIndex(metrics_base.BaseTimeseriesMetricAlgorithm):
         cls_attr_name = self.__class__.__name__ + ".time_series"
         self.time_series.trait["data"].log_debug(owner=cls_attr_name)
 
-        if self.time_series.data.shape[1] < 2:
+        if self.time_series.data.shape[1] < 2 and not self.use_hilbert:
             msg = " The number of state variables should be at least 2."
             LOG.error(msg)
             raise Exception(msg)
-                
-        #TODO: Should be computed for each possible combination of var, mode
-        #      for var, mode in itertools.product(range(self.time_series.data.shape[1]), 
-        #                                         range(self.time_series.data.shape[3])):
-        
-        #TODO: Generalise. The Kuramoto order parameter is computed over sliding 
-        #      time windows and then normalised    
-
-        theta_sum = numpy.sum(numpy.exp(0.0 + 1j * (numpy.vectorize(cmath.polar)
-                    (numpy.vectorize(complex)(self.time_series.data[:, 0, :, 0],
-                     self.time_series.data[:, 1, :, 0]))[1])), axis=1)
-                     
-        result = numpy.vectorize(cmath.polar)(theta_sum / self.time_series.data.shape[2])
-
-        return result[0].mean()   
 
+        return self.order_parameters()[:, 0, 0].mean()
+
+
+    def order_parameters(self, window=None):
+        """
+        Order parameter time courses, of shape (time, oscillators, modes), for
+        all modes and all oscillators: each state variable with Hilbert phases,
+        else each pair of consecutive state variables (0, 1), (2, 3), ... read
+        as (x, y) coordinates. With a window (in time points), the order
+        parameter is averaged over sliding windows.
+        """
+        data = self.time_series.data
+        if self.use_hilbert:
+            theta = phases(data)
+        else:
+            n_pairs = data.shape[1] // 2
+            theta = phases(data[:, 0:2 * n_pairs:2], data[:, 1:2 * n_pairs:2])
+        return order_parameter(theta, node_axis=2, window=window)
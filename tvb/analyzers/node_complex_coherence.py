@@ -37,8 +37,10 @@ return a ComplexCoherence datatype.
 """
 
 import numpy
+from numpy.lib.stride_tricks import as_strided
 from scipy import signal as sp_signal
 from tvb.datatypes.time_series import TimeSeries
+import tvb.datatypes.arrays as arrays
 import tvb.datatypes.spectral as spectral
 import tvb.basic.traits.core as core
 import tvb.basic.traits.types_basic as basic
@@ -50,10 +52,6 @@ SUPPORTED_WINDOWING_FUNCTIONS = ("hamming", "bartlett", "blackman", "hanning")
 
 
 #NOTE: Work only with 2D TimeSeries -- otherwise a MemoryError will raise
-        # My first attempts made use of itertools on the 4D TimeSeries but they were 
-        # fruitless.
-        # Nested `for` loops seem a 'good' solution instead of creating enormous ndarrays
-        # to compute the FFT and derived complex spectra at once
 #TODO: add more logs 
 
 class NodeComplexCoherence(core.Type):
@@ -153,7 +151,7 @@ class NodeComplexCoherence(core.Type):
         required = False,
         order = -1,
         doc = """Adds `n` zeros at the end of each segment and at the end 
-        of window_function. It is not yet functional.""")
+        of window_function.""")
         
         
     detrend_ts = basic.Bool(
@@ -172,6 +170,18 @@ class NodeComplexCoherence(core.Type):
         doc = """Maximum frequency points (e.g. 32., 64., 128.) represented in 
                 the output. Default is segment_length / 2 + 1.""")
         
+    pairs = arrays.IntegerArray(
+        label = "Channel pairs",
+        default = None,
+        required = False,
+        order = -1,
+        doc = """(npairs, 2) array of the channel pairs (i, j) for which the 
+                cross spectrum and coherence are computed; the (j, i) entries are 
+                filled by Hermitian symmetry, so the upper triangle, i.e. 
+                numpy.transpose(numpy.triu_indices(nchan)), gives the 
+                full result at about half the cost. The remaining entries are left 
+                at zero. Default is None, meaning all the pairs.""")
+        
     npat = basic.Float(
         label = "dummy variable",
         default = 1.0,
@@ -195,7 +205,7 @@ class NodeComplexCoherence(core.Type):
         if len(self.time_series.data.shape) > 2:
             time_series_data = numpy.squeeze((self.time_series.data.mean(axis=-1)).mean(axis=1))
         
-        #nchan = time_series_data.shape[1]
+        nchan = time_series_data.shape[1]
         
         #NOTE: if we get a projection matrix ... then ...
         #if self.npat > 1: 
@@ -205,147 +215,111 @@ class NodeComplexCoherence(core.Type):
         #Divide time-series into epochs, no overlapping
         if self.epoch_length > 0.0:
             nepochs = int(numpy.floor(time_series_length / self.epoch_length))
-            epoch_tpts = self.epoch_length / self.time_series.sample_period
+            epoch_tpts = int(self.epoch_length / self.time_series.sample_period)
             time_series_length = self.epoch_length
             tpts = epoch_tpts
         else: 
             self.epoch_length = time_series_length
-            nepochs = int(numpy.ceil(time_series_length / self.epoch_length))
+            nepochs = 1
+            epoch_tpts = tpts
             
         #Segment time-series, overlapping if necessary
         nseg = int(numpy.floor(time_series_length / self.segment_length))
         if nseg > 1:
-            seg_tpts = self.segment_length / self.time_series.sample_period
-            seg_shift_tpts = self.segment_shift / self.time_series.sample_period
+            seg_tpts = int(self.segment_length / self.time_series.sample_period)
+            seg_shift_tpts = int(self.segment_shift / self.time_series.sample_period)
             nseg = int(numpy.floor((tpts - seg_tpts) / seg_shift_tpts) + 1)
         else:
             self.segment_length = time_series_length
-            seg_tpts = time_series_data.shape[0]
+            seg_tpts = tpts
+            seg_shift_tpts = tpts
+            nseg = 1
 
         # Frequency vectors
-        freqs = numpy.fft.fftfreq(int(seg_tpts))
-        nfreq = numpy.min([self.max_freq, numpy.floor((seg_tpts + self.zeropad) / 2.0) + 1])
-        freqs = freqs[0:nfreq,] * (1.0/ self.time_series.sample_period)
-        
-        
-        result_shape, av_result_shape = self.result_shape(
-                                        self.time_series.data.shape, 
-                                        self.max_freq, 
-                                        self.epoch_length, 
-                                        self.segment_length, 
-                                        self.segment_shift, 
-                                        self.time_series.sample_period, 
-                                        self.zeropad, 
-                                        self.average_segments)
-        
-        cs = numpy.zeros(result_shape, dtype=numpy.complex128)
-        av = numpy.matrix(numpy.zeros(av_result_shape, dtype=numpy.complex128))
-        coh = numpy.zeros(result_shape, dtype=numpy.complex128)
-
-        # NOTE: result for individual epochs are kept only if npat > 1. Skipping ...
-        #if self.npat > 1:
-        #    if not self.average_segments:
-        #        cs = numpy.zeros((nchan, nchan, nfreq, nepochs, nseg), dtype=numpy.complex128)
-        #        av = numpy.zeros((nchan, nfreq, nepochs, nseg), dtype=numpy.complex128)
-        #    else:
-        #        av = numpy.zeros((nchan, nfreq, nepochs), dtype=numpy.complex128)
-        #        cs = numpy.zeros((nchan, nchan, nfreq, nepochs), dtype=numpy.complex128) 
-  
-
+        nfft = seg_tpts + self.zeropad
+        nfreq = int(min(self.max_freq, numpy.floor(nfft / 2.0) + 1))
+        freqs = numpy.fft.rfftfreq(nfft)[:nfreq] * (1.0 / self.time_series.sample_period)
 
         #Apply windowing function
+        window_mask = numpy.ones((seg_tpts, 1))
         if self.window_function is not None:
             if self.window_function not in SUPPORTED_WINDOWING_FUNCTIONS:
                 LOG.error("Windowing function is: %s" % self.window_function)
                 LOG.error("Must be in: %s" % str(SUPPORTED_WINDOWING_FUNCTIONS))
             
             window_function = eval("".join(("numpy.", self.window_function)))
-            win = window_function(seg_tpts)
-            window_mask = (numpy.kron(numpy.ones((time_series_data.shape[1], 1)), win)).T
+            window_mask = window_function(seg_tpts)[:, numpy.newaxis]
 
-        nave = 0
-    
-        for j in numpy.arange(nepochs):
-            data = time_series_data[j*epoch_tpts:(j+1)*epoch_tpts, :]
+        # Cross-spectra are accumulated as (segments, frequencies, pairs) when only
+        # the given channel pairs are needed, else as (segments, frequencies, nchan, nchan);
+        # the segment axis is summed over when averaging segments.
+        if self.pairs is not None:
+            rows, cols = numpy.asarray(self.pairs, dtype=int).T
+        cs = 0.0
+        av = 0.0
+        auto = 0.0
         
-            for i in numpy.arange(nseg): #average over all segments;
-                time_series = data[i*seg_shift_tpts: i*seg_shift_tpts + seg_tpts, :]
+        data = numpy.ascontiguousarray(time_series_data[:nepochs * epoch_tpts])
+        data = data.reshape((nepochs, epoch_tpts, nchan))
+        for epoch in data:
+            # all segments of the epoch, as a strided view of (nseg, seg_tpts, nchan)
+            segments = as_strided(epoch, shape=(nseg, seg_tpts, nchan),
+                                  strides=(seg_shift_tpts * epoch.strides[0],) + epoch.strides)
+            if self.detrend_ts:
+                segments = sp_signal.detrend(segments, axis=1)
             
-                if self.detrend_ts:
-                    time_series = sp_signal.detrend(time_series, axis=0)
+            datalocfft = numpy.fft.rfft(segments * window_mask, n=nfft, axis=1)[:, :nfreq]
             
-                datalocfft = numpy.fft.fft(time_series * window_mask, axis=0)
-                datalocfft = numpy.matrix(datalocfft)
-            
-                for f in numpy.arange(nfreq): #for all frequencies
-                    if self.npat == 1:
-                        if not self.average_segments:
-                            cs[:, :, f, i] += numpy.conjugate(
-                                              datalocfft[f, :].conj().T * \
-                                              datalocfft[f, :])
-                            av[:, f, i] += numpy.conjugate(datalocfft[f, :].conj().T)
-                        else:
-                            cs[:, :, f] += numpy.conjugate(
-                                           datalocfft[f,:].conj().T * \
-                                           datalocfft[f, :])
-                            av[:, f] += numpy.conjugate(datalocfft[f, :].conj().T)
-                    else:
-                        if not self.average_segments:
-                            cs[:, :, f, j, i] = numpy.conjugate(
-                                                datalocfft[f, :].conj().T * \
-                                                datalocfft[f, :])
-                            av[:, f, j, i] = numpy.conjugate(datalocfft[f, :].conj().T)  
-                        else:
-                            cs[:, :, f, j] += numpy.conjugate(
-                                           datalocfft[f,:].conj().T *\
-                                           datalocfft[f,:])
-                                                 
-                            av[:, f, j] += numpy.conjugate(datalocfft[f, :].conj().T)  
-                del datalocfft
+            if self.pairs is None:
+                if self.average_segments:
+                    cs = cs + numpy.matmul(datalocfft.transpose((1, 2, 0)),
+                                           datalocfft.transpose((1, 0, 2)).conj())
+                else:
+                    cs = cs + datalocfft[:, :, :, numpy.newaxis] * datalocfft[:, :, numpy.newaxis, :].conj()
+            else:
+                if self.average_segments:
+                    cs = cs + numpy.einsum("sfp,sfp->fp", datalocfft[:, :, rows], datalocfft[:, :, cols].conj())
+                    auto = auto + numpy.einsum("sfi,sfi->fi", datalocfft, datalocfft.conj())
+                else:
+                    cs = cs + datalocfft[:, :, rows] * datalocfft[:, :, cols].conj()
+                    auto = auto + datalocfft * datalocfft.conj()
+            av = av + (datalocfft.sum(axis=0) if self.average_segments else datalocfft)
           
-            nave += 1.0
-        
         # End of FORs
-        if not self.average_segments:
-            cs = cs / nave
-            av = av / nave
-        else:
-            nave = nave * nseg
-            cs = cs / nave
-            av = av / nave
+        nave = float(nepochs * nseg if self.average_segments else nepochs)
+        cs = cs / nave
+        av = av / nave
+        auto = auto / nave
         
         # Subtract average
-        for f in numpy.arange(nfreq):
-            if self.subtract_epoch_average:
-                if self.npat == 1:
-                    if not self.average_segments:
-                        for i in numpy.arange(nseg):
-                            cs[:, :, f, i] = cs[:, :, f, i] - av[:, f, i] *  av[:, f, i].conj().T
-                    else:
-                        cs[:, :, f] = cs[:, :, f] - av[:, f] * av[:, f].conj().T
-                else:
-                    if not self.average_segments:
-                        for i in numpy.arange(nseg):
-                            for j in numpy.arange(nepochs):
-                                cs[:, :, f, j, i] = cs[:, :, f, j, i] - av[:, f, j, i] * av[:, f, j, i].conj().T
-                            
-                    else: 
-                        for j in numpy.arange(nepochs):
-                            cs[:, :, f, j] = cs[:, :, f, j] - av[:, f, j] * av[:, f, j].conj().T
+        if self.subtract_epoch_average:
+            if self.pairs is None:
+                cs = cs - av[..., :, numpy.newaxis] * av[..., numpy.newaxis, :].conj()
+            else:
+                cs = cs - av[..., rows] * av[..., cols].conj()
+                auto = auto - av * av.conj()
         
-        #Compute Complex Coherence        
-        ndim = len(cs.shape)
-        if ndim == 3:
-            for i in numpy.arange(cs.shape[2]):
-                temp = numpy.matrix(cs[:, :, i])
-                coh[:, :, i] = cs[:, :, i] / numpy.sqrt((temp.diagonal().conj().T) * temp.diagonal())
-            
-        elif ndim == 4:
-            for i in numpy.arange(cs.shape[2]):
-                for j in numpy.arange(cs.shape[3]):
-                    temp = numpy.matrix(numpy.squeeze(cs[:, :, i, j]))
-                    coh[:, :, i, j] = temp / numpy.sqrt((temp.diagonal().conj().T) * temp.diagonal().T)
+        #Compute Complex Coherence
+        if self.pairs is None:
+            auto = numpy.diagonal(cs, axis1=-2, axis2=-1)
+            coh = cs / numpy.sqrt(auto[..., :, numpy.newaxis].conj() * auto[..., numpy.newaxis, :])
+        else:
+            coh = cs / numpy.sqrt(auto[..., rows].conj() * auto[..., cols])
         
+        # Back to the (nchan, nchan, nfreq[, nseg]) layout of the results
+        if self.pairs is None:
+            axes = (1, 2, 0) if self.average_segments else (2, 3, 1, 0)
+            cs = cs.transpose(axes)
+            coh = coh.transpose(axes)
+        else:
+            cs_pairs, coh_pairs = cs.T, coh.T
+            shape = (nchan, nchan) + cs_pairs.shape[1:]
+            cs = numpy.zeros(shape, dtype=numpy.complex128)
+            coh = numpy.zeros(shape, dtype=numpy.complex128)
+            cs[cols, rows] = cs_pairs.conj()
+            coh[cols, rows] = coh_pairs.conj()
+            cs[rows, cols] = cs_pairs
+            coh[rows, cols] = coh_pairs
         
         util.log_debug_array(LOG, cs, "result")
         spectra = spectral.ComplexCoherenceSpectrum(source = self.time_series,
@@ -367,11 +341,11 @@ class NodeComplexCoherence(core.Type):
         Returns the shape of the main result and the average over epochs
         """
         # this is useless here unless the input could actually be a 2D timeseries
-        nchan = numpy.where(len(input_shape) > 2, input_shape[2], input_shape[1])
+        nchan = int(numpy.where(len(input_shape) > 2, input_shape[2], input_shape[1]))
         seg_tpts = segment_length / sample_period
         seg_shift_tpts = segment_shift / sample_period
         tpts  = numpy.where(epoch_length > 0.0, epoch_length / sample_period, input_shape[0])
-        nfreq = numpy.min([max_freq, numpy.floor((seg_tpts + zeropad) / 2.0) + 1])
+        nfreq = int(numpy.min([max_freq, numpy.floor((int(seg_tpts) + zeropad) / 2.0) + 1]))
         #nep   = int(numpy.floor(input_shape[0] / epoch_length))
         nseg  = int(numpy.floor((tpts - seg_tpts) / seg_shift_tpts) + 1)
 
@@ -41,10 +41,12 @@ a PrincipalComponents datatype.
 
 import numpy
 import matplotlib.mlab as mlab
+from sklearn.decomposition import IncrementalPCA as SkIncrementalPCA
 #TODO: Currently built around the Simulator's 4D timeseries -- generalise...
 import tvb.datatypes.time_series as time_series
 import tvb.datatypes.mode_decompositions as mode_decompositions
 import tvb.basic.traits.core as core
+import tvb.basic.traits.types_basic as basic
 import tvb.basic.traits.util as util
 from tvb.basic.logger.builder import get_logger
 
@@ -155,3 +157,197 @@ class PCA(core.Type):
         return extend_size
 
 
+
+class RandomizedPCA(core.Type):
+    """
+    Return the first principal component weights and the fraction of the
+    variance that they explain, as PCA does, without holding the time series
+    in memory.
+
+    The time series is read by blocks of time points, and the leading
+    components of the standardised data are found by a randomized subspace
+    iteration: a few passes over the data multiply the inter-node correlation
+    matrix with a block of n_components + 10 vectors, so that memory is
+    proportional to the number of components times the number of nodes.
+
+    References:
+        .. [HMT_2011] N. Halko, P. G. Martinsson and J. A. Tropp, *Finding
+            structure with randomness: probabilistic algorithms for
+            constructing approximate matrix decompositions*, SIAM Review
+            53(2):217-288, 2011.
+    """
+
+    time_series = time_series.TimeSeries(
+        label = "Time Series",
+        required = True,
+        doc = """The timeseries to which the PCA is to be applied.""")
+
+    n_components = basic.Integer(
+        label = "Number of principal components",
+        default = 10,
+        required = True,
+        doc = """Number of leading principal components computed.""")
+
+    power_iterations = basic.Integer(
+        label = "Power iterations",
+        default = 2,
+        required = False,
+        order = -1,
+        doc = """Number of passes over the data refining the subspace of the
+            leading components before they are extracted. More iterations give
+            more accurate components when the spectrum decays slowly.""")
+
+    def evaluate(self):
+        """
+        Compute the leading principal components of each state variable and mode.
+        """
+        cls_attr_name = self.__class__.__name__+".time_series"
+        self.time_series.trait["data"].log_debug(owner = cls_attr_name)
+
+        ts_shape = self.time_series.read_data_shape()
+        n_comp = min(self.n_components, ts_shape[2])
+        weights = numpy.zeros((n_comp, ts_shape[2], ts_shape[1], ts_shape[3]))
+        fractions = numpy.zeros((n_comp, ts_shape[1], ts_shape[3]))
+
+        for mode in range(ts_shape[3]):
+            for var in range(ts_shape[1]):
+                mean, std = node_moments(self.time_series, var, mode)
+                total = ts_shape[0] * ts_shape[2]  # sum of squares of the standardised data
+                eigenvalues, eigenvectors = randomized_eigh(self.time_series, var, mode, n_comp, mean, std,
+                                                            self.power_iterations)
+                fractions[:, var, mode] = eigenvalues / total
+                weights[:, :, var, mode] = eigenvectors.T
+
+        util.log_debug_array(LOG, fractions, "fractions")
+        util.log_debug_array(LOG, weights, "weights")
+
+        return mode_decompositions.PrincipalComponents(
+            source = self.time_series,
+            fractions = fractions,
+            weights = weights,
+            use_storage = False)
+
+    def result_shape(self, input_shape):
+        """
+        Returns the shape of the component weights matrix and of the vector of fractions.
+        """
+        n_comp = min(self.n_components, input_shape[2])
+        return [(n_comp, input_shape[2], input_shape[1], input_shape[3]), (n_comp, input_shape[1], input_shape[3])]
+
+    def result_size(self, input_shape):
+        """
+        Returns the storage size in Bytes of the results of the PCA analysis.
+        """
+        return numpy.sum(map(numpy.prod, self.result_shape(input_shape))) * 8.0 #Bytes
+
+
+
+class IncrementalPCA(RandomizedPCA):
+    """
+    Return the first principal component weights and the fraction of the
+    variance that they explain, updating the decomposition with one block of
+    time points at a time (sklearn's IncrementalPCA), so that memory is
+    proportional to the number of components, plus the block length, times
+    the number of nodes.
+
+    References:
+        .. [RLLY_2008] D. Ross, J. Lim, R. Lin and M. Yang, *Incremental
+            learning for robust visual tracking*, International Journal of
+            Computer Vision 77(1-3):125-141, 2008.
+    """
+
+    def evaluate(self):
+        """
+        Compute the leading principal components of each state variable and mode.
+        """
+        cls_attr_name = self.__class__.__name__+".time_series"
+        self.time_series.trait["data"].log_debug(owner = cls_attr_name)
+
+        ts_shape = self.time_series.read_data_shape()
+        n_comp = min(self.n_components, ts_shape[2])
+        weights = numpy.zeros((n_comp, ts_shape[2], ts_shape[1], ts_shape[3]))
+        fractions = numpy.zeros((n_comp, ts_shape[1], ts_shape[3]))
+
+        for mode in range(ts_shape[3]):
+            for var in range(ts_shape[1]):
+                mean, std = node_moments(self.time_series, var, mode)
+                ipca = SkIncrementalPCA(n_components=n_comp)
+                for data in read_blocks(self.time_series, var, mode, min_length=n_comp):
+                    ipca.partial_fit((data - mean) / std)
+                fractions[:, var, mode] = ipca.explained_variance_ratio_
+                weights[:, :, var, mode] = ipca.components_
+
+        util.log_debug_array(LOG, fractions, "fractions")
+        util.log_debug_array(LOG, weights, "weights")
+
+        return mode_decompositions.PrincipalComponents(
+            source = self.time_series,
+            fractions = fractions,
+            weights = weights,
+            use_storage = False)
+
+
+
+def read_blocks(time_series, var, mode, min_length=1, block_length=None):
+    """
+    Iterate over consecutive (time, nodes) blocks of a state variable and mode
+    of time_series, read with read_data_slice. The blocks are block_length long,
+    by default about 8 MB worth of time points, the last one being merged with
+    the previous one when shorter than min_length.
+    """
+    n_time, _, n_node, _ = time_series.read_data_shape()
+    if block_length is None:
+        block_length = max(min_length, 2 ** 20 // n_node)
+    starts = range(0, n_time, block_length)
+    if len(starts) > 1 and n_time - starts[-1] < min_length:
+        starts.pop()
+    for start, stop in zip(starts, starts[1:] + [n_time]):
+        yield time_series.read_data_slice((slice(start, stop), slice(var, var + 1),
+                                           slice(n_node), slice(mode, mode + 1)))[:, 0, :, 0]
+
+
+def node_moments(time_series, var, mode):
+    """
+    Mean and standard deviation of each node of a state variable and mode of
+    time_series, accumulated over blocks of time points.
+    """
+    n_time = time_series.read_data_shape()[0]
+    # the sums are taken around the first sample, to limit cancellation
+    offset = None
+    sums = 0.0
+    squares = 0.0
+    for data in read_blocks(time_series, var, mode):
+        if offset is None:
+            offset = data[0].copy()
+        data = data - offset
+        sums = sums + data.sum(axis=0)
+        squares = squares + (data ** 2).sum(axis=0)
+    mean = sums / n_time
+    return offset + mean, numpy.sqrt(numpy.maximum(squares / n_time - mean ** 2, 0.0))
+
+
+def randomized_eigh(time_series, var, mode, n_components, mean, scale, power_iterations=2, n_oversamples=10):
+    """
+    Leading eigenvalues and eigenvectors (as columns) of Z^T Z, where Z is the
+    (time, nodes) data of a state variable and mode of time_series, centred by
+    mean and divided by scale, by randomized subspace iteration [HMT_2011]_.
+    Each iteration is one pass over blocks of the data.
+    """
+    n_node = time_series.read_data_shape()[2]
+    n_basis = min(n_components + n_oversamples, n_node)
+
+    def gram_dot(basis):
+        "Z^T Z basis, accumulated over blocks of time points."
+        product = numpy.zeros(basis.shape)
+        for data in read_blocks(time_series, var, mode):
+            data = (data - mean) / scale
+            product += numpy.dot(data.T, numpy.dot(data, basis))
+        return product
+
+    basis = numpy.linalg.qr(numpy.random.RandomState(42).randn(n_node, n_basis))[0]
+    for _ in range(power_iterations):
+        basis = numpy.linalg.qr(gram_dot(basis))[0]
+    # Rayleigh-Ritz projection of Z^T Z on the subspace
+    eigenvalues, vectors = numpy.linalg.eigh(numpy.dot(basis.T, gram_dot(basis)))
+    order = numpy.argsort(eigenvalues)[::-1][:n_components]
+    return eigenvalues[order], numpy.dot(basis, vectors[:, order])
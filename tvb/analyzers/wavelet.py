@@ -40,7 +40,7 @@ WaveletSpectrum datatype.
 """
 
 import numpy
-import scipy.signal as signal
+from scipy.fftpack import next_fast_len
 import tvb.datatypes.time_series as time_series
 import tvb.datatypes.spectral as spectral
 import tvb.basic.traits.core as core
@@ -51,6 +51,10 @@ from tvb.basic.logger.builder import get_logger
 
 LOG = get_logger(__name__)
 SUPPORTED_WAVELET_FUNCTIONS = ("morlet",)
+SUPPORTED_OUTPUTS = ("complex128", "complex64", "power")
+
+# Upper bound, in bytes, on the spectra of all scales held for one chunk of nodes.
+MAX_CHUNK_MEMORY = 2 ** 28
 
 
 
@@ -112,6 +116,14 @@ class ContinuousWaveletTransform(core.Type):
         required = True,
         doc = """NFC. Must be greater than 5. Ratios of the center frequencies to bandwidths.""")
     
+    output = basic.String(
+        label = "Output",
+        default = "complex128",
+        required = False,
+        doc = """Type of the computed coefficients: 'complex128' (default) or
+            'complex64' wavelet coefficients, or only their 'power', which 
+            takes a quarter of the memory of the default.""")
+    
     
     
     def evaluate(self):
@@ -121,7 +133,59 @@ class ContinuousWaveletTransform(core.Type):
         cls_attr_name = self.__class__.__name__+".time_series"
         self.time_series.trait["data"].log_debug(owner = cls_attr_name)
         
-        ts_shape = self.time_series.data.shape
+        ts_shape = self.time_series.read_data_shape()
+        self._configure()
+        
+        coef_shape = (len(self._freqs), self._nt) + tuple(ts_shape[1:])
+        coef = numpy.zeros(coef_shape, dtype=self._output_dtype)
+        util.log_debug_array(LOG, coef, "coef")
+        for nodes, coef_chunk in self._coefficient_chunks():
+            coef[:, :, :, nodes] = coef_chunk
+        
+        util.log_debug_array(LOG, coef, "coef")
+        return self._wavelet_coefficients(coef)
+    
+    
+    def evaluate_chunked(self, writer):
+        """
+        Calculate the continuous wavelet transform of time_series, one block of
+        nodes at a time, handing each block to the write_data_slice method of
+        writer, usually a file stored WaveletCoefficients. Only the coefficients 
+        of the current block are held in memory.
+        """
+        self._configure()
+        writer.source = self.time_series
+        writer.mother = self.mother
+        writer.sample_period = self.sample_period
+        writer.frequencies = self.frequencies
+        writer.normalisation = self.normalisation
+        writer.q_ratio = self.q_ratio
+        for _, coef_chunk in self._coefficient_chunks():
+            writer.write_data_slice(self._wavelet_coefficients(coef_chunk), grow_dimension=3)
+        return writer
+    
+    
+    def _wavelet_coefficients(self, coef):
+        "Wrap coefficients, or only their power, in a WaveletCoefficients."
+        kwargs = {"power" if self.output == "power" else "array_data": coef}
+        return spectral.WaveletCoefficients(
+            source = self.time_series,
+            mother = self.mother,
+            sample_period = self.sample_period,
+            frequencies = self.frequencies,
+            normalisation = self.normalisation,
+            q_ratio = self.q_ratio,
+            use_storage = False,
+            **kwargs)
+    
+    
+    def _configure(self):
+        """
+        Validate the requested output and frequencies, and compute the
+        parameters of the wavelets at each scale.
+        """
+        self._check_output()
+        ts_shape = self.time_series.read_data_shape()
         
         if self.frequencies.step == 0:
             LOG.warning("Frequency step can't be 0! Trying default step, 2e-3.")
@@ -171,45 +235,62 @@ class ContinuousWaveletTransform(core.Type):
         elif self.normalisation == 'gabor': 
             Amp = numpy.sqrt(2.0 / numpy.pi) / sample_rate / sigma_t
         
-        coef_shape = (nf, nt, ts_shape[1], ts_shape[2], ts_shape[3])
-        
-        coef = numpy.zeros(coef_shape, dtype = numpy.complex128)
-        util.log_debug_array(LOG, coef, "coef")
-        scales = numpy.arange(0, nf, 1)
-        for i in scales:
-            f0 = freqs[i]
-            SDt = sigma_t[(0, i)]
-            A = Amp[(0, i)]
+        self._freqs, self._sigma_t, self._amp = freqs, sigma_t[0], Amp[0]
+        self._temporal_step, self._nt = temporal_step, nt
+        self._output_dtype = numpy.float64 if self.output == "power" else numpy.dtype(self.output)
+    
+    
+    def _check_output(self):
+        "Raise a ValueError if output is not one of SUPPORTED_OUTPUTS."
+        if self.output not in SUPPORTED_OUTPUTS:
+            msg = "Output is %r, must be in: %s" % (self.output, str(SUPPORTED_OUTPUTS))
+            LOG.error(msg)
+            raise ValueError(msg)
+    
+    
+    def _kernels(self, nfft):
+        """
+        Spectra, over nfft points, of the Morlet wavelets of all scales, each
+        truncated at 4 standard deviations and centred on the first sample.
+        """
+        sample_rate = self.time_series.sample_rate
+        kernels = numpy.zeros((len(self._freqs), nfft), dtype=numpy.complex128)
+        for i, (f0, SDt, A) in enumerate(zip(self._freqs, self._sigma_t, self._amp)):
             x = numpy.arange(0, 4.0 * SDt * sample_rate, 1) / sample_rate
             wvlt = A * numpy.exp(-x**2 / (2.0 * SDt**2) ) * numpy.exp(2j * numpy.pi * f0 * x )
-            wvlt = numpy.hstack((numpy.conjugate(wvlt[-1:0:-1]), wvlt))
-            #util.log_debug_array(LOG, wvlt, "wvlt")
-            
-            for var in range(ts_shape[1]):
-                for node in range(ts_shape[2]):
-                    for mode in range(ts_shape[3]):
-                        data = self.time_series.data[:, var, node, mode]
-                        wt = signal.convolve(data, wvlt, 'same')
-                        #util.log_debug_array(LOG, wt, "wt")
-                        res = wt[0::temporal_step]
-                        #NOTE: this is a horrible horrible quick hack (alas, a solution) to avoid broadcasting errors
-                        # when using dt and sample periods which are not powers of 2.
-                        coef[i, :, var, node, mode] = res if len(res) == nt else res[:coef.shape[1]] 
-                        
-        
-        util.log_debug_array(LOG, coef, "coef")
-        
-        spectra = spectral.WaveletCoefficients(
-            source = self.time_series,
-            mother = self.mother,
-            sample_period = self.sample_period,
-            frequencies = self.frequencies,
-            normalisation = self.normalisation,
-            q_ratio = self.q_ratio,
-            array_data = coef,
-            use_storage = False)
+            kernels[i, :len(wvlt)] = wvlt
+            kernels[i, nfft - len(wvlt) + 1:] = numpy.conjugate(wvlt[-1:0:-1])
+        return numpy.fft.fft(kernels, axis=1)
+    
+    
+    def _coefficient_chunks(self):
+        """
+        Yield (node slice, coefficients) for consecutive blocks of nodes.
+
+        Each channel is Fourier transformed once and multiplied by the 
+        spectra of all the wavelets, which is the convolution with the wavelets 
+        as long as the transform is padded beyond the longest wavelet. The 
+        products are folded over temporal_step before the inverse transform, 
+        so that only the retained time points are computed.
+        """
+        ts_shape = self.time_series.read_data_shape()
+        nf, step, nt = len(self._freqs), self._temporal_step, self._nt
+        max_half_width = int(numpy.ceil(4.0 * self._sigma_t.max() * self.time_series.sample_rate))
+        nfft = step * next_fast_len(int(numpy.ceil((ts_shape[0] + max_half_width - 1.0) / step)))
+        kernels = self._kernels(nfft)[:, :, numpy.newaxis]
         
-        return spectra
+        channels_per_node = ts_shape[1] * ts_shape[3]
+        chunk = int(max(1, MAX_CHUNK_MEMORY // (16 * nf * nfft * channels_per_node)))
+        for start in range(0, ts_shape[2], chunk):
+            nodes = slice(start, min(start + chunk, ts_shape[2]))
+            data = self.time_series.read_data_slice((slice(None), slice(None), nodes, slice(None)))
+            spectra = numpy.fft.fft(data.reshape((ts_shape[0], -1)), n=nfft, axis=0)
+            folded = (kernels * spectra).reshape((nf, step, nfft // step, -1)).sum(axis=1)
+            coef = numpy.fft.ifft(folded, axis=1)[:, :nt] / step
+            if self.output == "power":
+                coef = numpy.abs(coef) ** 2
+            coef = coef.astype(self._output_dtype).reshape((nf, nt, ts_shape[1], -1, ts_shape[3]))
+            yield nodes, coef
     
     
     def result_shape(self, input_shape):
@@ -229,7 +310,9 @@ class ContinuousWaveletTransform(core.Type):
         Returns the storage size in Bytes of the main result (complex array) of
         the continuous wavelet transform.
         """
-        result_size = numpy.prod(self.result_shape(input_shape)) * 2.0 * 8.0 #complex*Bytes
+        self._check_output()
+        itemsize = 8.0 if self.output == "power" else numpy.dtype(self.output).itemsize
+        result_size = numpy.prod(self.result_shape(input_shape)) * itemsize #Bytes
         return result_size
     
     
@@ -170,12 +170,14 @@ class Cortex(surfaces.CorticalSurface):
 
         return summary
 
-    def compute_local_connectivity(self):
+    def compute_local_connectivity(self, processes=1, cache_dir=None):
         """
+        Compute the local connectivity matrix from the geodesic distances within
+        its cutoff, see compute_geodesic_distance_matrix for processes and cache_dir.
         """
         LOG.info("Computing local connectivity matrix")
         loc_con_cutoff = self.local_connectivity.cutoff
-        self.compute_geodesic_distance_matrix(max_dist=loc_con_cutoff)
+        self.compute_geodesic_distance_matrix(max_dist=loc_con_cutoff, processes=processes, cache_dir=cache_dir)
 
         self.local_connectivity.matrix_gdist = self.geodesic_distance_matrix.copy()
         self.local_connectivity.compute()  # Evaluate equation based distance
@@ -48,6 +48,9 @@ LOG = get_logger(__name__)
 # give smoother results at the cost of some performance
 DEFAULT_PLOT_GRANULARITY = 1024
 
+# relative size of the tail of a finite support equation left out of its support
+SUPPORT_TOLERANCE = 1e-6
+
 
 class Equation(basic.MapAsJson, core.Type):
     "Base class for Equation data types."
@@ -110,6 +113,14 @@ class Equation(basic.MapAsJson, core.Type):
 
     pattern = property(fget=_get_pattern, fset=_set_pattern)
 
+    def support_radius(self, tolerance=SUPPORT_TOLERANCE):
+        """
+        Distance beyond which the equation differs from its value at infinite
+        distance by less than tolerance times its amplitude, or None when its
+        support is not finite.
+        """
+        return None
+
     def get_series_data(self, min_range=0, max_range=100, step=None):
         """
         NOTE: The symbol from the equation which varies should be named: var
@@ -267,6 +278,10 @@ class Gaussian(SpatialApplicableEquation, FiniteSupportEquation):
         label="Gaussian Parameters",
         default={"amp": 1.0, "sigma": 1.0, "midpoint": 0.0, "offset": 0.0})
 
+    def support_radius(self, tolerance=SUPPORT_TOLERANCE):
+        "The Gaussian falls below tolerance * amp beyond midpoint + sigma * sqrt(2 ln(1 / tolerance))."
+        return abs(self.parameters["midpoint"]) + abs(self.parameters["sigma"]) * numpy.sqrt(-2.0 * numpy.log(tolerance))
+
 
 class DoubleGaussian(FiniteSupportEquation):
     """
@@ -289,6 +304,11 @@ class DoubleGaussian(FiniteSupportEquation):
         default={"amp_1": 0.5, "sigma_1": 20.0, "midpoint_1": 0.0,
                  "amp_2": 1.0, "sigma_2": 10.0, "midpoint_2": 0.0})
 
+    def support_radius(self, tolerance=SUPPORT_TOLERANCE):
+        "The wider support of the two Gaussians."
+        return max(abs(self.parameters["midpoint_%d" % k]) +
+                   abs(self.parameters["sigma_%d" % k]) * numpy.sqrt(-2.0 * numpy.log(tolerance)) for k in (1, 2))
+
 
 class Sigmoid(SpatialApplicableEquation, FiniteSupportEquation):
     """
@@ -308,6 +328,16 @@ class Sigmoid(SpatialApplicableEquation, FiniteSupportEquation):
         label="Sigmoid Parameters",
         default={"amp": 1.0, "radius": 5.0, "sigma": 1.0, "offset": 0.0}) #"pi": numpy.pi,
 
+    def support_radius(self, tolerance=SUPPORT_TOLERANCE):
+        """
+        The Sigmoid falls below tolerance * amp beyond radius + sigma / 1.81... * ln(1 / tolerance - 1).
+        With sigma <= 0 it rises, or steps, at radius instead, and has no finite support.
+        """
+        if self.parameters["sigma"] <= 0.0:
+            return None
+        return (self.parameters["radius"] +
+                self.parameters["sigma"] / 1.8137993642342178 * numpy.log(1.0 / tolerance - 1.0))
+
 
 class GeneralizedSigmoid(TemporalApplicableEquation):
     """
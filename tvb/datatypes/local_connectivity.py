@@ -158,20 +158,21 @@ class LocalConnectivity(types_mapped.MappedType):
                                           self.METADATA_ARRAY_MEAN,
                                           self.METADATA_ARRAY_SHAPE])
 
-    def compute_sparse_matrix(self):
+    def compute_sparse_matrix(self, processes=1, cache_dir=None):
         """
         NOTE: Before calling this method, the surface field
         should already be set on the local connectivity.
 
-        Computes the sparse matrix for this local connectivity.
+        Computes the sparse matrix for this local connectivity, from geodesic
+        distances solved with processes workers, and cached in cache_dir if
+        given, see surfaces.local_geodesic_distance_matrix.
         """
         if self.surface is None:
             raise AttributeError('Require surface to compute local connectivity.')
 
-        self.matrix_gdist = surfaces.gdist.local_gdist_matrix(
-            self.surface.vertices.astype(numpy.float64),
-            self.surface.triangles.astype(numpy.int32),
-            max_distance=self.cutoff)
+        self.matrix_gdist = surfaces.local_geodesic_distance_matrix(
+            self.surface.vertices, self.surface.triangles, self.cutoff,
+            processes=processes, cache_dir=cache_dir)
 
         self.compute()
         # Avoid having a large data-set in memory.
@@ -170,7 +170,8 @@ class PrincipalComponents(MappedType):
         """Compnent time-series."""
         # TODO: Generalise -- it currently assumes 4D TimeSeriesSimulator...
         ts_shape = self.source.data.shape
-        component_ts = numpy.zeros(ts_shape)
+        # the weights may hold only the leading components
+        component_ts = numpy.zeros((ts_shape[0], ts_shape[1], self.weights.shape[0], ts_shape[3]))
         for var in range(ts_shape[1]):
             for mode in range(ts_shape[3]):
                 w = self.weights[:, :, var, mode]
@@ -185,7 +186,8 @@ class PrincipalComponents(MappedType):
         """normalised_Compnent time-series."""
         # TODO: Generalise -- it currently assumes 4D TimeSeriesSimulator...
         ts_shape = self.source.data.shape
-        component_ts = numpy.zeros(ts_shape)
+        # the weights may hold only the leading components
+        component_ts = numpy.zeros((ts_shape[0], ts_shape[1], self.weights.shape[0], ts_shape[3]))
         for var in range(ts_shape[1]):
             for mode in range(ts_shape[3]):
                 w = self.weights[:, :, var, mode]
@@ -39,6 +39,7 @@ methods that are associated with the pattern datatypes.
 
 
 import numpy
+import scipy.sparse
 from tvb.basic.traits import types_basic as basic, types_mapped
 from tvb.datatypes import arrays, surfaces, volumes, connectivity, equations
 from tvb.basic.logger.builder import get_logger
@@ -113,7 +114,17 @@ class SpatialPattern(types_mapped.MappedType):
         """
         Generate a discrete representation of the spatial pattern.
         The argument x represents a distance, or effective distance, for each node in the space.
+        It can also be a sparse matrix holding only the distances within the support of the spatial
+        equation, the others taking the value of the equation at infinite distance.
         """
+        if scipy.sparse.issparse(x):
+            self.spatial.pattern = numpy.inf
+            tail = float(self.spatial.pattern)
+            self.spatial.pattern = x.data
+            pattern = x.copy()
+            pattern.data = self.spatial.pattern - tail
+            self._spatial_pattern = numpy.asarray(pattern.sum(axis=1)) + tail * x.shape[1]
+            return
         self.spatial.pattern = x
         self._spatial_pattern = numpy.sum(self.spatial.pattern, axis=1)[:, numpy.newaxis]
 
@@ -236,16 +247,16 @@ class StimuliSurface(SpatioTemporalPattern):
         NOTE: this was previously done in simulator configure_stimuli() method.
         It no needs to be used in stimulus viewer also.
         """
-        dis_shp = (self.surface.number_of_vertices, numpy.size(self.focal_points_surface))
         # TODO: When this was in Simulator it was number of nodes, using surface vertices
         # breaks surface simulations which include non-cortical regions.
 
-        distance = numpy.zeros(dis_shp)
-        k = -1
-        for focal_point in self.focal_points_surface:
-            k += 1
-            foci = numpy.array([focal_point], dtype=numpy.int32)
-            distance[:, k] = self.surface.geodesic_distance(foci)
+        # Distances from all focal points at once, only as far as the spatial equation reaches
+        max_dist = self.spatial.support_radius()
+        if max_dist is not None:
+            max_dist = max(max_dist, 0.0)
+        distance = self.surface.geodesic_distances(self.focal_points_surface, max_dist=max_dist)
+        if max_dist is None:
+            distance = distance.toarray()
         super(StimuliSurface, self).configure_space(distance)
 
 
@@ -39,6 +39,7 @@ methods that are associated with the sensor dataTypes.
 """
 
 import numpy
+import scipy.spatial
 from tvb.datatypes import arrays
 from tvb.basic.logger.builder import get_logger
 from tvb.basic.traits import types_basic
@@ -47,6 +48,9 @@ from tvb.basic.readers import FileReader, try_get_absolute_path
 
 LOG = get_logger(__name__)
 
+# Numbers of the triangles nearest in direction to a sensor, successively searched for its surface intersection
+CANDIDATE_TRIANGLES = (32, 256)
+
 EEG_POLYMORPHIC_IDENTITY = "EEG"
 MEG_POLYMORPHIC_IDENTITY = "MEG"
 INTERNAL_POLYMORPHIC_IDENTITY = "Internal"
@@ -129,71 +133,79 @@ class Sensors(MappedType):
 
         Assumes coordinate systems are aligned, i.e. common x,y,z and origin.
 
+        The sensor directions are intersected, all at once, with the triangles
+        whose centres are the closest in direction, found with a k-d tree.
+
         """
-        # Normalize sensor and vertex locations to unit vectors
+        # Normalize sensor and triangle centre locations to unit vectors
         norm_sensors = numpy.sqrt(numpy.sum(self.locations ** 2, axis=1))
         unit_sensors = self.locations / norm_sensors[:, numpy.newaxis]
-        norm_verts = numpy.sqrt(numpy.sum(surface_to_map.vertices ** 2, axis=1))
-        unit_vertices = surface_to_map.vertices / norm_verts[:, numpy.newaxis]
+        centres = surface_to_map.triangle_centres
+        unit_centres = centres / numpy.sqrt(numpy.sum(centres ** 2, axis=1))[:, numpy.newaxis]
+        tree = scipy.spatial.cKDTree(unit_centres)
 
         sensor_locations = numpy.zeros((self.number_of_sensors, 3))
-        for k in xrange(self.number_of_sensors):
-            # Find the surface vertex most closely aligned with current sensor.
-            current_sensor = unit_sensors[k]
-            alignment = numpy.dot(current_sensor, unit_vertices.T)
-            one_ring = []
-
-            while not one_ring:
-                closest_vertex = alignment.argmax()
-                # Get the set of triangles in the neighbourhood of that vertex.
-                # NOTE: Intersection doesn't always fall within the 1-ring, so, all
-                #      triangles contained in the 2-ring are considered.
-                one_ring = surface_to_map.vertex_neighbours[closest_vertex]
-                if not one_ring:
-                    alignment[closest_vertex] = min(alignment)
-
-            local_tri = [surface_to_map.vertex_triangles[v] for v in one_ring]
-            local_tri = list(set([tri for subar in local_tri for tri in subar]))
-
-            # Calculate a parametrized plane line intersection [t,u,v] for the
-            # set of local triangles, which are considered as defining a plane.
-            tuv = numpy.zeros((len(local_tri), 3))
-            for i, tri in enumerate(local_tri):
-                edge_01 = (surface_to_map.vertices[surface_to_map.triangles[tri, 0]] -
-                           surface_to_map.vertices[surface_to_map.triangles[tri, 1]])
-                edge_02 = (surface_to_map.vertices[surface_to_map.triangles[tri, 0]] -
-                           surface_to_map.vertices[surface_to_map.triangles[tri, 2]])
-                see_mat = numpy.vstack((current_sensor, edge_01, edge_02))
-
-                tuv[i] = numpy.linalg.solve(see_mat.T, surface_to_map.vertices[surface_to_map.triangles[tri, 0].T])
-
-            # Find  which line-plane intersection falls within its triangle
-            # by imposing the condition that u, v, & u+v are contained in [0 1]
-            local_triangle_index = ((0 <= tuv[:, 1]) * (tuv[:, 1] < 1) *
-                                    (0 <= tuv[:, 2]) * (tuv[:, 2] < 1) *
-                                    (0 <= (tuv[:, 1] + tuv[:, 2])) * ((tuv[:, 1] + tuv[:, 2]) < 2)).nonzero()[0]
-
-            if len(local_triangle_index) == 1:
-                # Scale sensor unit vector by t so that it lies on the surface.
-                sensor_locations[k] = current_sensor * tuv[local_triangle_index[0], 0]
-
-            elif len(local_triangle_index) < 1:
-                # No triangle was found in proximity. Draw the sensor somehow in the surface extension area
-                LOG.warning("Could not find a proper position on the given surface for sensor %d:%s. "
-                            "with direction %s" % (k, self.labels[k], str(self.locations[k])))
-                distances = (abs(tuv[:, 1] + tuv[:, 2]))
-                local_triangle_index = distances.argmin()
-                # Scale sensor unit vector by t so that it lies on the surface.
-                sensor_locations[k] = current_sensor * tuv[local_triangle_index, 0]
-
-            else:
-                # More than one triangle was found in proximity. Pick the first.
-                # Scale sensor unit vector by t so that it lies on the surface.
-                sensor_locations[k] = current_sensor * tuv[local_triangle_index[0], 0]
+        missing = numpy.arange(self.number_of_sensors)
+        # Look for the intersection among the nearest triangles, then, for the sensors
+        # still missing, among a wider neighbourhood.
+        for number_of_candidates in CANDIDATE_TRIANGLES:
+            k = min(number_of_candidates, len(surface_to_map.triangles))
+            candidates = tree.query(unit_sensors[missing], k=k)[1].reshape((len(missing), k))
+            t, u, v = ray_triangle_intersections(unit_sensors[missing], surface_to_map.vertices,
+                                                 surface_to_map.triangles[candidates])
+
+            # Keep intersections within their triangle, in the direction of the sensor, the first one if many
+            inside = (0 <= u) & (0 <= v) & (u + v <= 1) & (0 < t)
+            found = inside.any(axis=1)
+            first = inside.argmax(axis=1)[found]
+            sensor_locations[missing[found]] = unit_sensors[missing[found]] * t[found, first][:, numpy.newaxis]
+            missing, t, u, v = missing[~found], t[~found], u[~found], v[~found]
+            if len(missing) == 0:
+                break
+
+        if numpy.isnan(t).all(axis=1).any():
+            raise ValueError("Sensors can't be mapped on degenerate triangles of the surface.")
+
+        for k, sensor in enumerate(missing):
+            # No triangle was found in proximity. Draw the sensor somehow in the surface extension area
+            LOG.warning("Could not find a proper position on the given surface for sensor %d:%s. "
+                        "with direction %s" % (sensor, self.labels[sensor], str(self.locations[sensor])))
+            local_triangle_index = numpy.nanargmin(abs(u[k] + v[k]))
+            # Scale sensor unit vector by t so that it lies on the surface.
+            sensor_locations[sensor] = unit_sensors[sensor] * t[k, local_triangle_index]
 
         return sensor_locations
 
 
+
+def ray_triangle_intersections(directions, vertices, triangles):
+    """
+    Intersections of the rays from the origin along directions, shape (n, 3),
+    with the planes of triangles, shape (n, m, 3) indices into vertices, by the
+    Moller-Trumbore algorithm. Returns the distances t along the rays, and the
+    barycentric coordinates u, v of the intersections within the triangles,
+    arrays of shape (n, m), NaN for triangles parallel to their ray or
+    degenerate. The intersection lies within its triangle when u, v >= 0 and
+    u + v <= 1.
+    """
+    v0, v1, v2 = [vertices[triangles[..., i]] for i in range(3)]
+    edge_1 = v1 - v0
+    edge_2 = v2 - v0
+    directions = directions[:, numpy.newaxis, :]
+
+    p_vec = numpy.cross(directions, edge_2)
+    det = numpy.sum(edge_1 * p_vec, axis=-1)
+    scale = numpy.sqrt(numpy.sum(edge_1 ** 2, axis=-1) * numpy.sum(edge_2 ** 2, axis=-1))
+    det[abs(det) <= numpy.finfo(det.dtype).eps * scale] = numpy.nan
+    t_vec = -v0
+    q_vec = numpy.cross(t_vec, edge_1)
+
+    u = numpy.sum(t_vec * p_vec, axis=-1) / det
+    v = numpy.sum(directions * q_vec, axis=-1) / det
+    t = numpy.sum(edge_2 * q_vec, axis=-1) / det
+    return t, u, v
+
+
 class SensorsEEG(Sensors):
     """
     EEG sensor locations are represented as unit vectors, these need to be
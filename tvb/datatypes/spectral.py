@@ -116,10 +116,16 @@ class FourierSpectrum(arrays.MappedArray):
 
     def write_data_slice(self, partial_result):
         """
-        Append chunk.
+        Append chunk. A partial result without coefficients contributes only its average powers.
         """
         # self.store_data_chunk('array_data', partial_result, grow_dimension=2, close_file=False)
 
+        if partial_result.array_data.size == 0:
+            self.store_data_chunk('average_power', partial_result.average_power, grow_dimension=2, close_file=False)
+            self.store_data_chunk('normalised_average_power', partial_result.normalised_average_power,
+                                  grow_dimension=2, close_file=False)
+            return
+
         self.store_data_chunk('array_data', partial_result.array_data, grow_dimension=2, close_file=False)
 
         partial_result.compute_amplitude()
@@ -303,20 +309,25 @@ class WaveletCoefficients(arrays.MappedArray):
         """ Power of the complex Wavelet coefficients."""
         self.power = numpy.abs(self.array_data) ** 2
 
-    def write_data_slice(self, partial_result):
+    def write_data_slice(self, partial_result, grow_dimension=2):
         """
-        Append chunk.
+        Append chunk. A partial result without coefficients contributes only its power.
         """
-        self.store_data_chunk('array_data', partial_result.array_data, grow_dimension=2, close_file=False)
+        if partial_result.array_data.size == 0:
+            self.store_data_chunk('power', partial_result.power, grow_dimension=grow_dimension, close_file=False)
+            return
+
+        self.store_data_chunk('array_data', partial_result.array_data, grow_dimension=grow_dimension,
+                              close_file=False)
 
         partial_result.compute_amplitude()
-        self.store_data_chunk('amplitude', partial_result.amplitude, grow_dimension=2, close_file=False)
+        self.store_data_chunk('amplitude', partial_result.amplitude, grow_dimension=grow_dimension, close_file=False)
 
         partial_result.compute_phase()
-        self.store_data_chunk('phase', partial_result.phase, grow_dimension=2, close_file=False)
+        self.store_data_chunk('phase', partial_result.phase, grow_dimension=grow_dimension, close_file=False)
 
         partial_result.compute_power()
-        self.store_data_chunk('power', partial_result.power, grow_dimension=2, close_file=False)
+        self.store_data_chunk('power', partial_result.power, grow_dimension=grow_dimension, close_file=False)
 
 
 class CoherenceSpectrum(arrays.MappedArray):
@@ -40,9 +40,14 @@ methods that are associated with the surfaces data.
 
 """
 
+import os
+import hashlib
+import multiprocessing
 import warnings
 import json
 import numpy
+import scipy.sparse
+import scipy.spatial
 import tvb.basic.traits.types_basic as basic
 import tvb.datatypes.arrays as arrays
 from tvb.basic.traits import util, exceptions
@@ -80,6 +85,212 @@ FACE = "Face"
 
 
 
+def local_geodesic_distance_matrix(vertices, triangles, max_dist, processes=1, cache_dir=None):
+    """
+    Sparse matrix of the geodesic distances from each vertex of a mesh to the
+    vertices within max_dist of it, as gdist.local_gdist_matrix computes it,
+    less the few distances beyond max_dist which gdist also reports, and which
+    depend on the extent of the mesh solved.
+
+    With several processes, the source vertices are split in many more
+    spatially compact blocks than processes, so that workers stay balanced.
+    A worker receives the part of the mesh that geodesics shorter than
+    max_dist from a block can cross: the triangles within max_dist, plus the
+    longest edge, of the block in Euclidean distance. It then solves each
+    source of the block on the triangles within that margin of the source.
+
+    When a cache_dir is given, the result is cached there under a hash of the
+    vertices, triangles and max_dist, so that the same mesh is solved only once.
+    """
+    vertices = numpy.ascontiguousarray(vertices, dtype=numpy.float64)
+    triangles = numpy.ascontiguousarray(triangles, dtype=numpy.int32)
+
+    if cache_dir:
+        key = hashlib.sha1(vertices.tostring())
+        key.update(triangles.tostring())
+        key.update(repr(float(max_dist)))
+        cache_file = os.path.join(cache_dir, "gdist_%s.npz" % key.hexdigest())
+        if os.path.exists(cache_file):
+            LOG.info("Loading geodesic distances from %s" % cache_file)
+            return scipy.sparse.load_npz(cache_file)
+
+    if processes <= 1:
+        dist = gdist.local_gdist_matrix(vertices, triangles, max_distance=max_dist)
+    else:
+        dist = _parallel_gdist_matrix(vertices, triangles, max_dist, processes)
+    dist.data[dist.data > max_dist] = 0.0
+    dist.eliminate_zeros()
+
+    if cache_dir:
+        if not os.path.isdir(cache_dir):
+            try:
+                os.makedirs(cache_dir)
+            except OSError:
+                # created meanwhile by a concurrent job
+                pass
+        # write aside then rename, so concurrent jobs never read a partial file
+        partial_file = "%s.%d.npz" % (cache_file[:-4], os.getpid())
+        scipy.sparse.save_npz(partial_file, dist)
+        try:
+            os.rename(partial_file, cache_file)
+        except OSError:
+            # on Windows, rename fails if a concurrent job has written the cache meanwhile
+            if not os.path.exists(cache_file):
+                raise
+            os.remove(partial_file)
+    return dist
+
+
+# number of blocks of source vertices per worker process of _parallel_gdist_matrix
+GDIST_BLOCKS_PER_PROCESS = 16
+
+
+def _parallel_gdist_matrix(vertices, triangles, max_dist, processes):
+    "Solve local geodesic distances by blocks of source vertices in a process pool."
+    edges = vertices[triangles] - vertices[numpy.roll(triangles, 1, axis=1)]
+    margin = max_dist + numpy.sqrt((edges ** 2).sum(axis=-1)).max()
+    tree = scipy.spatial.cKDTree(vertices)
+
+    # vertices of no triangle have no distances, and are not in any part of the mesh
+    in_mesh = numpy.zeros(len(vertices), dtype=numpy.bool_)
+    in_mesh[triangles] = True
+
+    args = []
+    for sources in _spatial_blocks(vertices, numpy.nonzero(in_mesh)[0], processes * GDIST_BLOCKS_PER_PROCESS):
+        centre = vertices[sources].mean(axis=0)
+        radius = numpy.sqrt(((vertices[sources] - centre) ** 2).sum(axis=1)).max()
+        inside = numpy.zeros(len(vertices), dtype=numpy.bool_)
+        inside[tree.query_ball_point(centre, radius + margin)] = True
+        sub_triangles = triangles[inside[triangles].all(axis=1)]
+        sub_vertices, sub_triangles = numpy.unique(sub_triangles, return_inverse=True)
+        sub_triangles = sub_triangles.reshape((-1, 3)).astype(numpy.int32)
+        args.append((vertices[sub_vertices], sub_triangles, max_dist, margin,
+                     numpy.searchsorted(sub_vertices, sources), sub_vertices))
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        blocks = pool.map(_gdist_block_star, args, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+    rows, cols, data = [numpy.concatenate(parts) for parts in zip(*blocks)]
+    return scipy.sparse.csc_matrix((data, (rows, cols)), shape=(len(vertices), len(vertices)))
+
+
+def _spatial_blocks(vertices, indices, number_of_blocks):
+    "Split indices into vertices in compact blocks, by median cuts along the widest axis."
+    if number_of_blocks <= 1 or len(indices) < 2:
+        return [indices]
+    points = vertices[indices]
+    axis = numpy.argmax(points.max(axis=0) - points.min(axis=0))
+    order = indices[numpy.argsort(points[:, axis])]
+    half = len(order) // 2
+    return (_spatial_blocks(vertices, order[:half], number_of_blocks // 2) +
+            _spatial_blocks(vertices, order[half:], number_of_blocks - number_of_blocks // 2))
+
+
+def _gdist_block_star(args):
+    "Unpack arguments of _gdist_block, for use with Pool.map."
+    return _gdist_block(*args)
+
+
+def _gdist_block(vertices, triangles, max_dist, margin, sources, vertex_ids):
+    """Geodesic distances from sources, on a part of a mesh, as rows, columns and values in the
+    whole mesh. Each source is solved on the triangles within margin of it, as the cost of
+    compute_gdist grows with the size of the mesh it is given."""
+    tree = scipy.spatial.cKDTree(vertices)
+    rows, cols, data = [], [], []
+    for source in sources:
+        inside = numpy.zeros(len(vertices), dtype=numpy.bool_)
+        inside[tree.query_ball_point(vertices[source], margin)] = True
+        near_triangles = triangles[inside[triangles].all(axis=1)]
+        near_vertices, near_triangles = numpy.unique(near_triangles, return_inverse=True)
+        dist = gdist.compute_gdist(vertices[near_vertices], near_triangles.reshape((-1, 3)).astype(numpy.int32),
+                                   source_indices=numpy.searchsorted(near_vertices, [source]).astype(numpy.int32),
+                                   max_distance=max_dist)
+        # as local_gdist_matrix, keep the vertices reached, other than at zero distance
+        reached = numpy.nonzero(numpy.isfinite(dist) & (dist > 0.0))[0]
+        rows.append(numpy.repeat(vertex_ids[source], len(reached)))
+        cols.append(vertex_ids[near_vertices[reached]])
+        data.append(dist[reached])
+    return numpy.concatenate(rows), numpy.concatenate(cols), numpy.concatenate(data)
+
+
+
+# mesh of the geodesic_distances worker processes, set by _init_gdist_worker
+_GDIST_MESH = {}
+
+
+def _init_gdist_worker(vertices, triangles):
+    "Keep the mesh for the geodesic distances of the following sources."
+    _GDIST_MESH["vertices"] = vertices
+    _GDIST_MESH["triangles"] = triangles
+
+
+def _gdist_column_star(args):
+    "Vertices within max_dist of a source, and their distances, for use with Pool.map."
+    source, max_dist = args
+    kwd = {} if max_dist is None else {'max_distance': max_dist}
+    dist = gdist.compute_gdist(_GDIST_MESH["vertices"], _GDIST_MESH["triangles"],
+                               source_indices=numpy.array([source], dtype=numpy.int32), **kwd)
+    if max_dist is None:
+        # vertices unreachable from the source keep an infinite distance
+        return numpy.arange(len(dist)), dist
+    rows = numpy.nonzero(numpy.isfinite(dist))[0]
+    return rows, dist[rows]
+
+
+
+class CSRSets(object):
+    """
+    Read-only list of frozensets backed by compressed sparse row arrays: item
+    k holds indices[indptr[k]:indptr[k + 1]]. This keeps mesh topology
+    (vertex neighbours, vertex triangles, edge triangles) in two integer
+    arrays, while callers index and iterate it as they would a list of sets.
+    """
+
+    def __init__(self, indptr, indices):
+        self.indptr = indptr
+        self.indices = indices
+
+    @classmethod
+    def from_pairs(cls, rows, cols, number_of_rows):
+        "Index of the unique (row, col) pairs, with the columns of each row sorted."
+        base = int(cols.max()) + 1 if cols.size else 1
+        rows, cols = numpy.divmod(numpy.unique(rows.astype(numpy.int64) * base + cols), base)
+        indptr = numpy.zeros(number_of_rows + 1, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(rows, minlength=number_of_rows), out=indptr[1:])
+        return cls(indptr, cols)
+
+    @property
+    def counts(self):
+        "Number of elements of each set."
+        return numpy.diff(self.indptr)
+
+    def to_sparse(self, number_of_columns):
+        "Boolean scipy.sparse CSR matrix with the sets as rows."
+        data = numpy.ones(self.indices.shape, dtype=numpy.bool_)
+        return scipy.sparse.csr_matrix((data, self.indices, self.indptr), shape=(len(self), number_of_columns))
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return [self[i] for i in xrange(*k.indices(len(self)))]
+        if k < 0:
+            k += len(self)
+        if not 0 <= k < len(self):
+            raise IndexError("set index out of range")
+        return frozenset(self.indices[self.indptr[k]:self.indptr[k + 1]])
+
+    def __iter__(self):
+        for k in xrange(len(self)):
+            yield self[k]
+
+
+
 # TODO: This is just a temporary solution placed here to remove dependency from tvb.basic to tvb framework.
 # As soon as we implement a better solution to the datatype framework diamond problem this should be removed.
 def paths2url(datatype_entity, attribute_name, flatten=False, parameter=None, datatype_kwargs=None):
@@ -264,6 +475,7 @@ class Surface(MappedType):
 
     # from scientific surfaces
     _vertex_neighbours = None
+    _vertex_adjacency = None
     _vertex_triangles = None
     _triangle_centres = None
     _triangle_angles = None
@@ -275,6 +487,7 @@ class Surface(MappedType):
     _edge_length_min = None
     _edge_length_max = None
     _edge_triangles = None
+    _laplace_beltrami_operators = None
 
     def _find_summary_info(self):
         """
@@ -338,13 +551,51 @@ class Surface(MappedType):
         dist = gdist.compute_gdist(verts, tris, source_indices=srcs, **kwd)
         return dist
 
+    def geodesic_distances(self, sources, max_dist=None, processes=1):
+        """
+        Calculate the geodesic distance from each of the ``sources`` vertices
+        to the vertices of the surface, out as far as ``max_dist`` (by default,
+        all the vertices), the sources being solved one after the other, or in
+        parallel by several worker ``processes``.
+
+        Returns a sparse (vertices, sources) matrix in CSC format, whose column
+        k holds the distances from sources[k] within max_dist, including the
+        explicit zero distance of sources[k] itself. Without max_dist, all the
+        distances are stored, infinite for vertices that can't be reached.
+        """
+        verts = self.vertices.astype(numpy.float64)
+        tris = self.triangles.astype(numpy.int32)
+        sources = numpy.asarray(sources, dtype=numpy.int32).ravel()
+        args = [(source, max_dist) for source in sources]
+
+        if processes <= 1 or len(sources) <= 1:
+            _init_gdist_worker(verts, tris)
+            try:
+                columns = map(_gdist_column_star, args)
+            finally:
+                _GDIST_MESH.clear()
+        else:
+            pool = multiprocessing.Pool(min(processes, len(sources)), _init_gdist_worker, (verts, tris))
+            try:
+                columns = pool.map(_gdist_column_star, args)
+            finally:
+                pool.close()
+                pool.join()
+
+        indptr = numpy.cumsum([0] + [len(rows) for rows, _ in columns])
+        indices = numpy.concatenate([rows for rows, _ in columns] + [numpy.zeros(0, dtype=numpy.int64)])
+        data = numpy.concatenate([dist for _, dist in columns] + [numpy.zeros(0)])
+        return scipy.sparse.csc_matrix((data, indices, indptr), shape=(len(verts), len(sources)))
+
     # TODO why two methods for this?
-    def compute_geodesic_distance_matrix(self, max_dist):
+    def compute_geodesic_distance_matrix(self, max_dist, processes=1, cache_dir=None):
         """
         Calculate a sparse matrix of the geodesic distance from each vertex to
         all vertices within max_dist of them on the surface,
 
         ``max_dist``: find the distance to vertices out as far as max_dist.
+        ``processes``: number of worker processes, see local_geodesic_distance_matrix.
+        ``cache_dir``: folder caching the computed matrices, if given, see local_geodesic_distance_matrix.
 
         NOTE: Compute time increases rapidly with max_dist and the memory
         efficiency of the sparse matrices decreases, so, don't use too large a
@@ -358,11 +609,11 @@ class Surface(MappedType):
         #    LOG.error("%s: The geodesic distance library didn't load" % repr(self))
         #    return
 
-        dist = gdist.local_gdist_matrix(self.vertices.astype(numpy.float64),
-                                        self.triangles.astype(numpy.int32),
-                                        max_distance=max_dist)
+        dist = local_geodesic_distance_matrix(self.vertices, self.triangles, max_dist,
+                                              processes=processes, cache_dir=cache_dir)
 
         self.geodesic_distance_matrix = dist
+        self._laplace_beltrami_operators = None
 
     @property
     def vertex_neighbours(self):
@@ -375,20 +626,12 @@ class Surface(MappedType):
 
     def _find_vertex_neighbours(self):
         """
-        .
+        Index the neighbours of each vertex, from the three edges of each triangle taken both ways.
         """
-        neighbours = [[] for _ in xrange(self.number_of_vertices)]
-        for k in xrange(self.number_of_triangles):
-            neighbours[self.triangles[k, 0]].append(self.triangles[k, 1])
-            neighbours[self.triangles[k, 0]].append(self.triangles[k, 2])
-            neighbours[self.triangles[k, 1]].append(self.triangles[k, 0])
-            neighbours[self.triangles[k, 1]].append(self.triangles[k, 2])
-            neighbours[self.triangles[k, 2]].append(self.triangles[k, 0])
-            neighbours[self.triangles[k, 2]].append(self.triangles[k, 1])
-
-        neighbours = map(frozenset, neighbours)
-
-        return neighbours
+        tri = self.triangles
+        rows = numpy.concatenate((tri[:, 0], tri[:, 0], tri[:, 1], tri[:, 1], tri[:, 2], tri[:, 2]))
+        cols = numpy.concatenate((tri[:, 1], tri[:, 2], tri[:, 0], tri[:, 2], tri[:, 0], tri[:, 1]))
+        return CSRSets.from_pairs(rows, cols, self.number_of_vertices)
 
     @property
     def vertex_triangles(self):
@@ -402,16 +645,8 @@ class Surface(MappedType):
     def _find_vertex_triangles(self):
         # self.attr calls __get__@type_mapped which is performance sensitive here
         triangles = self.triangles
-
-        vertex_triangles = [[] for _ in xrange(self.number_of_vertices)]
-        for k in xrange(self.number_of_triangles):
-            vertex_triangles[triangles[k, 0]].append(k)
-            vertex_triangles[triangles[k, 1]].append(k)
-            vertex_triangles[triangles[k, 2]].append(k)
-
-        vertex_triangles = map(frozenset, vertex_triangles)
-
-        return vertex_triangles
+        return CSRSets.from_pairs(triangles.ravel(), numpy.repeat(numpy.arange(triangles.shape[0]), 3),
+                                  self.number_of_vertices)
 
     def nth_ring(self, vertex, neighbourhood=2, contains=False):
         """
@@ -421,19 +656,22 @@ class Surface(MappedType):
         surf_obj.vertex_neighbours[vertex] setting contains=True returns all
         vertices from rings 1 to n inclusive.
         """
-
-        ring = set([vertex])
-        local_vertices = set([vertex])
+        # each ring is a product of the adjacency matrix with the previous one
+        if self._vertex_adjacency is None:
+            self._vertex_adjacency = self.vertex_neighbours.to_sparse(self.number_of_vertices)
+        adjacency = self._vertex_adjacency
+        visited = numpy.zeros(self.number_of_vertices, dtype=numpy.bool_)
+        visited[vertex] = True
+        ring = numpy.array([vertex])
 
         for _ in range(neighbourhood):
-            neighbours = [self.vertex_neighbours[indx] for indx in ring]
-            neighbours = set(vert for subset in neighbours for vert in subset)
-            ring = neighbours.difference(local_vertices)
-            local_vertices.update(ring)
+            ring = numpy.unique(adjacency[ring].indices)
+            ring = ring[~visited[ring]]
+            visited[ring] = True
 
         if contains:
-            local_vertices.discard(vertex)
-            return frozenset(local_vertices)
+            visited[vertex] = False
+            return frozenset(numpy.nonzero(visited)[0])
         return frozenset(ring)
 
     def compute_triangle_normals(self):
@@ -557,8 +795,12 @@ class Surface(MappedType):
     @property
     def edges(self):
         """
-        A sorted list of the two element tuples(vertex_0, vertex_1) representing
-        the edges of the mesh.
+        A sorted array of the (vertex_0, vertex_1) rows representing the edges
+        of the mesh, with vertex_0 < vertex_1.
+
+        NOTE: this used to be a list of tuples. A membership test such as
+        ``(v0, v1) in surface.edges`` on the array compares elements, not rows;
+        use ``v1 in surface.vertex_neighbours[v0]`` instead.
         """
         if self._edges is None:
             self._edges = self._find_edges()
@@ -566,21 +808,24 @@ class Surface(MappedType):
 
     def _find_edges(self):
         """
-        Find all the edges of the mesh surface, return them sorted as a list of
-        two element tuple, where the elements are vertex indices.
-        """
-        v0 = numpy.vstack((self.triangles[:, 0][:, numpy.newaxis],
-                           self.triangles[:, 0][:, numpy.newaxis],
-                           self.triangles[:, 1][:, numpy.newaxis]))
-        v1 = numpy.vstack((self.triangles[:, 1][:, numpy.newaxis],
-                           self.triangles[:, 2][:, numpy.newaxis],
-                           self.triangles[:, 2][:, numpy.newaxis]))
-        edges = numpy.hstack((v0, v1))
-        edges.sort(axis=1)
-        edges = set(tuple(edges[k]) for k in xrange(edges.shape[0]))
-        edges = sorted(edges)
+        Find all the edges of the mesh surface, return them sorted as an array
+        of (vertex_0, vertex_1) rows, where the elements are vertex indices.
+        """
+        edges, _ = self._find_unique_edges()
         return edges
 
+    def _find_unique_edges(self):
+        """
+        Sorted unique edges, and the index into them of the three edges (v0 v1,
+        v0 v2, v1 v2) of each triangle.
+        """
+        tri = numpy.sort(self.triangles, axis=1).astype(numpy.int64)
+        v0 = numpy.concatenate((tri[:, 0], tri[:, 0], tri[:, 1]))
+        v1 = numpy.concatenate((tri[:, 1], tri[:, 2], tri[:, 2]))
+        keys, triangle_edges = numpy.unique(v0 * self.number_of_vertices + v1, return_inverse=True)
+        edges = numpy.column_stack(numpy.divmod(keys, self.number_of_vertices))
+        return edges, triangle_edges.reshape((3, -1)).T
+
     @property
     def number_of_edges(self):
         """
@@ -645,11 +890,9 @@ class Surface(MappedType):
         return self._edge_triangles
 
     def _find_edge_triangles(self):
-        triangles = [None] * self.number_of_edges
-        for k in xrange(self.number_of_edges):
-            triangles[k] = (frozenset(self.vertex_triangles[self.edges[k][0]]) &
-                            frozenset(self.vertex_triangles[self.edges[k][1]]))
-        return triangles
+        _, triangle_edges = self._find_unique_edges()
+        return CSRSets.from_pairs(triangle_edges.ravel(), numpy.repeat(numpy.arange(triangle_edges.shape[0]), 3),
+                                  self.number_of_edges)
 
     def compute_topological_constants(self):
         """
@@ -661,9 +904,9 @@ class Surface(MappedType):
         We call isolated vertices those who do not belong to at least 3 triangles.
         """
         euler = self.number_of_vertices + self.number_of_triangles - self.number_of_edges
-        triangles_per_vertex = numpy.array(map(len, self.vertex_triangles))
+        triangles_per_vertex = self.vertex_triangles.counts
         isolated = numpy.nonzero(triangles_per_vertex < 3)
-        triangles_per_edge = numpy.array(map(len, self.edge_triangles))
+        triangles_per_edge = self.edge_triangles.counts
         pinched_off = numpy.nonzero(triangles_per_edge > 2)
         holes = numpy.nonzero(triangles_per_edge < 2)
         return euler, isolated[0], pinched_off[0], holes[0]
@@ -701,7 +944,7 @@ class Surface(MappedType):
 
         return r
 
-    def laplace_beltrami(self, fv, h=1.0):
+    def laplace_beltrami(self, fv, h=1.0, cutoff=None):
         """
         Evaluates the discrete Laplace-Beltrami operator for a given vertex-wise function
         and geodesic distance matrix. From Belkin 2008:
@@ -712,30 +955,48 @@ class Surface(MappedType):
 
           L_K^h f (w) = 1 / (4 pi h^2) sum_{t in K} area(t) / #t sum_{p in V(t)} exp(-||p - w||^2/(4*h)) (f(p) - f(w))
 
+        The sum is truncated to the vertices p within the sparse geodesic distance matrix of w, and within cutoff
+        of it when given.
 
-        :param fv: a function evaluated on each vertex, shape (n, )
+        :param fv: a function evaluated on each vertex, shape (n, ), or several of them, shape (n, m)
         :return: matrix of evaluated L-B operator
 
         """
 
-        from math import exp, pi
-
         assert fv.shape[0] == self.vertices.shape[0]
         assert hasattr(self, 'geodesic_distance_matrix')
 
-        lbo = numpy.zeros_like(fv)
-        gd = self.geodesic_distance_matrix
-        for w in range(len(self.vertices)):
-            mesh_sum = 0.0
-            for t in range(len(self.triangles)):
-                face_sum = 0.0
-                for p in self.triangles[t]:
-                    face_sum += exp(-gd[w, p] ** 2 / (4 * h)) * (fv[p] - fv[w])
-                face_sum *= self.triangle_areas[t] / 3.0
-                mesh_sum += face_sum
-            lbo[w] = mesh_sum / (4.0 * pi * h ** 2)
+        return self.laplace_beltrami_operator(h, cutoff).dot(fv)
+
+    def laplace_beltrami_operator(self, h=1.0, cutoff=None):
+        """
+        Sparse (n, n) matrix of the discrete Laplace-Beltrami operator (see laplace_beltrami), assembled once per
+        (h, cutoff) and cached on the surface, until the geodesic distance matrix is recomputed.
+        """
+        if self._laplace_beltrami_operators is None:
+            self._laplace_beltrami_operators = {}
+        if (h, cutoff) not in self._laplace_beltrami_operators:
+            self._laplace_beltrami_operators[h, cutoff] = self._find_laplace_beltrami_operator(h, cutoff)
+        return self._laplace_beltrami_operators[h, cutoff]
+
+    def _find_laplace_beltrami_operator(self, h, cutoff):
+        """
+        Assemble the Laplace-Beltrami operator from the geodesic distance matrix: each vertex p contributes
+        with a third of the area of each of its triangles.
+        """
+        gd = scipy.sparse.coo_matrix(self.geodesic_distance_matrix)
+        if cutoff is not None:
+            within = gd.data <= cutoff
+            gd = scipy.sparse.coo_matrix((gd.data[within], (gd.row[within], gd.col[within])), shape=gd.shape)
+
+        vertex_areas = numpy.bincount(self.triangles.ravel(), minlength=self.vertices.shape[0],
+                                      weights=numpy.repeat(self.triangle_areas[:, 0] / 3.0, 3))
+        weights = numpy.exp(-gd.data ** 2 / (4 * h)) * vertex_areas[gd.col]
+        kernel = scipy.sparse.csr_matrix((weights, (gd.row, gd.col)), shape=gd.shape)
 
-        return lbo
+        # sum_p k(w, p) (f(p) - f(w)) = (K f)(w) - (sum_p k(w, p)) f(w)
+        operator = kernel - scipy.sparse.diags(numpy.asarray(kernel.sum(axis=1)).ravel())
+        return scipy.sparse.csr_matrix(operator / (4.0 * numpy.pi * h ** 2))
 
     # TODO
     def scientific_validate(self):
@@ -758,7 +1019,11 @@ class Surface(MappedType):
         equation - the equation which should be evaluated
         """
         focal_points = numpy.array(focal_points, dtype=numpy.int32)
-        dist = self.geodesic_distance(focal_points)
+        # beyond its support the equation takes its value at infinite distance
+        max_dist = equation.support_radius()
+        if max_dist is not None:
+            max_dist = max(max_dist, 0.0)
+        dist = self.geodesic_distance(focal_points, max_dist=max_dist)
         equation.pattern = dist
         return equation.pattern
 
@@ -170,3 +170,34 @@ def cu_delay_cfun(horizon, cfpre, cfpost, n_cvar, n_thread_per_block, step_strid
             )
 
     return dcfun
+
+
+def nb_sparse_delay_cfun(cfpre, cfpost):
+    """
+    Construct Numba compiled function for delayed coupling with given pre & post
+    summation functions, for a sparse weights matrix in CSR form, whose delayed
+    state is read directly from the circular history buffer.
+
+    """
+
+    from numba import njit
+
+    @njit
+    def cfun(out, buf, step, row_ptr, col, weights, idelays):
+        n_time, n_cvar, n_node, n_mode = buf.shape
+        i_now = (step - 1) % n_time
+        for i_cvar in range(n_cvar):
+            for i_post in range(n_node):
+                for i_mode in range(n_mode):
+                    xi = buf[i_now, i_cvar, i_post, i_mode]
+                    gx = 0.0
+                    for k in range(row_ptr[i_post], row_ptr[i_post + 1]):
+                        # avoid integer modulo in inner loop
+                        i_delayed = i_now - idelays[k]
+                        if i_delayed < 0:
+                            i_delayed += n_time
+                        xj = buf[i_delayed, i_cvar, col[k], i_mode]
+                        gx += weights[k] * cfpre(xi, xj)
+                    out[i_cvar, i_post, i_mode] = cfpost(gx)
+
+    return cfun
@@ -61,4 +61,14 @@ def cu_expr(expr, parameters, constants, return_fn=False):
     cu_fn = numba.cuda.jit(device=True)(fn)
     if return_fn:
         return cu_fn, fn
-    return cu_fn
\ No newline at end of file
+    return cu_fn
+
+def nb_expr(expr, parameters, constants):
+    "Generate Numba compiled function for given expression, with parameters and constants."
+    ns = {}
+    template = "from math import *\ndef fn(%s):\n    return %s"
+    for name, value in constants.items():
+        ns[name] = float(value)
+    template %= ', '.join(parameters), expr
+    exec template in ns
+    return numba.njit(ns['fn'])
@@ -264,3 +264,15 @@ def zip_directory(path, zip_file):
         for filename in files:
             zip_file.write(os.path.join(dirname, filename))
         zip_file.close()
+
+
+def replace_file(src, dst):
+    """
+    Rename src to dst, replacing dst if it exists. On Windows, os.rename
+    fails if dst exists, so it is removed first, which leaves a short window
+    without dst.
+
+    """
+    if os.name == 'nt' and os.path.exists(dst):
+        os.remove(dst)
+    os.rename(src, dst)
@@ -147,6 +147,30 @@ class SparseCoupling(Coupling):
 
     """
 
+    use_numba = basic.Bool(
+        label="Use Numba",
+        default=False,
+        required=False,
+        order=-1,
+        doc="""Compute coupling with a compiled kernel reading the history
+        buffer directly, generated from `pre_expr` and `post_expr`. Requires
+        both expressions and scalar parameters, otherwise the NumPy
+        implementation is used. The compiled kernel writes into the same
+        output array at every call, which is only valid until the next call.""")
+
+    # expressions of pre & post in terms of x_i, x_j & gx, for the compiled implementation;
+    # subclasses which do not provide both are computed with NumPy
+    pre_expr = None
+    post_expr = None
+
+    # (n_cvar, constants, key) of the expressions, reset when a parameter is set
+    _cached_constants = None
+
+    def __setattr__(self, name, value):
+        super(SparseCoupling, self).__setattr__(name, value)
+        if name in self.trait:
+            self._cached_constants = None
+
     def _lri(self, nnz_row_el_idx):
         "Flat array of indices afferent, non-zero-weight connections."
         if not hasattr(self, '_cached_lri'):
@@ -156,8 +180,69 @@ class SparseCoupling(Coupling):
             LOG.debug('lri.size %d nzr.size %d', self._cached_lri.size, self._cached_nzr.size)
         return self._cached_lri, self._cached_nzr
 
+    def _expr_constants(self, history):
+        """Scalar parameter values used by the expressions and a hashable key of them,
+        or (None, None) if any parameter is not scalar."""
+        if self._cached_constants is None or self._cached_constants[0] != history.n_cvar:
+            constants = {'n_cvar': history.n_cvar}
+            for name in self.trait.keys():
+                if name == 'use_numba':
+                    continue
+                value = numpy.asarray(getattr(self, name))
+                if value.size != 1:
+                    constants = None
+                    break
+                constants[name] = float(value.flat[0])
+            key = None if constants is None else tuple(sorted(constants.items()))
+            self._cached_constants = history.n_cvar, constants, key
+        return self._cached_constants[1:]
+
+    def _warn_numba(self, reason):
+        if not getattr(self, '_warned_numba', False):
+            LOG.warning('%s %s, using NumPy implementation', self.__class__.__name__, reason)
+            self._warned_numba = True
+
+    def _numba_cfun(self, history):
+        "Compiled coupling function for current parameters, or None if not available."
+        if self.pre_expr is None or self.post_expr is None:
+            self._warn_numba('does not provide pre_expr and post_expr')
+            return None
+        constants, key = self._expr_constants(history)
+        if constants is None:
+            self._warn_numba('has non-scalar parameters')
+            return None
+        if getattr(self, '_cached_cfun_key', None) != key:
+            from ._numba.util import nb_expr
+            from ._numba.coupling import nb_sparse_delay_cfun
+            cfpre = nb_expr(self.pre_expr, ('x_i', 'x_j'), constants)
+            cfpost = nb_expr(self.post_expr, ('gx', ), constants)
+            self._cached_cfun = nb_sparse_delay_cfun(cfpre, cfpost)
+            self._cached_cfun_key = key
+            LOG.debug('compiled %s coupling pre %r post %r', self.__class__.__name__, self.pre_expr, self.post_expr)
+        return self._cached_cfun
+
+    def _row_ptr(self, history):
+        "CSR row pointer of the afferent, non-zero-weight connections."
+        if getattr(self, '_cached_row_ptr', None) is None or self._cached_row_ptr.size != history.n_node + 1:
+            self._cached_row_ptr = numpy.searchsorted(history.nnz_row_el_idx, numpy.r_[:history.n_node + 1])
+        return self._cached_row_ptr
+
+    def _call_numba(self, cfun, step, history):
+        "Evaluate the compiled kernel into an output array which is reused by later calls."
+        h = history # type: SparseHistory
+        shape = h.n_cvar, h.n_node, h.n_mode
+        out = getattr(self, '_cached_out', None)
+        if out is None or out.shape != shape or out.dtype != h.buffer.dtype:
+            out = self._cached_out = numpy.empty(shape, h.buffer.dtype)
+        cfun(out, h.buffer, step, self._row_ptr(h), h.nnz_col_el_idx, h.nnz_weights, h.nnz_idelays)
+        return out
+
     def __call__(self, step, history):
         h = history # type: SparseHistory
+        if self.use_numba:
+            cfun = self._numba_cfun(h)
+            if cfun is not None:
+                return self._call_numba(cfun, step, h)
         x_i, x_j = h.query_sparse(step)
         assert x_i.shape == (h.n_cvar, h.n_node, h.n_mode)
         assert x_j.shape == (h.n_cvar, h.n_nnzw, h.n_mode)
@@ -176,6 +261,7 @@ class SparseCoupling(Coupling):
         sum[:, nzr] = numpy.add.reduceat(weights_col * pre, lri, axis=1)
         return self.post(sum)
 
+
 class Linear(SparseCoupling):
     r"""
     Provides a linear coupling function of the following form
@@ -200,6 +286,9 @@ class Linear(SparseCoupling):
             "the absolute difference between different values.",
         order=2)
 
+    pre_expr = 'x_j'
+    post_expr = 'a * gx + b'
+
     def post(self, gx):
         return self.a * gx + self.b
 
@@ -222,6 +311,9 @@ class Scaling(SparseCoupling):
         doc="Rescales the connection strength while maintaining "
             "the ratio between different values.")
 
+    pre_expr = 'x_j'
+    post_expr = 'a * gx'
+
     def post(self, gx):
         return self.a * gx
 
@@ -269,6 +361,9 @@ class HyperbolicTangent(SparseCoupling):
         doc="Standard deviation of the coupling",
         order=4)
 
+    pre_expr = 'a * (1 + tanh((b * x_j - midpoint) / sigma))'
+    post_expr = 'gx'
+
     def pre(self, x_i, x_j):
         return self.a * (1 +  numpy.tanh((self.b * x_j - self.midpoint) / self.sigma))
 
@@ -499,6 +594,9 @@ class Difference(SparseCoupling):
     def __str__(self):
         return simple_gen_astr(self, 'a')
 
+    pre_expr = 'x_j - x_i'
+    post_expr = 'a * gx'
+
     def pre(self, x_i, x_j):
         return x_j - x_i
 
@@ -515,7 +613,6 @@ class Kuramoto(SparseCoupling):
     
     """
    
-
     a = arrays.FloatArray(
         label=":math:`a`",
         default=numpy.array([1.0,]),
@@ -526,6 +623,9 @@ class Kuramoto(SparseCoupling):
     def __str__(self):
         return simple_gen_astr(self, 'a')
 
+    pre_expr = 'sin(x_j - x_i)'
+    post_expr = 'a / n_cvar * gx'
+
     def pre(self, x_i, x_j):
         return numpy.sin(x_j - x_i)
 
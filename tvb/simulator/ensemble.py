@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+
+"""
+Ensemble simulation of parameter sweeps.
+
+Parameter exploration typically requires running the same network many times
+with different coupling strengths, conduction speeds, noise levels or model
+parameters. The EnsembleSimulator advances all those parameter sets together:
+instances are stacked along the node axis, so that state, history, coupling
+and monitor buffers carry all instances, and each integration step is a single
+set of NumPy calls for the whole ensemble, instead of one Python loop per
+parameter set.
+
+"""
+
+import numpy
+import tvb.basic.traits.types_basic as basic
+from .common import get_logger
+from .coupling import SparseCoupling
+from .history import EnsembleHistory
+from .simulator import Simulator
+from . import monitors
+
+
+LOG = get_logger(__name__)
+
+
+class EnsembleSimulator(Simulator):
+    """
+    A Simulator which runs an ensemble of instances of the same region
+    network, differing only in the values of the parameters given in `sweep`.
+
+    Parameters are swept per instance, and each value may be a scalar or an
+    array with one value per region. Coupling parameters are applied per
+    target node, so only parameters used after the summation over afferents
+    (e.g. `a` and `b` of `Linear`) can be swept.
+
+    """
+
+    sweep = basic.Dict(
+        label="Parameter sweep",
+        default={},
+        required=True,
+        order=-1,
+        doc="""Maps simulator attribute paths, e.g. 'coupling.a', 'model.tau',
+        'integrator.noise.nsig' or 'connectivity.speed', to sequences of
+        values, one per instance of the ensemble.""")
+
+    # monitors which treat nodes independently and so do not mix instances
+    _node_wise_monitors = (monitors.Raw, monitors.SubSample, monitors.TemporalAverage, monitors.Bold)
+
+    n_instance = None
+    _excluded_model_params = ("state_variable_range", "variables_of_interest", "noise", "psi_table", "nerf_table")
+
+    @property
+    def good_history_shape(self):
+        "Returns expected history shape."
+        return self.horizon, len(self.model.state_variables), self.number_of_nodes, self.model.number_of_modes
+
+    def preconfigure(self):
+        "Configure the basic fields and check the ensemble can be run."
+        super(EnsembleSimulator, self).preconfigure()
+        if self.surface is not None:
+            raise ValueError("EnsembleSimulator only supports region simulations.")
+        if not isinstance(self.coupling, SparseCoupling):
+            raise ValueError("EnsembleSimulator requires a SparseCoupling, not %r." % (self.coupling, ))
+        for monitor in self.monitors:
+            if not isinstance(monitor, self._node_wise_monitors):
+                raise ValueError("Monitor %r mixes nodes of different instances, and is not "
+                                 "supported by EnsembleSimulator." % (monitor, ))
+        sizes = set(len(values) for values in self.sweep.values())
+        if len(sizes) != 1:
+            raise ValueError("Sweep must provide the same, non-zero number of values for each "
+                             "parameter, found %r." % (sorted(sizes), ))
+        self.n_instance, = sizes
+        self.number_of_nodes = self.n_instance * self.connectivity.number_of_regions
+        LOG.info('Ensemble of %d instances, %d total nodes', self.n_instance, self.number_of_nodes)
+
+    def configure(self, full_configure=True):
+        """Configure the ensemble: spread the swept parameter values over the
+        stacked nodes, then configure as a regular simulator."""
+        if full_configure:
+            self.preconfigure()
+        self._configure_sweep()
+        return super(EnsembleSimulator, self).configure(full_configure=False)
+
+    def _per_node(self, values):
+        "Spread per instance values, scalar or per region, over the stacked node axis."
+        values = numpy.asarray(values, dtype=numpy.float64)
+        n_reg = self.connectivity.number_of_regions
+        if values.shape == (self.n_instance, ):
+            return numpy.repeat(values, n_reg)
+        elif values.shape == (self.n_instance, n_reg):
+            return values.reshape((-1, ))
+        else:
+            raise ValueError("Sweep values must have shape %r or %r, not %r."
+                             % ((self.n_instance, ), (self.n_instance, n_reg), values.shape))
+
+    def _configure_sweep(self):
+        "Set swept parameters and tile the unswept spatialized model parameters."
+        n_reg = self.connectivity.number_of_regions
+        for param in self.model.trait.keys():
+            if param in self._excluded_model_params or 'model.' + param in self.sweep:
+                continue
+            value = getattr(self.model, param)
+            if getattr(value, 'size', 0) == n_reg:
+                setattr(self.model, param, numpy.tile(value.reshape((-1, )), self.n_instance))
+        for path, values in self.sweep.items():
+            if path == 'connectivity.speed':
+                continue
+            owner_path, _, name = path.rpartition('.')
+            owner = self
+            for attr in owner_path.split('.'):
+                owner = getattr(owner, attr)
+            if not hasattr(owner, name):
+                raise AttributeError("Cannot sweep %r: %r has no attribute %r." % (path, owner, name))
+            value = self._per_node(values)
+            if owner is self.coupling:
+                # coupling output is (n_cvar, n_node, n_mode)
+                value = value.reshape((-1, 1))
+            elif owner is getattr(self.integrator, 'noise', None) and name == 'nsig':
+                # noise is generated per state variable, node and mode
+                value = numpy.tile(value.reshape((1, -1, 1)), (self.model.nvar, 1, self.model.number_of_modes))
+            setattr(owner, name, value)
+        self.model.update_derived_parameters()
+        if any(path.startswith('integrator.noise.') for path in self.sweep):
+            self._configure_swept_noise()
+
+    def _configure_swept_noise(self):
+        "Reconfigure the integrator's noise for the stacked nodes after sweeping its parameters."
+        noise = self.integrator.noise
+        shape = self.model.nvar, self.number_of_nodes, self.model.number_of_modes
+        if noise.ntau > 0.0:
+            noise.configure_coloured(self.integrator.dt, shape)
+        else:
+            noise.configure_white(self.integrator.dt, shape)
+
+    def _configure_stimuli(self):
+        "Apply region stimuli to each instance."
+        if self.stimulus is not None:
+            n_reg = self.connectivity.number_of_regions
+            self.stimulus.configure_space(numpy.tile(numpy.r_[:n_reg], self.n_instance))
+
+    def _nnz_idelays(self):
+        "Delays in integration steps of the non-zero weights, per instance."
+        conn = self.connectivity
+        mask = conn.weights != 0.0
+        speeds = self.sweep.get('connectivity.speed')
+        if speeds is None:
+            nnz_delays = numpy.tile(conn.delays[mask], (self.n_instance, 1))
+        else:
+            speeds = numpy.asarray(speeds, dtype=numpy.float64).reshape((-1, 1))
+            nnz_delays = conn.tract_lengths[mask] / speeds
+        return numpy.rint(nnz_delays / self.integrator.dt).astype(numpy.int32)
+
+    def _configure_history(self, initial_conditions):
+        "Set the ensemble's horizon and tile region initial conditions over instances."
+        self.horizon = self._nnz_idelays().max() + 1
+        if initial_conditions is not None:
+            if initial_conditions.shape[2] == self.connectivity.number_of_regions:
+                initial_conditions = numpy.tile(initial_conditions, (1, 1, self.n_instance, 1))
+        super(EnsembleSimulator, self)._configure_history(initial_conditions)
+
+    def _make_history(self):
+        return EnsembleHistory(
+            self.connectivity.weights,
+            self._nnz_idelays(),
+            self.model.cvar,
+            self.model.number_of_modes
+        )
+
+    def split_instances(self, data):
+        """
+        Reshape data of stacked nodes, with shape (..., n_node, n_mode), to
+        (n_instance, ..., n_region, n_mode).
+
+        """
+        n_reg = self.connectivity.number_of_regions
+        shape = data.shape[:-2] + (self.n_instance, n_reg, data.shape[-1])
+        return numpy.rollaxis(data.reshape(shape), -3)
+
+    def _has_stacked_nodes(self, data):
+        "Whether data is an array with the stacked node axis, as produced by node-wise monitors."
+        return isinstance(data, numpy.ndarray) and data.ndim >= 2 and data.shape[-2] == self.number_of_nodes
+
+    def run(self, **kwds):
+        """Convenience method to call the simulator with **kwds and collect output
+        data, with an instance leading axis, i.e. (n_instance, n_time, n_voi, n_region, n_mode).
+
+        Output read back from monitor sinks, e.g. an empty array if nothing was
+        recorded or an HDF5 dataset, is returned as is, with stacked nodes."""
+        output = []
+        for t, x in super(EnsembleSimulator, self).run(**kwds):
+            if self._has_stacked_nodes(x):
+                x = self.split_instances(x)
+            output.append((t, x))
+        return output
@@ -37,6 +37,7 @@ Simulator history implementations.
 """
 
 
+import tempfile
 import numpy
 from tvb.simulator.common import get_logger
 from .descriptors import StaticAttr, Dim, NDArray
@@ -179,6 +180,154 @@ class SparseHistory(DenseHistory):
         return nbytes
 
 
+class MemmapHistory(SparseHistory):
+    """
+    Sparse history whose circular buffer is a memory-mapped temporary file, for
+    simulations where long delays make the buffer too large to hold in memory.
+
+    The last n_hot steps are also kept in an in-memory ring, from which current
+    state and connections with delays shorter than n_hot are read, so that only
+    long delays go through the file. New states are written to both.
+
+    """
+
+    n_hot = Dim()
+    hot = NDArray(('n_hot', 'n_cvar', 'n_node', 'n_mode'), 'f', read_only=False)
+    buffer = None # type: numpy.memmap
+
+    # non-zero weights, split by whether they are read from the hot ring or the file
+    _hot_nnz = _cold_nnz = None
+    _hot_const_indices = _cold_const_indices = None
+    # last step held by the hot ring, None if out of sync with the buffer
+    _hot_step = None
+    _file = None
+
+    def __init__(self, weights, delays, cvars, n_mode, n_hot=None, directory=None, hot_nbytes=2**26):
+        """
+        :param n_hot: number of steps kept in memory, by default as many as fit in hot_nbytes
+        :param directory: where to create the buffer file, by default the system temporary directory
+        """
+        super(MemmapHistory, self).__init__(weights, delays, cvars, n_mode)
+        if n_hot is None:
+            n_hot = hot_nbytes // (self.time_stride * numpy.dtype('f').itemsize)
+        self.n_hot = int(max(1, min(n_hot, self.n_time)))
+        self._hot_nnz, = numpy.nonzero(self.nnz_idelays < self.n_hot)
+        self._cold_nnz, = numpy.nonzero(self.nnz_idelays >= self.n_hot)
+        self._hot_const_indices = self.const_indices[:, self._hot_nnz]
+        self._cold_const_indices = self.const_indices[:, self._cold_nnz]
+        self._file = tempfile.TemporaryFile(prefix='tvb-history-', dir=directory)
+        self.buffer = numpy.memmap(self._file, dtype='f', mode='w+',
+                                   shape=(self.n_time, self.n_cvar, self.n_node, self.n_mode))
+        LOG.info('history buffer of %.2f MB mapped from disk, %d of %d non-zero weights read from %d hot steps',
+                 self.buffer.nbytes*2**-20, self._hot_nnz.size, self.n_nnzw, self.n_hot)
+
+    def initialize(self, init, start=0):
+        "Write init to the buffer from time index start, so that it may be filled block by block."
+        if init.shape[1] > len(self.cvars):
+            init = init[:, self.cvars]
+        self.buffer[start:start + init.shape[0]] = init
+        self.buffer.flush()
+        self._hot_step = None
+
+    def _sync_hot(self, step):
+        "Ensure the hot ring holds the steps preceding step."
+        if self._hot_step != step - 1:
+            steps = numpy.r_[step - self.n_hot:step]
+            self.hot[steps % self.n_hot] = self.buffer[steps % self.n_time]
+            self._hot_step = step - 1
+
+    def update(self, step, new_state):
+        state = new_state[self.cvars]
+        self.buffer[step % self.n_time] = state
+        self.hot[step % self.n_hot] = state
+        self._hot_step = step if self._hot_step == step - 1 else None
+
+    def _query_split(self, time_indices, const_shape):
+        "Gather delayed states for (..., n_nnzw) time indices from the hot ring and the buffer."
+        out = numpy.empty(const_shape, 'f')
+        hot_t = time_indices[..., self._hot_nnz, numpy.newaxis] % self.n_hot
+        out[..., self._hot_nnz, :] = self.hot.take(hot_t * self.time_stride + self._hot_const_indices)
+        if self._cold_nnz.size:
+            cold_t = time_indices[..., self._cold_nnz, numpy.newaxis] % self.n_time
+            out[..., self._cold_nnz, :] = self.buffer.take(cold_t * self.time_stride + self._cold_const_indices)
+        return out
+
+    def query_sparse(self, step):
+        self._sync_hot(step)
+        time_indices = step - 1 - self.nnz_idelays
+        delayed_state = self._query_split(time_indices, (self.n_cvar, self.n_nnzw, self.n_mode))
+        current_state = self.hot[(step - 1) % self.n_hot]
+        return current_state, delayed_state
+
+    @property
+    def nbytes(self):
+        "Bytes held in memory, i.e. excluding the buffer file."
+        arrays = ('nnz_mask const_indices nnz_idelays nnz_row_el_idx nnz_col_el_idx nnz_weights nnz_row_idx '
+                  'es_icvar es_idelays es_weights es_node_ids').split()
+        nbytes = sum([getattr(self, ary).nbytes for ary in arrays])
+        nbytes += BaseHistory.nbytes.fget(self)
+        if self.n_hot is not None:
+            nbytes += self.hot.nbytes
+        return nbytes
+
+
+class EnsembleHistory(SparseHistory):
+    """
+    Sparse history for an ensemble of networks which share a weights matrix but
+    not necessarily their delays. Instances are stacked along the node axis, i.e.
+    node ``i * n_region + j`` is region ``j`` of instance ``i``, so that coupling
+    functions see one block-diagonal network, but no (n_node, n_node) array is
+    ever built: the non-zero weights are tiled over instances and only the
+    delays are stored per instance.
+
+    Only the sparse query is available, so this history must be used with
+    subclasses of SparseCoupling.
+
+    """
+
+    n_instance = Dim()
+    n_region = Dim()
+
+    def __init__(self, weights, nnz_idelays, cvars, n_mode):
+        """
+        :param weights: (n_region, n_region) weights shared by all instances
+        :param nnz_idelays: (n_instance, n_nnz) delays in steps of the non-zero weights,
+                            in the order of ``numpy.argwhere(weights != 0)``
+        """
+        n_instance, n_nnz = nnz_idelays.shape
+        n_region = weights.shape[0]
+        self.n_instance, self.n_region = n_instance, n_region
+        self.n_time = int(nnz_idelays.max()) + 1 if nnz_idelays.size else 1
+        self.n_cvar, self.n_node, self.n_mode = len(cvars), n_instance * n_region, n_mode
+        self.cvars = cvars
+        self.time_stride = self.n_cvar * self.n_node * self.n_mode
+        # tile non-zero structure of one instance over the ensemble
+        row, col = numpy.argwhere(weights != 0.0).T
+        offsets = (numpy.r_[:n_instance] * n_region).reshape((-1, 1))
+        self.n_nnzw = n_instance * n_nnz
+        self.nnz_weights = numpy.tile(weights[row, col], n_instance)
+        self.nnz_row_el_idx = (offsets + row).reshape((-1, ))
+        self.nnz_col_el_idx = (offsets + col).reshape((-1, ))
+        nnz_row_idx = numpy.unique(self.nnz_row_el_idx)
+        self.n_nnzr = len(nnz_row_idx)
+        self.nnz_row_idx = nnz_row_idx
+        self.nnz_idelays = nnz_idelays.reshape((-1, ))
+        # build const indices
+        n, m = self.n_node, self.n_mode
+        icvars_ = numpy.r_[:len(cvars)].reshape((-1, 1, 1)) * n * m
+        nodes_ = self.nnz_col_el_idx[:, numpy.newaxis] * m
+        modes_ = numpy.r_[:m]
+        self.const_indices = icvars_ + nodes_ + modes_
+
+        LOG.info('ensemble history has n_instance=%d n_time=%d n_cvar=%d n_node=%d n_mode=%d, requires %.2f MB',
+                 self.n_instance, self.n_time, self.n_cvar, self.n_node, self.n_mode, self.nbytes*2**-20)
+
+    @property
+    def nbytes(self):
+        arrays = 'const_indices nnz_idelays nnz_row_el_idx nnz_col_el_idx nnz_weights nnz_row_idx buffer'.split()
+        return sum([getattr(self, ary).nbytes for ary in arrays])
+
+
 # implement in order  NumPy, Numba & OpenCL versions
 
 # simulator.history becomes impl instance
@@ -32,9 +32,9 @@ Hindmarsh-Rose-Jirsa Epileptor model.
 """
 
 from .base import ModelNumbaDfun, LOG, numpy, basic, arrays
-from numba import guvectorize, float64
+from numba import guvectorize, float32, float64
 
-@guvectorize([(float64[:],) * 18], '(n),(m)' + ',()'*15 + '->(n)', nopython=True)
+@guvectorize([(float32[:],) * 18, (float64[:],) * 18], '(n),(m)' + ',()'*15 + '->(n)', nopython=True)
 def _numba_dfun(y, c_pop, x0, Iext, Iext2, a, b, slope, tt, Kvf, c, d, r, Ks, Kf, aa, tau, ydot):
     "Gufunc for Hindmarsh-Rose-Jirsa Epileptor model equations."
 
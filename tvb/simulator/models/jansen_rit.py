@@ -33,7 +33,7 @@ Jansen-Rit and derivative models.
 
 from .base import ModelNumbaDfun, Model, LOG, numpy, basic, arrays
 import math
-from numba import guvectorize, float64
+from numba import guvectorize, float32, float64
 
 class JansenRit(ModelNumbaDfun):
     r"""
@@ -312,7 +312,7 @@ class JansenRit(ModelNumbaDfun):
         return deriv.T[..., numpy.newaxis]
 
 
-@guvectorize([(float64[:],) * 17], '(n),(m)' + ',()'*14 + '->(n)', nopython=True)
+@guvectorize([(float32[:],) * 17, (float64[:],) * 17], '(n),(m)' + ',()'*14 + '->(n)', nopython=True)
 def _numba_dfun_jr(y, c,
                    src,
                    nu_max, r, v0, a, a_1, a_2, a_3, a_4, A, b, B, J, mu,
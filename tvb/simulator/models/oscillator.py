@@ -33,7 +33,7 @@ Oscillator models.
 
 from .base import Model, ModelNumbaDfun, LOG, numpy, basic, arrays
 import numexpr
-from numba import guvectorize, float64
+from numba import guvectorize, float32, float64
 
 
 
@@ -418,7 +418,7 @@ class Generic2dOscillator(ModelNumbaDfun):
         return deriv.T[..., numpy.newaxis]
 
 
-@guvectorize([(float64[:],) * 16], '(n),(m)' + ',()'*13 + '->(n)', nopython=True)
+@guvectorize([(float32[:],) * 16, (float64[:],) * 16], '(n),(m)' + ',()'*13 + '->(n)', nopython=True)
 def _numba_dfun_g2d(vw, c_0, tau, I, a, b, c, d, e, f, g, beta, alpha, gamma, lc_0, dx):
     "Gufunc for reduced Wong-Wang model equations."
     V = vw[0]
@@ -523,7 +523,7 @@ class Kuramoto(Model):
         I = coupling[0, :] + local_range_coupling
 
         if not hasattr(self, 'derivative'):
-            self.derivative = numpy.empty((1,) + theta.shape)
+            self.derivative = numpy.empty((1,) + theta.shape, theta.dtype)
 
         # phase update
         self.derivative[0] = self.omega + I
@@ -32,9 +32,9 @@ Models based on Wong-Wang's work.
 """
 
 from .base import ModelNumbaDfun, LOG, numpy, basic, arrays
-from numba import guvectorize, float64
+from numba import guvectorize, float32, float64
 
-@guvectorize([(float64[:],)*11], '(n),(m)' + ',()'*8 + '->(n)', nopython=True)
+@guvectorize([(float32[:],) * 11, (float64[:],) * 11], '(n),(m)' + ',()'*8 + '->(n)', nopython=True)
 def _numba_dfun(S, c, a, b, d, g, ts, w, j, io, dx):
     "Gufunc for reduced Wong-Wang model equations."
 
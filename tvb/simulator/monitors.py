@@ -102,8 +102,13 @@ class Monitor(core.Type):
 
     istep = None
     dt = None
+    dtype = None
     voi = None
+    # optional tvb.simulator.sinks.Sink receiving recorded samples
+    sink = None
     _stock = numpy.empty([])
+    # names of array attributes which carry state from one step to the next
+    _runtime_state = ()
 
     def __str__(self):
         clsname = self.__class__.__name__
@@ -121,6 +126,7 @@ class Monitor(core.Type):
 
         """
         self.dt = simulator.integrator.dt
+        self.dtype = simulator.dtype
         self.istep = iround(self.period / self.dt)
         self.voi = self.variables_of_interest
         if self.voi is None or self.voi.size == 0:
@@ -131,11 +137,15 @@ class Monitor(core.Type):
 
         This is a final method called by the simulator to obtain samples from a
         monitor instance. Monitor subclasses should not override this method, but
-        rather implement the `sample` method.
+        rather implement the `sample` method. Samples are also appended to
+        the monitor's sink, if one is set.
 
         """
 
-        return self.sample(step, observed)
+        sample = self.sample(step, observed)
+        if sample is not None and self.sink is not None:
+            self.sink.append(*sample)
+        return sample
 
     def sample(self, step, state):
         """
@@ -360,6 +370,7 @@ class TemporalAverage(Monitor):
 
     """
     _ui_name = "Temporal average"
+    _runtime_state = ('_stock', )
 
     def config_for_sim(self, simulator):
         super(TemporalAverage, self).config_for_sim(simulator)
@@ -367,7 +378,7 @@ class TemporalAverage(Monitor):
                       simulator.number_of_nodes,
                       simulator.model.number_of_modes)
         LOG.debug("Temporal average stock_size is %s" % (str(stock_size), ))
-        self._stock = numpy.zeros(stock_size)
+        self._stock = numpy.zeros(stock_size, self.dtype)
 
 
     def sample(self, step, state):
@@ -387,6 +398,7 @@ class TemporalAverage(Monitor):
 class Projection(Monitor):
     "Base class monitor providing lead field suppport."
     _ui_name = "Projection matrix"
+    _runtime_state = ('_state', )
 
     region_mapping = RegionMapping(
         required=False,
@@ -395,6 +407,21 @@ class Projection(Monitor):
             " connectivity. For iEEG/EEG/MEG monitors, this must be specified when performing a region"
             " simulation but is optional for a surface simulation.")
 
+    gain_tolerance = basic.Float(
+        label="Gain approximation tolerance",
+        default=0.0,
+        required=False,
+        order=-1,
+        doc="""Relative error, in Frobenius norm, allowed when approximating the
+        gain matrix by a truncated singular value decomposition, which reduces the
+        cost of projection when sources far outnumber the effective rank of the
+        gain. The default of zero projects with the exact gain.""")
+
+    # factors (n_sensors, rank) & (rank, n_sources) of the low rank gain, if any
+    _gain_factors = None
+    # gain in the simulation dtype, used for projection
+    _projection_gain = None
+
     @staticmethod
     def oriented_gain(gain, orient):
         "Apply orientations to gain matrix."
@@ -501,19 +528,52 @@ class Projection(Monitor):
         self.gain[~nan_mask] = 0.0
         LOG.debug('Zeroed %d NaN gain coefficients', nan_mask.sum())
 
-        # attrs used for recording
-        self._state = numpy.zeros((self.gain.shape[0], len(self.voi)))
+        self._projection_gain = self.gain.astype(self.dtype, copy=False)
+        self._gain_factors = self.low_rank_gain(self.gain, self.gain_tolerance)
+        if self._gain_factors is not None:
+            self._gain_factors = tuple(factor.astype(self.dtype, copy=False) for factor in self._gain_factors)
+
+        # attrs used for recording; state is accumulated in source space, and
+        # projected once per period, as the projection commutes with the average
+        self._state = numpy.zeros((len(self.voi), self.gain.shape[1]), self.dtype)
         self._period_in_steps = int(self.period / self.dt)
         LOG.debug('State shape %s, period in steps %s', self._state.shape, self._period_in_steps)
 
         LOG.info('Projection configured gain shape %s', self.gain.shape)
 
+    @staticmethod
+    def low_rank_gain(gain, tolerance):
+        """
+        Factor gain by a truncated SVD with relative Frobenius error below tolerance,
+        returning (left, right) factors, or None if that would not reduce the cost of
+        projection.
+
+        """
+        if tolerance <= 0.0:
+            return None
+        u, s, vt = numpy.linalg.svd(gain, full_matrices=False)
+        # relative error of keeping the first k singular values, for k = 0 .. len(s)
+        error = numpy.sqrt(numpy.r_[numpy.cumsum((s ** 2)[::-1])[::-1], 0.0] / (s ** 2).sum())
+        rank = int(numpy.argmax(error <= tolerance))
+        if rank * sum(gain.shape) >= gain.size:
+            LOG.info('Gain rank %d for tolerance %g does not reduce projection cost', rank, tolerance)
+            return None
+        LOG.info('Gain of shape %s approximated with rank %d, relative error %g', gain.shape, rank, error[rank])
+        return u[:, :rank] * s[:rank], vt[:rank]
+
+    def project(self, source):
+        "Project (n_voi, n_sources) source activity to (n_sensors, n_voi) sensor signals."
+        if self._gain_factors is None:
+            return self._projection_gain.dot(source.T)
+        left, right = self._gain_factors
+        return left.dot(right.dot(source.T))
+
     def sample(self, step, state):
         "Record state, returning sample at sampling frequency / period."
-        self._state += self.gain.dot(state[self.voi].sum(axis=-1).T)
+        self._state += state[self.voi].sum(axis=-1)
         if step % self._period_in_steps == 0:
             time = (step - self._period_in_steps / 2.0) * self.dt
-            sample = self._state.copy() / self._period_in_steps
+            sample = self.project(self._state) / self._period_in_steps
             self._state[:] = 0.0
             return time, sample.T[..., numpy.newaxis] # for compatibility
 
@@ -804,6 +864,9 @@ class Bold(Monitor):
     _interim_period = None
     _interim_istep = None
     _interim_stock = None
+    _runtime_state = ('_stock', '_interim_stock')
+    _hrf_weights = None
+    _n_pending = None
     _stock_steps = None
     _stock_time = None
     _stock_sample_rate = 2 ** -2
@@ -839,34 +902,46 @@ class Bold(Monitor):
         super(Bold, self).config_for_sim(simulator)
         self.compute_hrf()
         sample_shape = self.voi.shape[0], simulator.number_of_nodes, simulator.model.number_of_modes
-        self._interim_stock = numpy.zeros((self._interim_istep,) + sample_shape)
-        LOG.debug("BOLD inner buffer %s %.2f MB" % (
-            self._interim_stock.shape, self._interim_stock.nbytes/2**20))
-        self._stock = numpy.zeros((self._stock_steps,) + sample_shape)
-        LOG.debug("BOLD outer buffer %s %.2f MB" % (
+        self.hemodynamic_response_function = self.hemodynamic_response_function.astype(self.dtype)
+        # weight of the interim average k interim periods before a sample, k = 0 .. stock steps - 1,
+        # i.e. the time reversed HRF, with the most recent average weighted by its tail
+        G = self.hemodynamic_response_function[0]
+        self._hrf_weights = numpy.r_[G[:1], G[:0:-1]]
+        # running sum over the current interim period
+        self._interim_stock = numpy.zeros(sample_shape, self.dtype)
+        # samples pending, to which each interim average is added once with its weight, so
+        # that only a few samples are stored rather than the full length of the HRF
+        self._n_pending = self._stock_steps * self._interim_istep // self.istep + 2
+        self._stock = numpy.zeros((self._n_pending,) + sample_shape, self.dtype)
+        LOG.debug("BOLD pending samples buffer %s %.2f MB" % (
             self._stock.shape, self._stock.nbytes/2**20))
 
+    def _add_interim_average(self, j, average):
+        "Add j-th interim average to the pending samples with HRF window covering it."
+        n_interim = self._interim_istep
+        # samples m whose latest interim average, m * istep // n_interim, is j .. j + stock steps - 1
+        m_lo = -(-j * n_interim // self.istep)
+        m_hi = ((j + self._stock_steps) * n_interim - 1) // self.istep
+        m = numpy.r_[m_lo:m_hi + 1]
+        weights = self._hrf_weights[m * self.istep // n_interim - j]
+        self._stock[m % self._n_pending] += weights.reshape((-1, 1, 1, 1)) * average
 
     def sample(self, step, state):
-        # Update the interim-stock at every step
-        self._interim_stock[((step % self._interim_istep) - 1), :] = state[self.voi, :]
-        # At stock's period update it with the temporal average of interim-stock
+        # Sum state over the interim period, adding its average to pending samples at the end
+        self._interim_stock += state[self.voi, :]
         if step % self._interim_istep == 0:
-            avg_interim_stock = numpy.mean(self._interim_stock, axis=0)
-            self._stock[((step/self._interim_istep % self._stock_steps) - 1), :] = avg_interim_stock
-        # At the monitor's period, apply the heamodynamic response function to
-        # the stock and return the resulting BOLD signal.
+            self._add_interim_average(step // self._interim_istep, self._interim_stock / self._interim_istep)
+            self._interim_stock[:] = 0.0
+        # At the monitor's period, the pending sample has received all interim
+        # averages in its HRF window, and the resulting BOLD signal is returned.
         if step % self.istep == 0:
             time = step * self.dt
-            hrf = numpy.roll(self.hemodynamic_response_function,
-                             ((step/self._interim_istep % self._stock_steps) - 1),
-                             axis=1)
+            slot = (step // self.istep) % self._n_pending
+            bold = self._stock[slot].copy()
+            self._stock[slot] = 0.0
             if isinstance(self.hrf_kernel, equations.FirstOrderVolterra):
                 k1_V0 = self.hrf_kernel.parameters["k_1"] * self.hrf_kernel.parameters["V_0"]
-                bold = (numpy.dot(hrf, self._stock.transpose((1, 2, 0, 3))) - 1.0) * k1_V0
-            else:
-                bold = numpy.dot(hrf, self._stock.transpose((1, 2, 0, 3)))
-            bold = bold.reshape(self._stock.shape[1:])
+                bold = (bold - 1.0) * k1_V0
             return [time, bold]
 
 
@@ -887,13 +962,13 @@ class BoldRegionROI(Bold):
         super(BoldRegionROI, self).config_for_sim(simulator)
         self.region_mapping = simulator.surface.region_mapping
 
-    def sample(self, step, state, array=numpy.array):
+    def sample(self, step, state):
         result = super(BoldRegionROI, self).sample(step, state)
         if result:
             t, data = result
-            # TODO use reduceat
-            return [t, array([data.flat[self.region_mapping==i].mean()
-                              for i in xrange(self.region_mapping.max())])]
+            rmap = self.region_mapping
+            region_sum = numpy.bincount(rmap, weights=data.flat[:rmap.size])
+            return [t, (region_sum / numpy.bincount(rmap))[:rmap.max()]]
         else:
             return None
 
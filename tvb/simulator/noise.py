@@ -147,6 +147,8 @@ class Noise(core.Type):
         specific Noise object.""")
 
     dt = None
+    # dtype of generated noise, set by the simulator according to its precision
+    dtype = numpy.float64
     # For use if coloured
     _E = None
     _sqrt_1_E2 = None
@@ -219,7 +221,7 @@ class Noise(core.Type):
             noise = self.coloured(shape)
         else:
             noise = self.white(shape)
-        return noise
+        return noise.astype(self.dtype, copy=False)
 
     def coloured(self, shape):
         "Generate colored noise. [FoxVemuri_1988]_"
@@ -39,8 +39,10 @@ simulation and the method for running the simulation.
 
 """
 
+import os
 import time
 import math
+import threading
 import numpy
 import scipy.sparse
 from tvb.basic.profile import TvbProfile
@@ -51,8 +53,8 @@ from tvb.basic.filters.chain import UIFilter, FilterChain
 from tvb.datatypes import cortex, connectivity, arrays, patterns
 from tvb.simulator import models, integrators, monitors, coupling
 
-from .common import psutil, get_logger, numpy_add_at
-from .history import SparseHistory, DenseHistory
+from .common import psutil, get_logger, numpy_add_at, replace_file
+from .history import SparseHistory, DenseHistory, MemmapHistory
 
 
 LOG = get_logger(__name__)
@@ -199,8 +201,41 @@ class Simulator(core.Type):
         order=9,
         doc="""The length of a simulation in milliseconds (ms).""")
 
+    history_on_disk = basic.Bool(
+        label="Memory-mapped history",
+        default=False,
+        order=-1,
+        required=False,
+        doc="""Store the history buffer in a memory-mapped temporary file,
+        keeping only the most recent steps in memory. This allows simulations
+        with long delays, e.g. due to slow conduction speeds or small time
+        steps, whose history would not otherwise fit in memory.""")
+
+    precision = basic.String(
+        label="Floating point precision",
+        default="float64",
+        order=-1,
+        required=False,
+        doc="""Precision of the state, coupling, noise and monitor buffers,
+        either 'float64' (default) or 'float32'. With float32, model,
+        coupling and noise parameters are converted as well, so that the
+        integration loop does not upcast, halving memory traffic at the cost
+        of accuracy.""")
+
+    # Values accepted for precision; a String trait rather than an Enumerate,
+    # whose selected value would be shared by all Simulator instances.
+    precisions = ("float64", "float32")
+
     history = None # type: SparseHistory
 
+    @property
+    def dtype(self):
+        "NumPy dtype of simulation arrays, according to precision."
+        if self.precision not in self.precisions:
+            raise ValueError("Unsupported precision %r, expected one of %s"
+                             % (self.precision, ", ".join(self.precisions)))
+        return numpy.dtype(self.precision)
+
     @property
     def good_history_shape(self):
         "Returns expected history shape."
@@ -210,6 +245,7 @@ class Simulator(core.Type):
 
     calls = 0
     current_step = 0
+    _stimulus_offset = 0
     number_of_nodes = None
     _memory_requirement_guess = None
     _memory_requirement_census = None
@@ -302,6 +338,8 @@ class Simulator(core.Type):
         self._configure_history(self.initial_conditions)
         # Configure Monitors to work with selected Model, etc...
         self._configure_monitors()
+        # Convert parameters & state to requested precision
+        self._configure_precision()
         # Estimate of memory usage.
         self._census_memory_requirement()
         # Allow user to chain configure to another call or assignment.
@@ -338,15 +376,17 @@ class Simulator(core.Type):
                 rpad = csr_matrix((local_coupling.shape[0], npad))
                 bpad = csr_matrix((npad, nn))
                 local_coupling = vstack([hstack([local_coupling, rpad]), bpad])
+            local_coupling = local_coupling.astype(self.dtype)
         return local_coupling
 
     def _prepare_stimulus(self):
         if self.stimulus is None:
             stimulus = 0.0
         else:
-            time = numpy.r_[0.0 : self.simulation_length : self.integrator.dt]
+            dt = self.integrator.dt
+            time = numpy.r_[0.0 : self._stimulus_offset * dt + self.simulation_length : dt]
             self.stimulus.configure_time(time.reshape((1, -1)))
-            stimulus = numpy.zeros((self.model.nvar, self.number_of_nodes, 1))
+            stimulus = numpy.zeros((self.model.nvar, self.number_of_nodes, 1), self.dtype)
             LOG.debug("stimulus shape is: %s", stimulus.shape)
         return stimulus
 
@@ -361,13 +401,13 @@ class Simulator(core.Type):
         "Update stimulus values for current time step."
         if self.stimulus is not None:
             # TODO stim_step != current step
-            stim_step = step - (self.current_step + 1)
+            stim_step = step - (self.current_step + 1) + self._stimulus_offset
             stimulus[self.model.cvar, :, :] = self.stimulus(stim_step).reshape((1, -1, 1))
 
     def _loop_update_history(self, step, n_reg, state):
         "Update history."
         if self.surface is not None and state.shape[1] > self.connectivity.number_of_regions:
-            region_state = numpy.zeros((n_reg, state.shape[0], state.shape[2]))         # temp (node, cvar, mode)
+            region_state = numpy.zeros((n_reg, state.shape[0], state.shape[2]), state.dtype)  # temp (node, cvar, mode)
             numpy_add_at(region_state, self._regmap, state.transpose((1, 0, 2)))        # sum within region
             region_state /= numpy.bincount(self._regmap).reshape((-1, 1, 1))            # div by n node in region
             state = region_state.transpose((1, 0, 2))                                   # (cvar, node, mode)
@@ -379,7 +419,7 @@ class Simulator(core.Type):
         if any(outputi is not None for outputi in output):
             return output
 
-    def __call__(self, simulation_length=None, random_state=None):
+    def __call__(self, simulation_length=None, random_state=None, checkpoint_path=None, checkpoint_period=None):
         """
         Return an iterator which steps through simulation time, generating monitor outputs.
 
@@ -387,6 +427,8 @@ class Simulator(core.Type):
 
         :param simulation_length: Length of the simulation to perform in ms.
         :param random_state:  State of NumPy RNG to use for stochastic integration.
+        :param checkpoint_path: File to which a checkpoint is written every checkpoint_period.
+        :param checkpoint_period: Period in ms between checkpoints, written in a background thread.
         :return: Iterator over monitor outputs.
         """
 
@@ -402,6 +444,10 @@ class Simulator(core.Type):
         local_coupling = self._prepare_local_coupling()
         stimulus = self._prepare_stimulus()
         state = self.current_state
+        checkpoint_steps = 0
+        if checkpoint_path is not None and checkpoint_period is not None:
+            checkpoint_steps = max(1, int(round(checkpoint_period / self.integrator.dt)))
+        writer = None
 
         # integration loop
         n_steps = int(math.ceil(self.simulation_length / self.integrator.dt))
@@ -412,11 +458,89 @@ class Simulator(core.Type):
             state = self.integrator.scheme(state, self.model.dfun, node_coupling, local_coupling, stimulus)
             self._loop_update_history(step, n_reg, state)
             output = self._loop_monitor_output(step, state)
+            if checkpoint_steps and (step - self.current_step) % checkpoint_steps == 0:
+                writer = self._loop_checkpoint(checkpoint_path, step, state, writer)
             if output is not None:
                 yield output
 
+        if writer is not None:
+            writer.join()
         self.current_state = state
         self.current_step = self.current_step + n_steps - 1  # -1 : don't repeat last point
+        self._stimulus_offset = 0
+
+    def _loop_checkpoint(self, path, step, state, writer):
+        "Copy runtime state after step and write it in a background thread, once the previous write completes."
+        data = self._runtime_state(step, state)
+        if writer is not None:
+            writer.join()
+        writer = threading.Thread(target=self._write_checkpoint, args=(path, data))
+        writer.start()
+        return writer
+
+    def _runtime_state(self, step, state):
+        "Copy of the state required to continue the simulation after step, as a dict of arrays."
+        data = {
+            'current_step': numpy.array(step),
+            'current_state': numpy.array(state),
+            'stimulus_offset': numpy.array(step - self.current_step + self._stimulus_offset),
+            'history': numpy.array(self.history.buffer),
+        }
+        for i, monitor in enumerate(self.monitors):
+            for name in monitor._runtime_state:
+                data['monitor_%d%s' % (i, name)] = numpy.array(getattr(monitor, name))
+        if isinstance(self.integrator, integrators.IntegratorStochastic):
+            noise = self.integrator.noise
+            _, keys, pos, has_gauss, cached_gaussian = noise.random_stream.get_state()
+            data.update(rng_keys=keys, rng_pos=numpy.array(pos), rng_has_gauss=numpy.array(has_gauss),
+                        rng_cached_gaussian=numpy.array(cached_gaussian))
+            if noise._eta is not None:
+                data['noise_eta'] = numpy.array(noise._eta)
+        return data
+
+    @staticmethod
+    def _write_checkpoint(path, data):
+        "Write checkpoint data to a temporary file, then move it to path, so path is always complete."
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as fd:
+            numpy.savez(fd, **data)
+        replace_file(tmp_path, path)
+        LOG.debug('Wrote checkpoint of step %d to %s', data['current_step'], path)
+
+    def checkpoint(self, path):
+        """
+        Write the runtime state of the simulator, i.e. current state, history,
+        monitor buffers, noise and stimulus positions, to path in NumPy's npz
+        format, from which a simulator with the same configuration can be
+        restored. Checkpoints may also be written periodically during a
+        simulation, see the checkpoint_path & checkpoint_period arguments of
+        __call__ and run.
+
+        """
+        self._write_checkpoint(path, self._runtime_state(self.current_step, self.current_state))
+
+    def restore(self, path):
+        """
+        Restore the runtime state written by checkpoint into this simulator, which
+        must have been configured identically to the simulator checkpointed. The
+        next call continues the simulation exactly from the checkpointed step.
+
+        """
+        data = numpy.load(path)
+        self.current_step = int(data['current_step'])
+        self.current_state = data['current_state']
+        self._stimulus_offset = int(data['stimulus_offset'])
+        self.history.initialize(data['history'])
+        for i, monitor in enumerate(self.monitors):
+            for name in monitor._runtime_state:
+                getattr(monitor, name)[:] = data['monitor_%d%s' % (i, name)]
+        if isinstance(self.integrator, integrators.IntegratorStochastic):
+            noise = self.integrator.noise
+            noise.random_stream.set_state(('MT19937', data['rng_keys'], int(data['rng_pos']),
+                                           int(data['rng_has_gauss']), float(data['rng_cached_gaussian'])))
+            if 'noise_eta' in data:
+                noise._eta = data['noise_eta']
+        LOG.info('Restored simulator at step %d from %s', self.current_step, path)
 
     def _configure_history(self, initial_conditions):
         """
@@ -430,17 +554,18 @@ class Simulator(core.Type):
         inital_conditions are shorter in time (dim=0) than the required history
         the model's initial() method is called to make up the difference.
 
+        With history_on_disk, the initial history is built and written to the
+        history file in blocks of time steps, so it is never held in memory
+        as a whole.
+
         """
         rng = numpy.random
         if hasattr(self.integrator, 'noise'):
             rng = self.integrator.noise.random_stream
+        shift = self.current_step % self.horizon
         # Default initial conditions
         if initial_conditions is None:
-            n_time, n_svar, n_node, n_mode = self.good_history_shape
             LOG.info('Preparing initial history of shape %r using model.initial()', self.good_history_shape)
-            if self.surface is not None:
-                n_node = self.number_of_nodes
-            history = self.model.initial(self.integrator.dt, (n_time, n_svar, n_node, n_mode), rng)
         # ICs provided
         else:
             # history should be [timepoints, state_variables, nodes, modes]
@@ -456,19 +581,49 @@ class Simulator(core.Type):
             else:
                 if ic_shape[0] >= self.horizon:
                     LOG.debug("Using last %d time-steps for history.", self.horizon)
-                    history = initial_conditions[-self.horizon:, :, :, :].copy()
+                    initial_conditions = initial_conditions[-self.horizon:]
                 else:
                     LOG.debug('Padding initial conditions with model.initial')
-                    history = self.model.initial(self.integrator.dt, self.good_history_shape, rng)
-                    shift = self.current_step % self.horizon
-                    history = numpy.roll(history, -shift, axis=0)
-                    history[:ic_shape[0], :, :, :] = initial_conditions
-                    history = numpy.roll(history, shift, axis=0)
                 self.current_step += ic_shape[0] - 1
-        LOG.info('Final initial history shape is %r', history.shape)
-        # create initial state from history
-        self.current_state = history[self.current_step % self.horizon].copy()
+        # create history query implementation
+        self.history = self._make_history()
+        # initialize its buffer, with the initial state taken from the history
+        i_current = self.current_step % self.horizon
+        if isinstance(self.history, MemmapHistory):
+            n_block = max(1, self._history_block_nbytes // (numpy.prod(self.good_history_shape[1:]) * 8))
+            for start in range(0, self.horizon, n_block):
+                stop = min(start + n_block, self.horizon)
+                history = self._initial_history(start, stop, shift, initial_conditions, rng)
+                if start <= i_current < stop:
+                    self.current_state = history[i_current - start].copy()
+                self.history.initialize(self._region_history(history), start)
+        else:
+            history = self._initial_history(0, self.horizon, shift, initial_conditions, rng)
+            LOG.info('Final initial history shape is %r', history.shape)
+            self.current_state = history[i_current].copy()
+            self.history.initialize(self._region_history(history))
         LOG.debug('initial state has shape %r' % (self.current_state.shape, ))
+
+    # maximum size of the blocks in which the initial history is written to a memory-mapped history
+    _history_block_nbytes = 2 ** 26
+
+    def _initial_history(self, start, stop, shift, initial_conditions, rng):
+        """Time steps start to stop of the initial history, from the initial conditions, placed
+        after shift steps, and padded with model.initial, or only from the latter if None."""
+        n_time, n_svar, n_node, n_mode = self.good_history_shape
+        if initial_conditions is None and self.surface is not None:
+            n_node = self.number_of_nodes
+        if initial_conditions is not None and initial_conditions.shape[0] == self.horizon:
+            return initial_conditions[start:stop].copy()
+        history = self.model.initial(self.integrator.dt, (stop - start, n_svar, n_node, n_mode), rng)
+        if initial_conditions is not None:
+            ic_steps = (numpy.r_[start:stop] - shift) % self.horizon
+            provided = ic_steps < initial_conditions.shape[0]
+            history[provided] = initial_conditions[ic_steps[provided]]
+        return history
+
+    def _region_history(self, history):
+        "Average history of surface simulations over regions, as required by the history buffer."
         if self.surface is not None and history.shape[2] > self.connectivity.number_of_regions:
             n_reg = self.connectivity.number_of_regions
             (nt, ns, _, nm), ax = history.shape, (2, 0, 1, 3)
@@ -476,15 +631,33 @@ class Simulator(core.Type):
             numpy_add_at(region_history.transpose(ax), self._regmap, history.transpose(ax))
             region_history /= numpy.bincount(self._regmap).reshape((-1, 1))
             history = region_history
-        # create history query implementation
-        self.history = SparseHistory(
+        return history
+
+    def _make_history(self):
+        "Create the history implementation queried by the coupling function."
+        history_class = MemmapHistory if self.history_on_disk else SparseHistory
+        return history_class(
             self.connectivity.weights,
             self.connectivity.idelays,
             self.model.cvar,
             self.model.number_of_modes
         )
-        # initialize its buffer
-        self.history.initialize(history)
+
+    def _configure_precision(self):
+        "Convert floating point parameters of components, and the current state, to the simulation dtype."
+        if self.dtype == numpy.float64:
+            return
+        components = [self.model, self.coupling]
+        if isinstance(self.integrator, integrators.IntegratorStochastic):
+            components.append(self.integrator.noise)
+            self.integrator.noise.dtype = self.dtype
+        for component in components:
+            for name, trait in component.trait.items():
+                value = getattr(component, name)
+                if isinstance(trait, arrays.FloatArray) and isinstance(value, numpy.ndarray):
+                    setattr(component, name, value.astype(self.dtype))
+        self.current_state = self.current_state.astype(self.dtype)
+        LOG.info('Simulation uses %s precision', self.dtype)
 
     def _configure_integrator_noise(self):
         """
@@ -617,6 +790,10 @@ class Simulator(core.Type):
         LOG.debug("Estimated history shape is %r", hist_shape)
 
         memreq = numpy.prod(hist_shape) * bits_64
+        if self.history_on_disk:
+            # the initial history is written in blocks, and recent steps kept in a hot ring
+            LOG.debug("History is memory-mapped, counting one initial history block and the hot ring.")
+            memreq = min(memreq, 2 * self._history_block_nbytes)
         if self.surface:
             memreq += self.surface.number_of_triangles * 3 * bits_32 * 2  # normals
             memreq += self.surface.number_of_vertices * 3 * bits_64 * 2   # normals
@@ -641,12 +818,11 @@ class Simulator(core.Type):
                         memreq += number_of_nodes * 62.0 * bits_64
 
             else:
-                stock_shape = (monitor.hrf_length * monitor._stock_sample_rate,
+                stock_shape = (monitor.hrf_length / monitor.period + 2,
                                self.model.variables_of_interest.shape[0],
                                number_of_nodes,
                                self.model.number_of_modes)
-                interim_stock_shape = (1.0 / (2.0 ** -2 * self.integrator.dt),
-                                       self.model.variables_of_interest.shape[0],
+                interim_stock_shape = (self.model.variables_of_interest.shape[0],
                                        number_of_nodes,
                                        self.model.number_of_modes)
                 memreq += numpy.prod(stock_shape) * bits_64
@@ -732,22 +908,36 @@ class Simulator(core.Type):
         self._storage_requirement = int(strgreq)
 
     def run(self, **kwds):
-        "Convenience method to call the simulator with **kwds and collect output data."
+        """Convenience method to call the simulator with **kwds and collect output data.
+
+        Output of monitors with a sink is not collected, rather the sink is closed at
+        the end of the run, and the data read from it is returned, i.e. all samples
+        written so far. Running again appends to the same sinks.
+        """
         ts, xs = [], []
         for _ in self.monitors:
             ts.append([])
             xs.append([])
+        collect = [monitor.sink is None for monitor in self.monitors]
         wall_time_start = time.time()
-        for data in self(**kwds):
-            for tl, xl, t_x in zip(ts, xs, data):
-                if t_x is not None:
-                    t, x = t_x
-                    tl.append(t)
-                    xl.append(x)
+        try:
+            for data in self(**kwds):
+                for tl, xl, t_x, collect_i in zip(ts, xs, data, collect):
+                    if t_x is not None and collect_i:
+                        t, x = t_x
+                        tl.append(t)
+                        xl.append(x)
+        finally:
+            for monitor, collect_i in zip(self.monitors, collect):
+                if not collect_i:
+                    monitor.sink.close()
         elapsed_wall_time = time.time() - wall_time_start
         LOG.info("%.3f s elapsed, %.3fx real time", elapsed_wall_time,
                  elapsed_wall_time * 1e3 / self.simulation_length)
-        for i in range(len(ts)):
-            ts[i] = numpy.array(ts[i])
-            xs[i] = numpy.array(xs[i])
+        for i, monitor in enumerate(self.monitors):
+            if collect[i]:
+                ts[i] = numpy.array(ts[i])
+                xs[i] = numpy.array(xs[i])
+            else:
+                ts[i], xs[i] = monitor.sink.read()
         return list(zip(ts, xs))
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+
+"""
+Monitor sinks, which receive monitor samples as they are recorded, so that
+long simulations need not hold their output in memory. A sink is attached to
+a monitor by setting its `sink` attribute, e.g.::
+
+    tavg = monitors.TemporalAverage(period=1.0)
+    tavg.sink = sinks.H5Sink('tavg.h5')
+
+after which `Simulator.run` returns the sink's data for that monitor instead
+of accumulating samples in lists.
+
+"""
+
+import struct
+import numpy
+from .common import get_logger
+
+# loose couple h5py so it's an optional dependency
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+LOG = get_logger(__name__)
+
+
+class Sink(object):
+    "Base class for monitor sinks."
+
+    def append(self, time, data):
+        "Append one sample recorded at time."
+        raise NotImplementedError
+
+    def flush(self):
+        "Write out any buffered samples."
+        pass
+
+    def close(self):
+        "Flush and release any resources held by the sink."
+        self.flush()
+
+    def read(self):
+        "Return array-likes of times and samples appended so far."
+        raise NotImplementedError
+
+
+class RingSink(Sink):
+    "Keeps the last n_sample samples in memory."
+
+    def __init__(self, n_sample):
+        self.n_sample = n_sample
+        self.count = 0
+        self._time = None
+        self._data = None
+
+    def append(self, time, data):
+        data = numpy.asarray(data)
+        if self._data is None:
+            self._time = numpy.empty((self.n_sample, ))
+            self._data = numpy.empty((self.n_sample, ) + data.shape, data.dtype)
+        i = self.count % self.n_sample
+        self._time[i] = time
+        self._data[i] = data
+        self.count += 1
+
+    def read(self):
+        if self._data is None:
+            return numpy.empty((0, )), numpy.empty((0, ))
+        n = min(self.count, self.n_sample)
+        idx = numpy.r_[self.count - n:self.count] % self.n_sample
+        return self._time[idx], self._data[idx]
+
+
+class BufferedSink(Sink):
+    "Base class for sinks which write blocks of chunk_size samples."
+
+    def __init__(self, chunk_size=64):
+        self.chunk_size = chunk_size
+        self.count = 0
+        self._n_buffered = 0
+        self._time = None
+        self._data = None
+
+    def _open(self, sample):
+        "Prepare storage for samples shaped like sample."
+        raise NotImplementedError
+
+    def _write(self, time, data):
+        "Write a block of times and samples to storage, reopening it if the sink was closed."
+        raise NotImplementedError
+
+    def append(self, time, data):
+        data = numpy.asarray(data)
+        if self._data is None:
+            self._time = numpy.empty((self.chunk_size, ))
+            self._data = numpy.empty((self.chunk_size, ) + data.shape, data.dtype)
+            self._open(data)
+        self._time[self._n_buffered] = time
+        self._data[self._n_buffered] = data
+        self._n_buffered += 1
+        self.count += 1
+        if self._n_buffered == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self._n_buffered > 0:
+            n = self._n_buffered
+            self._write(self._time[:n], self._data[:n])
+            self._n_buffered = 0
+
+
+class H5Sink(BufferedSink):
+    """
+    Appends samples to chunked, resizable 'time' and 'data' datasets of an HDF5 file.
+
+    The file is written through one handle, and read after the sink is closed
+    through a separate read-only handle, so that appending to a closed sink
+    reopens the file for writing.
+
+    """
+
+    def __init__(self, filename, chunk_size=64, compression=None):
+        if h5py is None:
+            raise ImportError('H5Sink requires h5py.')
+        super(H5Sink, self).__init__(chunk_size)
+        self.filename = filename
+        self.compression = compression
+        self._file = None
+        self._reader = None
+
+    def _open(self, sample):
+        self._file = h5py.File(self.filename, 'w')
+        self._file.create_dataset('time', shape=(0, ), maxshape=(None, ), dtype='d',
+                                  chunks=(self.chunk_size, ))
+        self._file.create_dataset('data', shape=(0, ) + sample.shape, maxshape=(None, ) + sample.shape,
+                                  dtype=sample.dtype, chunks=(self.chunk_size, ) + sample.shape,
+                                  compression=self.compression)
+        LOG.debug('H5Sink writing samples of shape %r to %s', sample.shape, self.filename)
+
+    def _close_reader(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+    def _write(self, time, data):
+        if self._file is None:
+            self._close_reader()
+            self._file = h5py.File(self.filename, 'a')
+        n = self._file['time'].shape[0]
+        for key, values in (('time', time), ('data', data)):
+            dataset = self._file[key]
+            dataset.resize(n + values.shape[0], axis=0)
+            dataset[n:] = values
+
+    def flush(self):
+        super(H5Sink, self).flush()
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._close_reader()
+
+    def read(self):
+        """
+        Return the 'time' and 'data' datasets, which remain valid until the sink
+        is closed, or appended to after having been closed.
+
+        """
+        self.flush()
+        if self.count == 0:
+            return numpy.empty((0, )), numpy.empty((0, ))
+        if self._file is not None:
+            return self._file['time'], self._file['data']
+        if self._reader is None:
+            self._reader = h5py.File(self.filename, 'r')
+        return self._reader['time'], self._reader['data']
+
+
+class _NpyAppender(object):
+    """
+    Writes a .npy file whose leading dimension grows as rows are appended. With
+    n_row > 0, appends to a file previously written with the same dtype and row
+    shape, which holds n_row rows.
+
+    """
+
+    def __init__(self, filename, dtype, row_shape, n_row=0):
+        self.filename = filename
+        self.dtype = numpy.dtype(dtype)
+        self.row_shape = tuple(row_shape)
+        self.n_row = n_row
+        # reserve room in the header for the largest possible row count
+        self._header_len = len(self._header(2 ** 63)) + 1
+        self._header_len += -(10 + self._header_len) % 64
+        self._file = open(filename, 'r+b' if n_row > 0 else 'w+b')
+        self._write_header()
+
+    def _header(self, n_row):
+        descr = numpy.lib.format.dtype_to_descr(self.dtype)
+        return "{'descr': %r, 'fortran_order': False, 'shape': %r, }" % (descr, (n_row, ) + self.row_shape)
+
+    def _write_header(self):
+        header = self._header(self.n_row).ljust(self._header_len - 1) + '\n'
+        self._file.seek(0)
+        self._file.write(b'\x93NUMPY\x01\x00' + struct.pack('<H', self._header_len) + header.encode('latin1'))
+        self._file.seek(0, 2)
+
+    def append(self, rows):
+        self._file.write(numpy.ascontiguousarray(rows, self.dtype).tobytes())
+        self.n_row += rows.shape[0]
+
+    def flush(self):
+        self._write_header()
+        self._file.flush()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+
+class NpySink(BufferedSink):
+    "Appends times and samples to prefix + '_time.npy' and prefix + '_data.npy'."
+
+    def __init__(self, prefix, chunk_size=64):
+        super(NpySink, self).__init__(chunk_size)
+        self.time_filename = prefix + '_time.npy'
+        self.data_filename = prefix + '_data.npy'
+        self._appenders = None
+
+    def _open(self, sample, n_row=0):
+        self._appenders = (_NpyAppender(self.time_filename, 'd', (), n_row),
+                           _NpyAppender(self.data_filename, sample.dtype, sample.shape, n_row))
+
+    def _write(self, time, data):
+        if self._appenders is None:
+            self._open(data[0], self.count - self._n_buffered)
+        for appender, values in zip(self._appenders, (time, data)):
+            appender.append(values)
+
+    def flush(self):
+        super(NpySink, self).flush()
+        if self._appenders is not None:
+            for appender in self._appenders:
+                appender.flush()
+
+    def close(self):
+        self.flush()
+        if self._appenders is not None:
+            for appender in self._appenders:
+                appender.close()
+            self._appenders = None
+
+    def read(self):
+        "Return memory-mapped arrays of the times and samples written so far."
+        self.flush()
+        if self.count == 0:
+            return numpy.empty((0, )), numpy.empty((0, ))
+        return (numpy.load(self.time_filename, mmap_mode='r'),
+                numpy.load(self.data_filename, mmap_mode='r'))
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+
+"""
+Gather the tests of the analyzers.
+
+"""
+
+if __name__ == "__main__":
+    from tvb.tests.library import setup_test_console_env
+    setup_test_console_env()
+
+
+import unittest
+from tvb.tests.library.analyzers import cross_correlation_test
+from tvb.tests.library.analyzers import executor_test
+from tvb.tests.library.analyzers import fcd_matrix_test
+from tvb.tests.library.analyzers import fft_test
+from tvb.tests.library.analyzers import fmri_balloon_test
+from tvb.tests.library.analyzers import graph_test
+from tvb.tests.library.analyzers import info_test
+from tvb.tests.library.analyzers import metric_kuramoto_index_test
+from tvb.tests.library.analyzers import node_complex_coherence_test
+from tvb.tests.library.analyzers import pca_test
+from tvb.tests.library.analyzers import wavelet_test
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(cross_correlation_test.suite())
+    test_suite.addTest(executor_test.suite())
+    test_suite.addTest(fcd_matrix_test.suite())
+    test_suite.addTest(fft_test.suite())
+    test_suite.addTest(fmri_balloon_test.suite())
+    test_suite.addTest(graph_test.suite())
+    test_suite.addTest(info_test.suite())
+    test_suite.addTest(metric_kuramoto_index_test.suite())
+    test_suite.addTest(node_complex_coherence_test.suite())
+    test_suite.addTest(pca_test.suite())
+    test_suite.addTest(wavelet_test.suite())
+    return test_suite
+
+
+if __name__ == "__main__":
+    #So you can run tests from this package individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
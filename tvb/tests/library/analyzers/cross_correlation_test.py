@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+
+"""
+Test CrossCorrelate against pairwise scipy.signal.correlate.
+
+"""
+
+if __name__ == "__main__":
+    from tvb.tests.library import setup_test_console_env
+    setup_test_console_env()
+
+import numpy
+import unittest
+from scipy.signal import correlate
+from tvb.analyzers import cross_correlation
+from tvb.datatypes import time_series
+from tvb.tests.library.base_testcase import BaseTestCase
+
+
+
+class CrossCorrelateTest(BaseTestCase):
+
+    def _time_series(self, tpts):
+        data = numpy.random.RandomState(42).randn(tpts, 2, 5, 1)
+        return time_series.TimeSeries(data=data, sample_period=0.5)
+
+    def _expected(self, ts):
+        tpts, n_var, n_node, n_mode = ts.data.shape
+        expected = numpy.empty((tpts, n_node, n_node, n_var, n_mode))
+        for var in range(n_var):
+            data = ts.data[:, var, :, 0] - ts.data[:, var, :, 0].mean(axis=0)
+            for n1 in range(n_node):
+                for n2 in range(n_node):
+                    expected[:, n1, n2, var, 0] = correlate(data[:, n1], data[:, n2], mode="same")
+        return expected
+
+    def test_evaluate(self):
+        for tpts in (64, 71):
+            ts = self._time_series(tpts)
+            result = cross_correlation.CrossCorrelate(time_series=ts).evaluate()
+            self.assertTrue(numpy.allclose(self._expected(ts), result.array_data, rtol=0.0, atol=1e-10))
+            lags = numpy.arange(-numpy.floor(tpts / 2.0), numpy.ceil(tpts / 2.0))
+            self.assertTrue(numpy.allclose(0.5 * lags, result.time))
+
+    def test_max_lag(self):
+        ts = self._time_series(71)
+        expected = self._expected(ts)
+        lags = numpy.arange(-35, 36)
+        for max_lag in (2.0, 10.25):
+            result = cross_correlation.CrossCorrelate(time_series=ts, max_lag=max_lag).evaluate()
+            mask = numpy.abs(lags) <= numpy.floor(max_lag / 0.5)
+            self.assertEqual(mask.sum(), result.array_data.shape[0])
+            self.assertTrue(numpy.allclose(0.5 * lags[mask], result.time))
+            self.assertTrue(numpy.allclose(expected[mask], result.array_data, rtol=0.0, atol=1e-10))
+
+    def test_blocks(self):
+        data = numpy.random.RandomState(42).randn(100, 7)
+        for lags in (numpy.r_[-3:4], numpy.r_[-50:50]):
+            expected = cross_correlation.cross_correlate(data, lags)
+            for n_threads in (1, 3):
+                blocked = cross_correlation.cross_correlate(data, lags, n_threads, max_memory=1)
+                self.assertTrue(numpy.allclose(expected, blocked, rtol=0.0, atol=1e-10))
+
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(CrossCorrelateTest))
+    return test_suite
+
+
+
+if __name__ == "__main__":
+    #So you can run tests from this package individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
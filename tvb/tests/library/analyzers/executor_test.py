@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+
+"""
+Test that evaluating an analyzer by slices, serially or in parallel, gives the
+result of its own evaluate.
+
+"""
+
+if __name__ == "__main__":
+    from tvb.tests.library import setup_test_console_env
+    setup_test_console_env()
+
+import numpy
+import unittest
+from tvb.analyzers import executor, fft, node_covariance, pca, wavelet
+from tvb.analyzers.metric_kuramoto_index import KuramotoIndex
+from tvb.datatypes import time_series
+from tvb.tests.library.base_testcase import BaseTestCase
+
+
+
+class EvaluateParallelTest(BaseTestCase):
+
+    # serial, process pool & thread pool
+    modes = [dict(processes=1), dict(processes=3), dict(processes=3, use_threads=True)]
+
+    def setUp(self):
+        super(EvaluateParallelTest, self).setUp()
+        data = numpy.random.RandomState(42).randn(1024, 2, 7, 2)
+        self.ts = time_series.TimeSeries(data=data, sample_period=1.0)
+        self.ts.configure()
+
+    def assert_parallel(self, analyzer, keys):
+        expected = analyzer.evaluate()
+        for kwargs in self.modes:
+            result = executor.evaluate_parallel(analyzer, **kwargs)
+            self.assertTrue(isinstance(result, type(expected)))
+            self.assertTrue(result.source is self.ts)
+            for key in keys:
+                self.assertEqual(getattr(expected, key).shape, getattr(result, key).shape)
+                self.assertTrue(numpy.allclose(getattr(expected, key), getattr(result, key)), key)
+
+    def test_fft(self):
+        self.assert_parallel(fft.FFT(time_series=self.ts, segment_length=256.0), ["array_data"])
+        self.assert_parallel(fft.FFT(time_series=self.ts, segment_length=256.0, window_function="hamming",
+                                     output="average_power"), ["average_power", "normalised_average_power"])
+
+    def test_wavelet(self):
+        analyzer = wavelet.ContinuousWaveletTransform(time_series=self.ts, sample_period=4.0)
+        self.assert_parallel(analyzer, ["array_data"])
+
+    def test_pca(self):
+        self.assert_parallel(pca.PCA(time_series=self.ts), ["weights", "fractions"])
+        self.assert_parallel(pca.RandomizedPCA(time_series=self.ts, n_components=3), ["weights", "fractions"])
+
+    def test_node_covariance(self):
+        self.assert_parallel(node_covariance.NodeCovariance(time_series=self.ts), ["array_data"])
+
+    def test_not_sliceable(self):
+        self.assertRaises(ValueError, executor.evaluate_parallel, KuramotoIndex(time_series=self.ts))
+
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(EvaluateParallelTest))
+    return test_suite
+
+
+
+if __name__ == "__main__":
+    #So you can run tests from this package individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
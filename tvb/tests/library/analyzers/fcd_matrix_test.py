@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+
+"""
+Test the sliding window FC and FCD against direct computations with numpy.corrcoef.
+
+"""
+
+if __name__ == "__main__":
+    from tvb.tests.library import setup_test_console_env
+    setup_test_console_env()
+
+import numpy
+import unittest
+from tvb.analyzers import fcd_matrix
+from tvb.datatypes import time_series
+from tvb.tests.library.base_testcase import BaseTestCase
+
+
+
+class FcdMatrixTest(BaseTestCase):
+
+    def setUp(self):
+        super(FcdMatrixTest, self).setUp()
+        data = numpy.random.RandomState(42).randn(600, 2, 8, 1)
+        self.ts = time_series.TimeSeriesRegion(data=data, sample_period=1.0)
+
+    def _windows(self, sp, sw):
+        n_window = int((self.ts.data.shape[0] - sw) / sp)
+        starts = (numpy.arange(n_window) * sp).astype(int)
+        ends = numpy.minimum((numpy.arange(n_window) * sp + sw).astype(int) + 1, self.ts.data.shape[0])
+        return starts, ends
+
+    def _fc_stream(self, var, starts, ends):
+        triangular = numpy.triu_indices(self.ts.data.shape[2], 1)
+        return numpy.array([numpy.corrcoef(self.ts.data[start:end, var, :, 0].T)[triangular]
+                            for start, end in zip(starts, ends)])
+
+    def test_sliding_fc(self):
+        for sp, sw, chunk_size in ((5, 100, 1024), (1, 40, 7), (7.5, 60.3, 64), (100, 100, 33)):
+            starts, ends = self._windows(sp, sw)
+            fc_stream = fcd_matrix.sliding_fc(self.ts, 1, 0, starts, ends, chunk_size)
+            self.assertTrue(numpy.allclose(self._fc_stream(1, starts, ends), fc_stream, rtol=0.0, atol=1e-12))
+
+    def test_fc_correlation(self):
+        fc_stream = numpy.random.RandomState(42).randn(20, 28)
+        self.assertTrue(numpy.allclose(numpy.corrcoef(fc_stream), fcd_matrix.fc_correlation(fc_stream)))
+
+    def test_evaluate(self):
+        fcd, fcd_segmented, eigvect, eigval, _ = fcd_matrix.FcdCalculator(time_series=self.ts, sw=100.0,
+                                                                          sp=5.0).evaluate()
+        starts, ends = self._windows(5.0, 100.0)
+        self.assertEqual((len(starts), len(starts), 2, 1), fcd.shape)
+        self.assertEqual(fcd.shape, fcd_segmented.shape)
+        for var in range(2):
+            expected = numpy.corrcoef(self._fc_stream(var, starts, ends))
+            self.assertTrue(numpy.allclose(expected, fcd[:, :, var, 0], rtol=0.0, atol=1e-12))
+            self.assertEqual(3, len(eigval[0][var][1]))
+            self.assertEqual((8, ), eigvect[0][var][1][0].shape)
+
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(FcdMatrixTest))
+    return test_suite
+
+
+
+if __name__ == "__main__":
+    #So you can run tests from this package individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+
+"""
+Test the FFT against a transform of the whole segmented time series, detrended
+with scipy, as the analyzer did before transforming one segment at a time.
+
+"""
+
+if __name__ == "__main__":
+    from tvb.tests.library import setup_test_console_env
+    setup_test_console_env()
+
+import numpy
+import scipy.signal
+import unittest
+from tvb.analyzers import fft
+from tvb.datatypes import spectral, time_series
+from tvb.tests.library.base_testcase import BaseTestCase
+
+
+
+class MemoryFourierSpectrum(spectral.FourierSpectrum):
+    "Keeps the chunks appended by write_data_slice in memory, in place of the framework storage."
+
+    def store_data_chunk(self, name, data, grow_dimension=None, close_file=True):
+        self.chunks = getattr(self, 'chunks', {})
+        self.chunks.setdefault(name, []).append((data, grow_dimension))
+
+    def stored(self, name):
+        chunks = self.chunks[name]
+        return numpy.concatenate([data for data, _ in chunks], axis=chunks[0][1])
+
+
+
+def reference_fft(data, seg_tpts, window=None):
+    "Fourier coefficients of the segments of data, (frequency, var, node, mode, segment)."
+    nseg = int(numpy.ceil(data.shape[0] * 1.0 / seg_tpts))
+    if nseg > 1:
+        overlap = (seg_tpts * nseg - data.shape[0]) / (nseg - 1.0)
+        starts = [int(max(seg * (seg_tpts - overlap), 0)) for seg in range(nseg)]
+    else:
+        seg_tpts, starts = data.shape[0], [0]
+    segments = numpy.concatenate([data[start:start + seg_tpts, ..., numpy.newaxis] for start in starts], axis=4)
+    segments = scipy.signal.detrend(segments, axis=0)
+    if window is not None:
+        segments = segments * getattr(numpy, window)(seg_tpts).reshape((-1, 1, 1, 1, 1))
+    return numpy.fft.fft(segments, axis=0)[1:seg_tpts // 2 + 1]
+
+
+
+class FFTTest(BaseTestCase):
+
+    def setUp(self):
+        super(FFTTest, self).setUp()
+        rng = numpy.random.RandomState(42)
+        t = numpy.arange(1000)[:, numpy.newaxis, numpy.newaxis, numpy.newaxis]
+        data = numpy.sin(0.3 * t) + 0.01 * t + rng.randn(1000, 2, 5, 2)
+        self.ts = time_series.TimeSeries(data=data, sample_period=0.5)
+
+    def test_detrend_linear(self):
+        data = self.ts.data.copy()
+        self.assertTrue(fft.detrend_linear(data) is data)
+        self.assertTrue(numpy.allclose(scipy.signal.detrend(self.ts.data, axis=0), data))
+
+    def test_evaluate(self):
+        for segment_length, window in ((128.0, None), (100.0, "hamming"), (500.0, "hanning"), (1000.0, None)):
+            spectra = fft.FFT(time_series=self.ts, segment_length=segment_length,
+                              window_function=window).evaluate()
+            expected = reference_fft(self.ts.data, int(segment_length / 0.5), window)
+            self.assertEqual(expected.shape, spectra.array_data.shape)
+            self.assertEqual(numpy.complex128, spectra.array_data.dtype)
+            self.assertTrue(numpy.allclose(expected, spectra.array_data))
+            if segment_length < 500.0:
+                analyzer = fft.FFT(time_series=self.ts, segment_length=segment_length)
+                self.assertEqual(expected.shape, analyzer.result_shape(self.ts.data.shape, segment_length, 0.5))
+
+    def test_complex64(self):
+        expected = fft.FFT(time_series=self.ts, segment_length=128.0).evaluate().array_data
+        spectra = fft.FFT(time_series=self.ts, segment_length=128.0, output="complex64").evaluate()
+        self.assertEqual(numpy.complex64, spectra.array_data.dtype)
+        self.assertTrue(numpy.allclose(expected, spectra.array_data, rtol=1e-4, atol=1e-4))
+
+    def test_average_power(self):
+        expected = fft.FFT(time_series=self.ts, segment_length=128.0, window_function="hamming").evaluate()
+        expected.compute_average_power()
+        expected.compute_normalised_average_power()
+        analyzer = fft.FFT(time_series=self.ts, segment_length=128.0, window_function="hamming",
+                           output="average_power")
+        spectra = analyzer.evaluate()
+        self.assertEqual(0, spectra.array_data.size)
+        self.assertEqual(analyzer.result_shape(self.ts.data.shape, 128.0, 0.5), spectra.average_power.shape)
+        self.assertTrue(numpy.allclose(expected.average_power, spectra.average_power))
+        self.assertTrue(numpy.allclose(expected.normalised_average_power, spectra.normalised_average_power))
+
+    def test_unsupported_output(self):
+        for output in ("float64", "complex256", "power"):
+            analyzer = fft.FFT(time_series=self.ts, segment_length=128.0, output=output)
+            self.assertRaises(ValueError, analyzer.evaluate)
+            self.assertRaises(ValueError, analyzer.result_size, self.ts.data.shape, 128.0, 0.5)
+
+    def test_write_data_slice(self):
+        expected = fft.FFT(time_series=self.ts, segment_length=128.0).evaluate()
+        expected.compute_average_power()
+        expected.compute_normalised_average_power()
+        for output in ("complex128", "average_power"):
+            writer = MemoryFourierSpectrum()
+            for nodes in (slice(0, 2), slice(2, 5)):
+                chunk = time_series.TimeSeries(data=self.ts.data[:, :, nodes], sample_period=0.5)
+                writer.write_data_slice(fft.FFT(time_series=chunk, segment_length=128.0, output=output).evaluate())
+            names = ["average_power", "normalised_average_power"]
+            if output == "complex128":
+                names += ["array_data", "amplitude", "phase", "power"]
+            self.assertEqual(sorted(names), sorted(writer.chunks))
+            for name in ["average_power", "normalised_average_power"]:
+                self.assertTrue(numpy.allclose(getattr(expected, name), writer.stored(name)), name)
+
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(FFTTest))
+    return test_suite
+
+
+
+if __name__ == "__main__":
+    #So you can run tests from this package individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+
+"""
+Test the balloon model against a step by step integration of its equations, with
+and without the compiled kernel.
+
+"""
+
+if __name__ == "__main__":
+    from tvb.tests.library import setup_test_console_env
+    setup_test_console_env()
+
+import numpy
+import unittest
+from tvb.analyzers import fmri_balloon
+from tvb.datatypes import time_series
+from tvb.simulator import integrators
+from tvb.tests.library.base_testcase import BaseTestCase
+
+
+
+class BalloonModelTest(BaseTestCase):
+
+    def setUp(self):
+        super(BalloonModelTest, self).setUp()
+        rng = numpy.random.RandomState(42)
+        data = rng.uniform(size=(500, 2, 3, 2))
+        self.ts = time_series.TimeSeriesRegion(data=data, time=numpy.arange(500) * 2.0, sample_period=2.0)
+
+    def evaluate(self, model, compiled=True):
+        "Evaluate model, integrated by the compiled kernel or, as without Numba, by the integrator scheme."
+        kernel = list(fmri_balloon._BALLOON_HEUN)
+        if not compiled:
+            fmri_balloon._BALLOON_HEUN[:] = [None]
+        try:
+            return model.evaluate()
+        finally:
+            fmri_balloon._BALLOON_HEUN[:] = kernel
+
+    def reference(self, model, neural_activity):
+        "BOLD signal of each channel, integrating the balloon model one step at a time."
+        model.integrator.dt = model.dt
+        model.integrator.configure()
+        x = neural_activity - neural_activity.mean(axis=0)
+        state = numpy.zeros((x.shape[0], 4) + x.shape[2:])
+        state[0, 1:] = 1.0
+        for step in range(1, x.shape[0]):
+            state[step] = model.integrator.scheme(state[step - 1], model.balloon_dfun, x[step], 0.0, 0.0)
+        k1, k2, k3 = model.compute_derived_parameters()
+        v, q = state[:, 2], state[:, 3]
+        if model.bold_model == "nonlinear":
+            return model.V0 * (k1 * (1. - q) + k2 * (1. - q / v) + k3 * (1. - v))
+        return model.V0 * ((k1 + k2) * (1. - q) + (k3 - k2) * (1. - v))
+
+    def test_evaluate(self):
+        for transformation in ("none", "abs_diff", "sum"):
+            for bold_model in ("nonlinear", "linear"):
+                for compiled in (True, False):
+                    model = fmri_balloon.BalloonModel(time_series=self.ts, neural_input_transformation=transformation,
+                                                      bold_model=bold_model)
+                    neural_activity, t_int = model.input_transformation(self.ts, transformation)
+                    bold = self.evaluate(model, compiled)
+                    self.assertEqual(t_int.shape[0], bold.data.shape[0])
+                    self.assertTrue(numpy.allclose(self.reference(model, neural_activity), bold.data[:, 0]))
+
+    def test_other_integrator(self):
+        model = fmri_balloon.BalloonModel(time_series=self.ts, integrator=integrators.EulerDeterministic(),
+                                          neural_input_transformation="none", bold_model="nonlinear")
+        neural_activity, _ = model.input_transformation(self.ts, "none")
+        self.assertTrue(numpy.allclose(self.reference(model, neural_activity), model.evaluate().data[:, 0]))
+
+    def test_sample_period(self):
+        expected = fmri_balloon.BalloonModel(time_series=self.ts).evaluate()
+        for compiled in (True, False):
+            bold = self.evaluate(fmri_balloon.BalloonModel(time_series=self.ts, sample_period=0.01), compiled)
+            self.assertEqual(0.01, bold.sample_period)
+            self.assertTrue(numpy.allclose(expected.time[::5], bold.time))
+            self.assertTrue(numpy.allclose(expected.data[::5], bold.data))
+
+    def test_evaluate_batch(self):
+        other = time_series.TimeSeriesRegion(data=self.ts.data[:, :, :2] ** 2, time=self.ts.time, sample_period=2.0)
+        model = fmri_balloon.BalloonModel()
+        for ts, bold in zip((self.ts, other), model.evaluate_batch([self.ts, other])):
+            expected = fmri_balloon.BalloonModel(time_series=ts).evaluate()
+            self.assertTrue(numpy.allclose(expected.data, bold.data))
+        shorter = time_series.TimeSeriesRegion(data=self.ts.data[:100], time=self.ts.time[:100], sample_period=2.0)
+        self.assertRaises(ValueError, model.evaluate_batch, [self.ts, shorter])
+
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(BalloonModelTest))
+    return test_suite
+
+
+
+if __name__ == "__main__":
+    #So you can run tests from this package individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
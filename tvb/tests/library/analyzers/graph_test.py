@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+
+"""
+Test the graph metrics against networkx, and the lesion strategies against a direct
+recomputation of the metrics on the lesioned matrices.
+
+"""
+
+if __name__ == "__main__":
+    from tvb.tests.library import setup_test_console_env
+    setup_test_console_env()
+
+import numpy
+import networkx
+import unittest
+from tvb.analyzers import graph
+from tvb.datatypes.connectivity import Connectivity
+from tvb.tests.library.base_testcase import BaseTestCase
+
+
+
+class GraphTest(BaseTestCase):
+
+    def setUp(self):
+        super(GraphTest, self).setUp()
+        rng = numpy.random.RandomState(42)
+        self.weights = rng.uniform(size=(30, 30)) * (rng.uniform(size=(30, 30)) < 0.15)
+        numpy.fill_diagonal(self.weights, 0.0)
+        self.connectivity = Connectivity(weights=self.weights)
+
+    def test_betweenness_bin(self):
+        binary = (self.weights > 0) * 1.0
+        expected = networkx.betweenness_centrality(networkx.from_numpy_matrix(binary, create_using=networkx.DiGraph()),
+                                                   normalized=False)
+        expected = numpy.array([expected[node] for node in range(30)])
+        self.assertTrue(numpy.allclose(expected, graph.betweenness_bin(binary)))
+        # weights are binarized
+        self.assertTrue(numpy.allclose(expected, graph.betweenness_bin(self.weights)))
+
+    def test_efficiency_bin(self):
+        binary = ((self.weights + self.weights.T) > 0) * 1.0
+        lengths = networkx.all_pairs_shortest_path_length(networkx.from_numpy_matrix(binary))
+        inverse = numpy.zeros((30, 30))
+        for source, targets in lengths:
+            for target, length in targets.items():
+                if length > 0:
+                    inverse[source, target] = 1.0 / length
+        self.assertTrue(numpy.allclose(inverse, graph.distance_inv(binary)))
+        self.assertAlmostEqual(inverse.sum() / (30 * 29), graph.efficiency_bin(binary))
+
+    def test_get_components_sizes(self):
+        A = numpy.zeros((6, 6))
+        # the component of the first node is not the largest one
+        A[0, 1] = A[1, 0] = 1.0
+        A[2, 3] = A[4, 3] = 1.0
+        self.assertEqual(3, graph.get_components_sizes(A))
+        self.assertEqual(1, graph.get_components_sizes(numpy.zeros((3, 3))))
+
+    def test_random_deletion(self):
+        sequence = numpy.random.RandomState(42).permutation(30)[:28]
+        strength, degree, efficiency, component = graph.sequential_random_deletion(self.connectivity, sequence, 30)
+        temp = self.weights.copy()
+        for i, idx in enumerate(sequence):
+            temp[idx, :] = temp[:, idx] = 0.0
+            self.assertTrue(numpy.allclose(temp.sum(axis=0) + temp.sum(axis=1), strength[:, i]))
+            self.assertTrue(numpy.allclose((temp > 0).sum(axis=0) + (temp > 0).sum(axis=1), degree[:, i]))
+            self.assertAlmostEqual(graph.efficiency_bin(temp), efficiency[i])
+            self.assertEqual(graph.get_components_sizes(temp), component[i])
+
+    def test_random_deletion_ensemble(self):
+        results = graph.random_deletion_ensemble(self.connectivity, 3, processes=1, seed=42)
+        sequences = results[-1]
+        self.assertEqual((3, 28), sequences.shape)
+        for i, sequence in enumerate(sequences):
+            for expected, actual in zip(graph.sequential_random_deletion(self.connectivity, sequence, 30), results):
+                self.assertTrue(numpy.allclose(expected, actual[i]))
+        for expected, actual in zip(results, graph.random_deletion_ensemble(self.connectivity, 3, processes=2, seed=42)):
+            self.assertTrue(numpy.allclose(expected, actual))
+
+    def test_targeted_deletion(self):
+        strength, degree, betweenness, efficiency, component = graph.sequential_targeted_deletion(self.connectivity, 30)
+        lesioned = [self.weights.copy() for _ in range(3)]
+        for idx in range(28):
+            temp_strength, temp_degree, temp_bc = lesioned
+            self.assertTrue(numpy.allclose(temp_strength.sum(axis=0) + temp_strength.sum(axis=1), strength[:, idx]))
+            self.assertTrue(numpy.allclose((temp_degree > 0).sum(axis=0) + (temp_degree > 0).sum(axis=1),
+                                           degree[:, idx]))
+            self.assertTrue(numpy.allclose(graph.betweenness_bin(temp_bc), betweenness[:, idx]))
+            for strategy, metric in enumerate((strength, degree, betweenness)):
+                target = numpy.argsort(metric[:, idx])[-1]
+                lesioned[strategy][target, :] = lesioned[strategy][:, target] = 0.0
+                self.assertAlmostEqual(graph.efficiency_bin(lesioned[strategy]), efficiency[idx, strategy])
+                self.assertEqual(graph.get_components_sizes(lesioned[strategy]), component[idx, strategy])
+
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(GraphTest))
+    return test_suite
+
+
+
+if __name__ == "__main__":
+    #So you can run tests from this package individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
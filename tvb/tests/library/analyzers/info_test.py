@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+
+"""
+Test sample entropy against a direct count of the template matches.
+
+"""
+
+if __name__ == "__main__":
+    from tvb.tests.library import setup_test_console_env
+    setup_test_console_env()
+
+import numpy
+import unittest
+from tvb.analyzers import info
+from tvb.datatypes import time_series
+from tvb.tests.library.base_testcase import BaseTestCase
+
+
+
+def count_matches(y, n, r):
+    "Number of pairs of templates y[i:i + n] with all differences below r, comparing every pair."
+    templates = numpy.array([y[i:i + n] for i in range(y.size - n + 1)])
+    return sum((numpy.abs(templates[i + 1:] - templates[i]) < r).all(axis=1).sum()
+               for i in range(templates.shape[0] - 1))
+
+
+
+class SampenTest(BaseTestCase):
+
+    def setUp(self):
+        super(SampenTest, self).setUp()
+        rng = numpy.random.RandomState(42)
+        # correlated signal, so that matches are not too rare
+        self.y = numpy.convolve(rng.randn(600), numpy.ones(5) / 5.0, 'valid')
+
+    def test_sampen(self):
+        r = 0.15 * self.y.std()
+        for tau in (1, 2, 3):
+            y = self.y[:self.y.size // tau * tau].reshape((-1, tau)).mean(axis=1)
+            c1, c2 = count_matches(y, 2, r), count_matches(y, 3, r)
+            e, p, c2_, c1_ = info.sampen(self.y, taus=tau, info=True)
+            self.assertEqual((c1, c2), (c1_, c2_))
+            self.assertAlmostEqual(-numpy.log(c2 * 1.0 / c1), e)
+            self.assertAlmostEqual(-numpy.log(c2 * 1.0 / c1 / (2 * r)), info.sampen(self.y, taus=tau, qse=True))
+
+    def test_scales(self):
+        taus = numpy.r_[1:4]
+        expected = [info.sampen(self.y, m=3, r=0.2, taus=tau) for tau in taus]
+        self.assertTrue(numpy.allclose(expected, info.sampen(self.y, m=3, r=0.2, taus=taus)))
+
+    def test_sampen_nodes(self):
+        signals = numpy.array([numpy.roll(self.y, shift) for shift in range(6)]).T
+        data = time_series.TimeSeries(data=signals.reshape((-1, 1, 3, 2))).data
+        taus = [1, 2]
+        expected = numpy.empty((2, 1, 3, 2))
+        for node in range(3):
+            for mode in range(2):
+                expected[:, 0, node, mode] = info.sampen(data[:, 0, node, mode], taus=taus)
+        for processes in (1, 2):
+            self.assertTrue(numpy.allclose(expected, info.sampen_nodes(data, taus=taus, processes=processes)))
+
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(SampenTest))
+    return test_suite
+
+
+
+if __name__ == "__main__":
+    #So you can run tests from this package individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
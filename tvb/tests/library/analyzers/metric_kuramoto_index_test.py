@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+
+"""
+Test the Kuramoto index and order parameters against a direct computation of
+the oscillator phases.
+
+"""
+
+if __name__ == "__main__":
+    from tvb.tests.library import setup_test_console_env
+    setup_test_console_env()
+
+import cmath
+import numpy
+import unittest
+from tvb.analyzers import metric_kuramoto_index
+from tvb.datatypes import time_series
+from tvb.tests.library.base_testcase import BaseTestCase
+
+
+
+class KuramotoIndexTest(BaseTestCase):
+
+    def setUp(self):
+        super(KuramotoIndexTest, self).setUp()
+        rng = numpy.random.RandomState(42)
+        t = numpy.arange(1000) * 0.01
+        # oscillators at 10 Hz with scattered phase lags, the two modes being differently spread
+        lags = rng.uniform(size=(1, 1, 5, 2)) * numpy.array([1.0, 4.0])
+        angle = 2 * numpy.pi * 10 * t[:, numpy.newaxis, numpy.newaxis, numpy.newaxis] + lags
+        data = numpy.concatenate((numpy.cos(angle), numpy.sin(angle)), axis=1)
+        data = numpy.concatenate((data, data[:, ::-1] + 0.1 * rng.randn(*data.shape)), axis=1)
+        self.ts = time_series.TimeSeries(data=data, sample_period=0.01)
+
+    def reference(self, x, y):
+        "Order parameter r(t) of the oscillators at the points (x, y), one complex number at a time."
+        r = numpy.empty(x.shape[0])
+        for t in range(x.shape[0]):
+            theta = [cmath.phase(complex(xi, yi)) for xi, yi in zip(x[t], y[t])]
+            r[t] = abs(sum(cmath.exp(1j * angle) for angle in theta) / len(theta))
+        return r
+
+    def test_evaluate(self):
+        data = self.ts.data
+        expected = self.reference(data[:, 0, :, 0], data[:, 1, :, 0]).mean()
+        self.assertAlmostEqual(expected, metric_kuramoto_index.KuramotoIndex(time_series=self.ts).evaluate())
+
+    def test_order_parameters(self):
+        data = self.ts.data
+        r = metric_kuramoto_index.KuramotoIndex(time_series=self.ts).order_parameters()
+        self.assertEqual((1000, 2, 2), r.shape)
+        for pair in range(2):
+            for mode in range(2):
+                expected = self.reference(data[:, 2 * pair, :, mode], data[:, 2 * pair + 1, :, mode])
+                self.assertTrue(numpy.allclose(expected, r[:, pair, mode]))
+        windowed = metric_kuramoto_index.KuramotoIndex(time_series=self.ts).order_parameters(window=50)
+        self.assertEqual((951, 2, 2), windowed.shape)
+        for start in (0, 17, 950):
+            self.assertTrue(numpy.allclose(r[start:start + 50].mean(axis=0), windowed[start]))
+        self.assertRaises(ValueError, metric_kuramoto_index.order_parameter, r, 1, 1001)
+
+    def test_use_hilbert(self):
+        data = self.ts.data[:, :1]
+        one_variable = time_series.TimeSeries(data=data, sample_period=0.01)
+        kuramoto = metric_kuramoto_index.KuramotoIndex(time_series=one_variable, use_hilbert=True)
+        r = kuramoto.order_parameters()
+        self.assertEqual((1000, 1, 2), r.shape)
+        # phases of the analytic signal of the cosines, away from the edge effects
+        expected = self.reference(data[:, 0, :, 0], self.ts.data[:, 1, :, 0])
+        self.assertTrue(numpy.allclose(expected[100:-100], r[100:-100, 0, 0], atol=1e-3))
+        self.assertAlmostEqual(r[:, 0, 0].mean(), kuramoto.evaluate())
+        self.assertRaises(Exception, metric_kuramoto_index.KuramotoIndex(time_series=one_variable).evaluate)
+
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(KuramotoIndexTest))
+    return test_suite
+
+
+
+if __name__ == "__main__":
+    #So you can run tests from this package individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
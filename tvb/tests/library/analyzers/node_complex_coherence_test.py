@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+
+"""
+Test NodeComplexCoherence against a direct, segment by segment computation of the cross spectra.
+
+"""
+
+if __name__ == "__main__":
+    from tvb.tests.library import setup_test_console_env
+    setup_test_console_env()
+
+import numpy
+import unittest
+from scipy import signal
+from tvb.analyzers import node_complex_coherence
+from tvb.datatypes import time_series
+from tvb.tests.library.base_testcase import BaseTestCase
+
+
+
+class NodeComplexCoherenceTest(BaseTestCase):
+
+    def setUp(self):
+        super(NodeComplexCoherenceTest, self).setUp()
+        data = numpy.random.RandomState(42).randn(1000, 1, 4, 1)
+        self.ts = time_series.TimeSeries(data=data, sample_period=1.0)
+
+    def _analyzer(self, **kwargs):
+        return node_complex_coherence.NodeComplexCoherence(time_series=self.ts, epoch_length=200.0,
+                                                           segment_length=50.0, segment_shift=25.0, **kwargs)
+
+    def _expected(self, average_segments=True, detrend_ts=False):
+        "Cross spectrum & coherence (nchan, nchan, nfreq[, nseg]) accumulated one segment at a time."
+        data = self.ts.data[:, 0, :, 0]
+        n_epoch, n_seg, n_freq = 5, 7, 26
+        window = numpy.hanning(50)[:, numpy.newaxis]
+        cs = numpy.zeros((4, 4, n_freq, n_seg), dtype=complex)
+        av = numpy.zeros((4, n_freq, n_seg), dtype=complex)
+        for epoch in range(n_epoch):
+            for seg in range(n_seg):
+                start = epoch * 200 + seg * 25
+                segment = data[start:start + 50]
+                if detrend_ts:
+                    segment = signal.detrend(segment, axis=0)
+                spectrum = numpy.fft.fft(segment * window, axis=0)[:n_freq]
+                for freq in range(n_freq):
+                    cs[:, :, freq, seg] += numpy.outer(spectrum[freq], spectrum[freq].conj())
+                    av[:, freq, seg] += spectrum[freq]
+        if average_segments:
+            cs, av, nave = cs.sum(axis=-1), av.sum(axis=-1), n_epoch * n_seg
+        else:
+            nave = n_epoch
+        cs, av = cs / nave, av / nave
+        cs -= av[:, numpy.newaxis] * av[numpy.newaxis].conj()
+        auto = cs[range(4), range(4)]
+        coh = cs / numpy.sqrt(auto[:, numpy.newaxis].conj() * auto[numpy.newaxis])
+        return cs, coh
+
+    def _assert_close(self, expected, result):
+        cs, coh = expected
+        self.assertEqual(cs.shape, result.cross_spectrum.shape)
+        self.assertTrue(numpy.allclose(cs, result.cross_spectrum, rtol=1e-10, atol=1e-10))
+        self.assertTrue(numpy.allclose(coh, result.array_data, rtol=1e-10, atol=1e-10))
+
+    def test_evaluate(self):
+        self._assert_close(self._expected(), self._analyzer().evaluate())
+
+    def test_detrend(self):
+        self._assert_close(self._expected(detrend_ts=True), self._analyzer(detrend_ts=True).evaluate())
+
+    def test_segments(self):
+        self._assert_close(self._expected(average_segments=False), self._analyzer(average_segments=False).evaluate())
+
+    def test_pairs(self):
+        pairs = numpy.array([[0, 2], [1, 3], [1, 1]])
+        for average_segments in (True, False):
+            cs, coh = self._expected(average_segments=average_segments)
+            mask = numpy.zeros((4, 4), dtype=bool)
+            mask[pairs[:, 0], pairs[:, 1]] = mask[pairs[:, 1], pairs[:, 0]] = True
+            cs[~mask] = coh[~mask] = 0.0
+            result = self._analyzer(pairs=pairs, average_segments=average_segments).evaluate()
+            self._assert_close((cs, coh), result)
+            triu = numpy.transpose(numpy.triu_indices(4))
+            full = self._analyzer(pairs=triu, average_segments=average_segments).evaluate()
+            self._assert_close(self._expected(average_segments=average_segments), full)
+
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(NodeComplexCoherenceTest))
+    return test_suite
+
+
+
+if __name__ == "__main__":
+    #So you can run tests from this package individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+
+"""
+Test the out of core PCA and ICA against the in memory PCA and known sources.
+
+"""
+
+if __name__ == "__main__":
+    from tvb.tests.library import setup_test_console_env
+    setup_test_console_env()
+
+import numpy
+import unittest
+import matplotlib.mlab as mlab
+from tvb.analyzers import pca, ica
+from tvb.datatypes import time_series
+from tvb.tests.library.base_testcase import BaseTestCase
+
+
+
+class PCATest(BaseTestCase):
+
+    def setUp(self):
+        super(PCATest, self).setUp()
+        rng = numpy.random.RandomState(42)
+        # a few dominant components, with clearly distinct variances, and noise
+        loadings = rng.randn(4, 20) * numpy.array([8.0, 5.0, 3.0, 2.0])[:, numpy.newaxis]
+        data = numpy.dot(rng.randn(2000, 4), loadings) + rng.randn(2000, 20) + 3.0
+        self.ts = time_series.TimeSeries(data=data.reshape((2000, 1, 20, 1)), sample_period=1.0)
+        self.mlab_pca = mlab.PCA(data)
+
+    def assert_components(self, result, n_comp, rtol):
+        fractions = self.mlab_pca.fracs[:n_comp]
+        self.assertTrue(numpy.allclose(fractions, result.fractions[:, 0, 0], rtol=rtol))
+        for expected, actual in zip(self.mlab_pca.Wt[:n_comp], result.weights[:, :, 0, 0]):
+            # the sign of a component is arbitrary
+            self.assertTrue(numpy.allclose(expected, numpy.sign(numpy.dot(expected, actual)) * actual, atol=rtol))
+
+    def test_randomized_eigh(self):
+        z = (self.ts.data[:, 0, :, 0] - self.mlab_pca.mu) / self.mlab_pca.sigma
+        expected_values, expected_vectors = numpy.linalg.eigh(numpy.dot(z.T, z))
+        values, vectors = pca.randomized_eigh(self.ts, 0, 0, 4, self.mlab_pca.mu, self.mlab_pca.sigma)
+        self.assertTrue(numpy.allclose(expected_values[::-1][:4], values))
+        self.assertTrue(numpy.allclose(numpy.abs(expected_vectors[:, ::-1][:, :4]), numpy.abs(vectors), atol=1e-4))
+
+    def test_node_moments(self):
+        mean, std = pca.node_moments(self.ts, 0, 0)
+        self.assertTrue(numpy.allclose(self.mlab_pca.mu, mean))
+        self.assertTrue(numpy.allclose(self.mlab_pca.sigma, std))
+
+    def test_read_blocks(self):
+        data = self.ts.data[:, 0, :, 0]
+        blocks = list(pca.read_blocks(self.ts, 0, 0, min_length=300, block_length=600))
+        self.assertEqual([600, 600, 800], [block.shape[0] for block in blocks])
+        self.assertTrue(numpy.array_equal(data, numpy.vstack(blocks)))
+
+    def test_randomized_pca(self):
+        result = pca.RandomizedPCA(time_series=self.ts, n_components=4).evaluate()
+        self.assertEqual((4, 20, 1, 1), result.weights.shape)
+        # two power iterations, on a well separated spectrum
+        self.assert_components(result, 4, 1e-4)
+
+    def test_incremental_pca(self):
+        result = pca.IncrementalPCA(time_series=self.ts, n_components=4).evaluate()
+        self.assertEqual((4, 20, 1, 1), result.weights.shape)
+        self.assert_components(result, 4, 1e-6)
+
+
+
+class MiniBatchICATest(BaseTestCase):
+
+    def test_sources(self):
+        rng = numpy.random.RandomState(42)
+        t = numpy.linspace(0, 100, 20000)
+        sources = numpy.array([numpy.sign(numpy.sin(3 * t)), (2 * t) % 2 - 1, rng.laplace(size=t.size)]).T
+        data = numpy.dot(sources, rng.randn(3, 8)) + 1e-3 * rng.randn(t.size, 8)
+        ts = time_series.TimeSeries(data=data.reshape((t.size, 1, 8, 1)), sample_period=1.0)
+        for batch_size in (2000, t.size):
+            result = ica.MiniBatchICA(time_series=ts, n_components=3, batch_size=batch_size).evaluate()
+            self.assertEqual((3, 8, 1, 1), result.prewhitening_matrix.shape)
+            recovered = result.component_time_series[:, :, 0, 0]
+            correlation = numpy.abs(numpy.corrcoef(sources.T, recovered.T)[:3, 3:])
+            # each source is recovered by exactly one component
+            self.assertTrue((correlation.max(axis=1) > 0.995).all())
+            self.assertEqual(range(3), sorted(correlation.argmax(axis=1)))
+
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(PCATest))
+    test_suite.addTest(unittest.makeSuite(MiniBatchICATest))
+    return test_suite
+
+
+
+if __name__ == "__main__":
+    #So you can run tests from this package individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+
+"""
+Test the continuous wavelet transform against a direct convolution with the wavelets, and its
+chunked evaluation against evaluate.
+
+"""
+
+if __name__ == "__main__":
+    from tvb.tests.library import setup_test_console_env
+    setup_test_console_env()
+
+import numpy
+import unittest
+from tvb.analyzers import wavelet
+from tvb.basic.traits import types_basic as basic
+from tvb.datatypes import spectral, time_series
+from tvb.tests.library.base_testcase import BaseTestCase
+
+
+
+class MemoryWaveletCoefficients(spectral.WaveletCoefficients):
+    "Keeps the chunks appended by write_data_slice in memory, in place of the framework storage."
+
+    def store_data_chunk(self, name, data, grow_dimension=None, close_file=True):
+        self.chunks = getattr(self, 'chunks', {})
+        self.chunks.setdefault(name, []).append((data, grow_dimension))
+
+    def stored(self, name):
+        chunks = self.chunks[name]
+        return numpy.concatenate([data for data, _ in chunks], axis=chunks[0][1])
+
+
+
+class ContinuousWaveletTransformTest(BaseTestCase):
+
+    def setUp(self):
+        super(ContinuousWaveletTransformTest, self).setUp()
+        data = numpy.random.RandomState(42).randn(512, 2, 5, 1)
+        self.ts = time_series.TimeSeries(data=data, sample_period=1.0)
+        self.ts.configure()
+        self.max_chunk_memory = wavelet.MAX_CHUNK_MEMORY
+
+    def tearDown(self):
+        wavelet.MAX_CHUNK_MEMORY = self.max_chunk_memory
+
+    def _analyzer(self, output="complex128"):
+        return wavelet.ContinuousWaveletTransform(time_series=self.ts, sample_period=4.0, output=output,
+                                                  frequencies=basic.Range(lo=0.05, hi=0.19, step=0.05))
+
+    def test_evaluate(self):
+        "Coefficients are the convolution of each channel with the Morlet wavelet of each scale."
+        analyzer = self._analyzer()
+        coef = analyzer.evaluate().array_data
+        self.assertEqual((3, 128, 2, 5, 1), coef.shape)
+        sample_rate = self.ts.sample_rate
+        for i, f0 in enumerate(numpy.arange(0.05, 0.19, 0.05)):
+            sigma_t = 1.0 / (2.0 * numpy.pi * f0 / 5.0)
+            amp = 1.0 / numpy.sqrt(sample_rate * numpy.sqrt(numpy.pi) * sigma_t)
+            x = numpy.arange(0, 4.0 * sigma_t * sample_rate, 1) / sample_rate
+            wvlt = amp * numpy.exp(-x ** 2 / (2.0 * sigma_t ** 2)) * numpy.exp(2j * numpy.pi * f0 * x)
+            wvlt = numpy.r_[numpy.conjugate(wvlt[:0:-1]), wvlt]
+            for var in range(2):
+                for node in range(5):
+                    expected = numpy.convolve(self.ts.data[:, var, node, 0], wvlt, 'same')[::4]
+                    self.assertTrue(numpy.allclose(expected, coef[i, :, var, node, 0], rtol=0.0, atol=1e-10))
+
+    def test_power(self):
+        coef = self._analyzer().evaluate().array_data
+        for output, dtype in (("complex64", numpy.complex64), ("power", numpy.float64)):
+            result = self._analyzer(output).evaluate()
+            if output == "power":
+                self.assertEqual(0, result.array_data.size)
+                self.assertTrue(numpy.allclose(numpy.abs(coef) ** 2, result.power))
+            else:
+                self.assertEqual(dtype, result.array_data.dtype)
+                self.assertTrue(numpy.allclose(coef, result.array_data, rtol=1e-5, atol=1e-6))
+
+    def test_unsupported_output(self):
+        for output in ("float64", "complex256", "average_power"):
+            analyzer = self._analyzer(output)
+            self.assertRaises(ValueError, analyzer.evaluate)
+            self.assertRaises(ValueError, analyzer.result_size, self.ts.data.shape)
+
+    def test_evaluate_chunked(self):
+        # one node per chunk
+        wavelet.MAX_CHUNK_MEMORY = 1
+        for output in ("complex128", "power"):
+            expected = self._analyzer(output).evaluate()
+            writer = self._analyzer(output).evaluate_chunked(MemoryWaveletCoefficients())
+            self.assertTrue(writer.source is self.ts)
+            names = ('power', ) if output == "power" else ('array_data', 'amplitude', 'phase', 'power')
+            self.assertEqual(sorted(names), sorted(writer.chunks))
+            for name in names:
+                self.assertEqual(5, len(writer.chunks[name]))
+                self.assertTrue(numpy.allclose(getattr(expected, name), writer.stored(name)), name)
+
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(ContinuousWaveletTransformTest))
+    return test_suite
+
+
+
+if __name__ == "__main__":
+    #So you can run tests from this package individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
@@ -36,6 +36,7 @@ if __name__ == "__main__":
     from tvb.tests.library import setup_test_console_env
     setup_test_console_env()
 
+import numpy
 import unittest
 from tvb.datatypes import equations
 from tvb.tests.library.base_testcase import BaseTestCase
@@ -87,6 +88,18 @@ class EquationsTest(BaseTestCase):
         dt = equations.GeneralizedSigmoid() 
         self.assertEqual(dt.parameters, {'high': 1.0, 'midpoint': 1.0, 'sigma': 0.3, 'low': 0.0})
 
+
+    def test_support_radius(self):
+        for dt in (equations.Gaussian(), equations.DoubleGaussian(), equations.Sigmoid()):
+            radius = dt.support_radius(tolerance=1e-3)
+            dt.pattern = numpy.array([radius, 2 * radius, numpy.inf])
+            self.assertTrue(abs(dt.pattern[0] - dt.pattern[2]) < 1.1e-3)
+            self.assertTrue(abs(dt.pattern[1] - dt.pattern[2]) < 1e-3)
+        self.assertTrue(equations.DiscreteEquation().support_radius() is None)
+        for sigma in (0.0, -1.0):
+            dt = equations.Sigmoid(parameters={"amp": 1.0, "radius": 5.0, "sigma": sigma, "offset": 0.0})
+            self.assertTrue(dt.support_radius() is None)
+
         
     def test_sinusoiddata(self):
         dt = equations.Sinusoid()
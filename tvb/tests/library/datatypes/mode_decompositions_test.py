@@ -65,8 +65,23 @@ class ModeDecompositionsTest(BaseTestCase):
         self.assertEqual(dt.norm_source.shape, (10, 10, 10, 10))
         self.assertEqual(dt.component_time_series.shape, (10, 10, 10, 10))
         self.assertEqual(dt.normalised_component_time_series.shape, (10, 10, 10, 10))
-        
-        
+
+
+    def test_principalcomponents_leading(self):
+        data = numpy.random.random((10, 10, 10, 10))
+        ts = time_series.TimeSeries(data=data)
+        n_comp = 3
+        dt = mode_decompositions.PrincipalComponents(source = ts,
+                                                    fractions = numpy.random.random((n_comp, 10, 10)),
+                                                    weights = numpy.random.random((n_comp, 10, 10, 10)))
+        dt.configure()
+        dt.compute_norm_source()
+        dt.compute_component_time_series()
+        dt.compute_normalised_component_time_series()
+        self.assertEqual(dt.component_time_series.shape, (10, 10, n_comp, 10))
+        self.assertEqual(dt.normalised_component_time_series.shape, (10, 10, n_comp, 10))
+
+
     def test_independentcomponents(self):
         data = numpy.random.random((10, 10, 10, 10))
         ts = time_series.TimeSeries(data=data)
@@ -35,7 +35,8 @@ if __name__ == "__main__":
     from tvb.tests.library import setup_test_console_env
     setup_test_console_env()
 
-import numpy    
+import numpy
+import scipy.sparse
 import unittest
 from tvb.datatypes import patterns, equations, connectivity, surfaces
 from tvb.tests.library.base_testcase import BaseTestCase
@@ -114,6 +115,22 @@ class PatternsTest(BaseTestCase):
         self.assertTrue(isinstance(dt.temporal, equations.Gaussian))
         self.assertTrue(dt.temporal_pattern is None)
         self.assertTrue(dt.time is None)
+
+
+    def test_stimulisurface_finite_support(self):
+        srf = surfaces.CorticalSurface(load_default=True)
+        srf.configure()
+        dt = patterns.StimuliSurface()
+        dt.surface = srf
+        dt.spatial = equations.Gaussian(parameters={"amp": 1.0, "sigma": 2.0, "midpoint": 0.0, "offset": 0.5})
+        dt.focal_points_surface = [0, 1000]
+        dt.configure_space()
+        self.assertTrue(scipy.sparse.issparse(dt.space))
+        self.assertEqual(dt.space.shape, (16384, 2))
+        self.assertTrue(dt.space.nnz < 16384)
+        dt.spatial.pattern = srf.geodesic_distances([0, 1000]).toarray()
+        expected = numpy.sum(dt.spatial.pattern, axis=1)[:, numpy.newaxis]
+        self.assertTrue(numpy.allclose(dt.spatial_pattern, expected, atol=1e-5))
         
         
     def test_spatialpatternvolume(self):
@@ -74,11 +74,79 @@ class SensorsTest(BaseTestCase):
         dummy_surf.vertices = numpy.array(range(30)).reshape(10, 3).astype('f')
         dummy_surf.triangles = numpy.array(range(9)).reshape(3, 3)
         dummy_surf.configure()
+        self.assertRaises(ValueError, dt.sensors_to_surface, dummy_surf)
+
+
+    def _octahedron(self, extra_vertices=(), extra_triangles=()):
+        "Surface of the octahedron |x| + |y| + |z| = 2, with extra vertices and triangles."
+        surf = SkinAir()
+        vertices = [[2, 0, 0], [0, 2, 0], [0, 0, 2], [-2, 0, 0], [0, -2, 0], [0, 0, -2]]
+        triangles = [[0, 1, 2], [1, 3, 2], [3, 4, 2], [4, 0, 2], [1, 0, 5], [3, 1, 5], [4, 3, 5], [0, 4, 5]]
+        surf.vertices = numpy.array(vertices + list(extra_vertices), dtype=numpy.float64)
+        surf.triangles = numpy.array(triangles + list(extra_triangles))
+        surf.configure()
+        return surf
+
+
+    def _sensors(self, directions):
+        dt = sensors.Sensors(labels=numpy.array(["s%d" % k for k in range(len(directions))]),
+                             locations=numpy.array(directions, dtype=numpy.float64))
+        dt.configure()
+        return dt
+
+
+    def test_ray_triangle_intersections(self):
+        vertices = numpy.array([[2, 0, 0], [0, 2, 0], [0, 0, 2], [1, 1, 0]], dtype=numpy.float64)
+        triangles = numpy.array([[[0, 1, 2], [0, 1, 3]]] * 3)
+        directions = numpy.array([[1, 1, 1], [-1, -1, -1], [1, -1, 0]]) / numpy.sqrt([[3.0], [3.0], [2.0]])
+        t, u, v = sensors.ray_triangle_intersections(directions, vertices, triangles)
+        self.assertEqual((3, 2), t.shape)
+        # (2/3, 2/3, 2/3) in the middle of the triangle, and behind the opposite ray
+        self.assertTrue(numpy.allclose([2 / numpy.sqrt(3.0), -2 / numpy.sqrt(3.0)], t[:2, 0]))
+        self.assertTrue(numpy.allclose(1 / 3.0, u[:2, 0]))
+        self.assertTrue(numpy.allclose(1 / 3.0, v[:2, 0]))
+        # a ray parallel to the triangle, and a degenerate triangle
+        self.assertTrue(numpy.isnan(t[2, 0]))
+        self.assertTrue(numpy.isnan(t[:, 1]).all())
+
+
+    def test_sensors_to_closed_surface(self):
+        directions = numpy.random.RandomState(42).randn(50, 3)
+        directions[:3] = [[1, 1, 1], [1, 0, 0], [-1, 2, -3]]
+        mapping = self._sensors(directions).sensors_to_surface(self._octahedron())
+        expected = 2 * directions / numpy.abs(directions).sum(axis=1)[:, numpy.newaxis]
+        self.assertTrue(numpy.allclose(expected, mapping))
+
+
+    def test_sensors_to_surface_wider_search(self):
+        # degenerate triangles along the sensor direction hide, in the first search, the face it hits
+        direction = numpy.array([1.0, 1.2, 0.8])
+        along = [direction * (1 + 0.01 * k) for k in range(40)]
+        degenerate = [[6 + k, 6 + k, 6 + (k + 1) % 40] for k in range(40)]
+        surf = self._octahedron(along, degenerate)
+        self.assertTrue(len(degenerate) >= sensors.CANDIDATE_TRIANGLES[0])
+        self.assertTrue(len(surf.triangles) <= sensors.CANDIDATE_TRIANGLES[-1])
+        mapping = self._sensors([direction]).sensors_to_surface(surf)
+        self.assertTrue(numpy.allclose([direction * 2 / 3.0], mapping))
+
+
+    def test_sensors_off_surface(self):
+        # the upper half of the octahedron, so that nothing is found below
+        surf = SkinAir()
+        surf.vertices = numpy.array([[2, 0, 0], [0, 2, 0], [0, 0, 2], [-2, 0, 0], [0, -2, 0]], dtype=numpy.float64)
+        surf.triangles = numpy.array([[0, 1, 2], [1, 3, 2], [3, 4, 2], [4, 0, 2]])
+        surf.configure()
+        warnings = []
+        log = sensors.LOG
+        sensors.LOG = type("Log", (object, ), {"warning": staticmethod(warnings.append)})()
         try:
-            dt.sensors_to_surface(dummy_surf)
-            self.fail("Should have failed for this simple surface!")
-        except Exception:
-            pass
+            mapping = self._sensors([[1, 1, 1], [0.1, 0.2, -1]]).sensors_to_surface(surf)
+        finally:
+            sensors.LOG = log
+        self.assertTrue(numpy.allclose([2 / 3.0] * 3, mapping[0]))
+        self.assertEqual(1, len(warnings))
+        self.assertTrue("sensor 1:s1" in warnings[0])
+        self.assertTrue(numpy.isfinite(mapping[1]).all())
 
 
     def test_sensorseeg(self):
@@ -39,9 +39,13 @@ if __name__ == "__main__":
     from tvb.tests.library import setup_test_console_env
     setup_test_console_env()
 
+import os
+import shutil
+import tempfile
 import unittest
 import sys
 import numpy
+import scipy.sparse
 from tvb.datatypes import surfaces
 from tvb.tests.library.base_testcase import BaseTestCase
 
@@ -120,6 +124,159 @@ class SurfacesTest(BaseTestCase):
         self.assertEqual(0, holes.size)
 
 
+    def test_csr_sets(self):
+        sets = surfaces.CSRSets.from_pairs(numpy.array([0, 2, 0, 0]), numpy.array([3, 1, 1, 3]), 3)
+        self.assertEqual(list(sets), [frozenset([1, 3]), frozenset(), frozenset([1])])
+        self.assertEqual(sets[-1], frozenset([1]))
+        self.assertEqual(list(sets.counts), [2, 0, 1])
+        self.assertEqual(sets.to_sparse(4).toarray().sum(), 3)
+
+
+    def test_nth_ring(self):
+        dt = surfaces.Surface()
+        dt.vertices = numpy.array([[i, i % 2, 0] for i in range(6)]).astype(numpy.float64)
+        dt.triangles = numpy.array([[0, 1, 2], [1, 2, 3], [2, 3, 4], [3, 4, 5]])
+        dt.configure()
+        self.assertEqual(dt.nth_ring(0, neighbourhood=1), dt.vertex_neighbours[0])
+        self.assertEqual(dt.nth_ring(0), frozenset([3, 4]))
+        self.assertEqual(dt.nth_ring(0, contains=True), frozenset([1, 2, 3, 4]))
+        self.assertEqual(dt.nth_ring(0, neighbourhood=3), frozenset([5]))
+        self.assertEqual(dt.nth_ring(2), frozenset([5]))
+        # the adjacency matrix is built once
+        adjacency = dt._vertex_adjacency
+        dt.nth_ring(5)
+        self.assertTrue(dt._vertex_adjacency is adjacency)
+        self.assertEqual(dt.edges.tolist(), [[0, 1], [0, 2], [1, 2], [1, 3], [2, 3], [2, 4], [3, 4], [3, 5], [4, 5]])
+        self.assertTrue(all(v1 in dt.vertex_neighbours[v0] for v0, v1 in dt.edges))
+
+
+    def test_laplace_beltrami(self):
+        dt = surfaces.Surface()
+        dt.vertices = numpy.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1]]).astype(numpy.float64)
+        dt.triangles = numpy.array([[0, 2, 1], [0, 1, 3], [0, 3, 2], [1, 2, 3]])
+        dt.configure()
+        dt.compute_geodesic_distance_matrix(max_dist=10.0)
+
+        self.assertTrue(numpy.allclose(dt.laplace_beltrami(numpy.ones(4)), 0.0))
+        fv = numpy.array([1.0, 2.0, 0.0, -1.0])
+        gd = dt.geodesic_distance_matrix.toarray()
+        vertex_areas = numpy.array([dt.triangle_areas[list(tris)].sum() / 3.0 for tris in dt.vertex_triangles])
+        expected = [numpy.sum(numpy.exp(-gd[w] ** 2 / 4.0) * vertex_areas * (fv - fv[w])) / (4.0 * numpy.pi)
+                    for w in range(4)]
+        self.assertTrue(numpy.allclose(dt.laplace_beltrami(fv), expected))
+        self.assertTrue(dt.laplace_beltrami_operator() is dt.laplace_beltrami_operator(1.0))
+        both = dt.laplace_beltrami(numpy.c_[fv, 2 * fv])
+        self.assertTrue(numpy.allclose(both[:, 1], 2 * numpy.array(expected)))
+
+
+    def _grid(self, n=12):
+        "Triangulated, slightly curved n x n grid, and an isolated vertex."
+        x, y = numpy.meshgrid(numpy.arange(n), numpy.arange(n))
+        vertices = numpy.c_[x.ravel(), y.ravel(), numpy.sin(x.ravel() / 3.0)].astype(numpy.float64)
+        corners = (x[:-1, :-1] * 1 + y[:-1, :-1] * n).ravel()
+        triangles = numpy.r_[numpy.c_[corners, corners + 1, corners + n + 1],
+                             numpy.c_[corners, corners + n + 1, corners + n]]
+        return numpy.r_[vertices, [[n / 2.0, n / 2.0, 5.0]]], triangles.astype(numpy.int32)
+
+
+    def _local_gdist_matrix(self, vertices, triangles, max_dist):
+        "Geodesic distances within max_dist computed by gdist."
+        dist = surfaces.gdist.local_gdist_matrix(vertices, triangles, max_distance=max_dist)
+        dist.data[dist.data > max_dist] = 0.0
+        dist.eliminate_zeros()
+        return dist
+
+
+    def test_local_geodesic_distance_matrix(self):
+        vertices, triangles = self._grid()
+        expected = self._local_gdist_matrix(vertices, triangles, 3.0)
+        for processes in (1, 2, 5):
+            dist = surfaces.local_geodesic_distance_matrix(vertices, triangles, 3.0, processes=processes)
+            self.assertEqual(expected.shape, dist.shape)
+            self.assertEqual(expected.nnz, dist.nnz)
+            self.assertTrue(numpy.allclose(expected.toarray(), dist.toarray()))
+
+
+    def test_geodesic_distances(self):
+        dt = surfaces.Surface()
+        dt.vertices, dt.triangles = self._grid()
+        sources = numpy.array([0, 30, 77], dtype=numpy.int32)
+        for max_dist in (None, 3.0):
+            kwd = {} if max_dist is None else {'max_distance': max_dist}
+            expected = numpy.array([surfaces.gdist.compute_gdist(dt.vertices, dt.triangles, source_indices=sources[[k]],
+                                                                 **kwd) for k in range(3)]).T
+            for processes in (1, 2):
+                dist = dt.geodesic_distances(sources, max_dist=max_dist, processes=processes)
+                self.assertEqual((len(dt.vertices), 3), dist.shape)
+                # the distances to the unreached vertices are infinite
+                reached = numpy.isfinite(expected)
+                if max_dist is None:
+                    self.assertTrue(numpy.array_equal(expected, dist.toarray()))
+                else:
+                    self.assertEqual(reached.sum(), dist.nnz)
+                    self.assertTrue(numpy.allclose(expected[reached], dist.toarray()[reached]))
+
+
+    def test_geodesic_distance_cache(self):
+        vertices, triangles = self._grid()
+        expected = self._local_gdist_matrix(vertices, triangles, 3.0)
+        cache_dir = tempfile.mkdtemp()
+        try:
+            for disabled in (None, False, ""):
+                dist = surfaces.local_geodesic_distance_matrix(vertices, triangles, 3.0, cache_dir=disabled)
+                self.assertTrue(numpy.allclose(expected.toarray(), dist.toarray()))
+            # miss
+            dist = surfaces.local_geodesic_distance_matrix(vertices, triangles, 3.0, cache_dir=cache_dir)
+            self.assertTrue(numpy.allclose(expected.toarray(), dist.toarray()))
+            cached = os.listdir(cache_dir)
+            self.assertEqual(1, len(cached))
+            # hit, reading the cached matrix rather than solving again
+            scipy.sparse.save_npz(os.path.join(cache_dir, cached[0]), 2 * expected)
+            dist = surfaces.local_geodesic_distance_matrix(vertices, triangles, 3.0, cache_dir=cache_dir)
+            self.assertTrue(numpy.allclose(2 * expected.toarray(), dist.toarray()))
+            # another max_dist is another matrix
+            surfaces.local_geodesic_distance_matrix(vertices, triangles, 2.0, cache_dir=cache_dir)
+            self.assertEqual(2, len(os.listdir(cache_dir)))
+        finally:
+            shutil.rmtree(cache_dir)
+
+
+    def test_geodesic_distance_cache_written_concurrently(self):
+        vertices, triangles = self._grid()
+        expected = self._local_gdist_matrix(vertices, triangles, 3.0)
+        cache_dir = tempfile.mkdtemp()
+        rename = os.rename
+
+        def concurrent_rename(src, dst):
+            # as on Windows, when another job has written the cache meanwhile
+            shutil.copy(src, dst)
+            raise OSError("cannot rename %s to existing %s" % (src, dst))
+
+        try:
+            os.rename = concurrent_rename
+            dist = surfaces.local_geodesic_distance_matrix(vertices, triangles, 3.0, cache_dir=cache_dir)
+        finally:
+            os.rename = rename
+            cached = os.listdir(cache_dir)
+            shutil.rmtree(cache_dir)
+        self.assertTrue(numpy.allclose(expected.toarray(), dist.toarray()))
+        # the partial file is removed
+        self.assertEqual(1, len(cached))
+
+
+    def test_local_connectivity_processes(self):
+        surface = surfaces.CorticalSurface()
+        surface.vertices, surface.triangles = self._grid()
+        matrices = []
+        for processes in (1, 2):
+            dt = LocalConnectivity(surface=surface, cutoff=3.0)
+            dt.compute_sparse_matrix(processes=processes)
+            self.assertTrue(dt.matrix_gdist is None)
+            matrices.append(dt.matrix.toarray())
+        self.assertTrue(numpy.allclose(matrices[0], matrices[1]))
+        self.assertTrue(numpy.any(matrices[0]))
+
+
     def test_cortical_topology_isolated_vertex(self):
         dt = surfaces.Surface()
         dt.vertices = numpy.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1], [0, 0, 2]]).astype(numpy.float64)
@@ -80,13 +80,14 @@ if __name__ == "__main__":
         import tvb.simulator as sim
 
         SOURCE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(sim.__file__)))
-        COVERAGE = coverage(source=["tvb.basic", "tvb.datatypes", "tvb.simulator"],
+        COVERAGE = coverage(source=["tvb.analyzers", "tvb.basic", "tvb.datatypes", "tvb.simulator"],
                             omit=generate_excludes([SOURCE_DIR]), cover_pylib=False, branch=True)
         COVERAGE.start()
         ## This needs to be executed before any TVB import.
 
 import unittest
 import datetime
+from tvb.tests.library.analyzers import analyzers_test_main
 from tvb.tests.library.basic import basic_test_main
 from tvb.tests.library.datatypes import datatypes_test_main
 from tvb.tests.library.simulator import simulator_test_main
@@ -98,6 +99,7 @@ def suite():
     Gather all the tests in a test suite.
     """
     test_suite = unittest.TestSuite()
+    test_suite.addTest(analyzers_test_main.suite())
     test_suite.addTest(basic_test_main.suite())
     test_suite.addTest(datatypes_test_main.suite())
     test_suite.addTest(simulator_test_main.suite())
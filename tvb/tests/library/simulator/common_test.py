@@ -39,6 +39,9 @@ if __name__ == "__main__":
     from tvb.tests.library import setup_test_console_env
     setup_test_console_env()
     
+import os
+import shutil
+import tempfile
 import unittest
 import numpy
 from tvb.tests.library.base_testcase import BaseTestCase
@@ -97,6 +100,26 @@ class CommonTest(BaseTestCase):
             common._add_at(actual, map, source)
             self.assertTrue(numpy.allclose(expected, actual))
 
+    def test_replace_file(self):
+        directory = tempfile.mkdtemp()
+        src, dst = os.path.join(directory, 'src'), os.path.join(directory, 'dst')
+        os_name = os.name
+        try:
+            # also take the path of platforms where rename does not replace
+            for name in (os_name, 'nt'):
+                for path, content in ((src, name), (dst, 'old')):
+                    with open(path, 'w') as fd:
+                        fd.write(content)
+                os.name = name
+                common.replace_file(src, dst)
+                os.name = os_name
+                self.assertFalse(os.path.exists(src))
+                with open(dst) as fd:
+                    self.assertEqual(name, fd.read())
+        finally:
+            os.name = os_name
+            shutil.rmtree(directory)
+
     def setUp(self):
         pass
         
@@ -153,6 +153,86 @@ class CouplingTest(BaseTestCase):
         self._apply_coupling_2sv(k)
 
 
+def _sparse_history(n_node=10, n_cvar=2, n_mode=2):
+    "Random sparse history."
+    rng = numpy.random.RandomState(42)
+    weights = rng.uniform(size=(n_node, n_node)) * (rng.uniform(size=(n_node, n_node)) < 0.3)
+    delays = rng.randint(0, 5, size=(n_node, n_node))
+    history = SparseHistory(weights, delays, numpy.r_[:n_cvar], n_mode)
+    history.initialize(rng.randn(history.n_time, n_cvar, n_node, n_mode))
+    return history
+
+
+class NumbaCouplingTest(BaseTestCase):
+    """
+    Compare compiled implementations of sparse couplings against the NumPy ones.
+
+    """
+
+    def _check_numba(self, k):
+        history = _sparse_history()
+        k.configure()
+        for step in range(1, 10):
+            expected = k(step, history)
+            k.use_numba = True
+            actual = k(step, history)
+            k.use_numba = False
+            self.assertEqual(expected.shape, actual.shape)
+            self.assertTrue(numpy.allclose(expected, actual, rtol=1e-5, atol=1e-6))
+            history.update(step, numpy.random.randn(history.n_cvar, history.n_node, history.n_mode))
+
+    def test_linear(self):
+        self._check_numba(coupling.Linear(a=numpy.r_[0.1], b=numpy.r_[0.2]))
+
+    def test_scaling(self):
+        self._check_numba(coupling.Scaling(a=0.3))
+
+    def test_hyperbolic_tangent(self):
+        self._check_numba(coupling.HyperbolicTangent(midpoint=numpy.r_[0.1], sigma=numpy.r_[2.0]))
+
+    def test_difference(self):
+        self._check_numba(coupling.Difference())
+
+    def test_kuramoto(self):
+        self._check_numba(coupling.Kuramoto())
+
+    def test_output_reused(self):
+        history = _sparse_history()
+        k = coupling.Linear(use_numba=True)
+        k.configure()
+        first = k(1, history).copy()
+        second = k(2, history)
+        self.assertEqual(history.buffer.dtype, second.dtype)
+        self.assertTrue(k(1, history) is second)
+        self.assertTrue(numpy.allclose(first, second))
+
+    def test_parameters_set_recompile(self):
+        history = _sparse_history()
+        k = coupling.Linear(a=numpy.r_[0.1], use_numba=True)
+        k.configure()
+        first = k(1, history).copy()
+        k.a = numpy.r_[0.2]
+        self.assertTrue(numpy.allclose(2 * first, k(1, history)))
+
+    def test_missing_expressions_fall_back(self):
+        history = _sparse_history()
+        k = coupling.Linear(a=numpy.r_[0.1], use_numba=True)
+        k.configure()
+        k.pre_expr = None
+        self.assertTrue(k._numba_cfun(history) is None)
+        k.use_numba = False
+        expected = k(1, history)
+        k.use_numba = True
+        self.assertTrue(numpy.allclose(expected, k(1, history)))
+
+    def test_non_scalar_parameters_fall_back(self):
+        history = _sparse_history()
+        k = coupling.Linear(a=numpy.r_[0.1] * numpy.ones((history.n_node, 1)), use_numba=True)
+        k.configure()
+        self.assertTrue(k._numba_cfun(history) is None)
+        self.assertEqual((history.n_cvar, history.n_node, history.n_mode), k(1, history).shape)
+
+
 class CouplingShapeTest(BaseTestCase):
 
     def test_shape(self):
@@ -192,6 +272,7 @@ def suite():
     """
     test_suite = unittest.TestSuite()
     test_suite.addTest(unittest.makeSuite(CouplingTest))
+    test_suite.addTest(unittest.makeSuite(NumbaCouplingTest))
     test_suite.addTest(unittest.makeSuite(CouplingShapeTest))
     return test_suite
 
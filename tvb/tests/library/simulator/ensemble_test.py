@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Scientific Package. This package holds all simulators, and
+# analysers necessary to run brain-simulations. You can use it stand alone or
+# in conjunction with TheVirtualBrain-Framework Package. See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+
+"""
+Test ensemble simulations against separately run simulators.
+
+"""
+
+if __name__ == "__main__":
+    from tvb.tests.library import setup_test_console_env
+    setup_test_console_env()
+
+import numpy
+import unittest
+from tvb.datatypes.connectivity import Connectivity
+from tvb.simulator import coupling, integrators, models, monitors, noise, sinks
+from tvb.simulator.ensemble import EnsembleSimulator
+from tvb.simulator.history import EnsembleHistory
+from tvb.simulator.simulator import Simulator
+from tvb.tests.library.base_testcase import BaseTestCase
+
+
+
+class EnsembleSimulatorTest(BaseTestCase):
+
+    dt = 0.1
+    length = 20.0
+
+    def _initial_conditions(self, conn):
+        # long enough to cover the horizon of all speeds used, so no random padding occurs
+        rng = numpy.random.RandomState(42)
+        initial = rng.uniform(-1.0, 1.0, size=(1, 2, conn.weights.shape[0], 1))
+        return numpy.tile(initial, (2048, 1, 1, 1))
+
+    def _run_single(self, a, speed, model=None):
+        conn = Connectivity(load_default=True, speed=numpy.r_[speed])
+        sim = Simulator(connectivity=conn,
+                        coupling=coupling.Linear(a=numpy.r_[a]),
+                        model=model or models.Generic2dOscillator(),
+                        integrator=integrators.HeunDeterministic(dt=self.dt),
+                        initial_conditions=self._initial_conditions(conn),
+                        monitors=(monitors.Raw(), monitors.TemporalAverage(period=1.0)),
+                        simulation_length=self.length)
+        sim.configure()
+        return sim.run()
+
+    def test_ensemble_matches_single_simulations(self):
+        a_values, speeds = [0.0042, 0.0126, 0.0252], [2.0, 4.0, 10.0]
+        conn = Connectivity(load_default=True)
+        sim = EnsembleSimulator(connectivity=conn,
+                                coupling=coupling.Linear(),
+                                model=models.Generic2dOscillator(),
+                                integrator=integrators.HeunDeterministic(dt=self.dt),
+                                initial_conditions=self._initial_conditions(conn),
+                                monitors=(monitors.Raw(), monitors.TemporalAverage(period=1.0)),
+                                simulation_length=self.length,
+                                sweep={'coupling.a': a_values, 'connectivity.speed': speeds})
+        sim.configure()
+        self.assertTrue(isinstance(sim.history, EnsembleHistory))
+        self.assertEqual(3 * 76, sim.number_of_nodes)
+        (t_raw, raw), (t_tavg, tavg) = sim.run()
+        self.assertEqual((3, int(self.length / self.dt), 1, 76, 1), raw.shape)
+        for i, (a, speed) in enumerate(zip(a_values, speeds)):
+            (t_raw_i, raw_i), (t_tavg_i, tavg_i) = self._run_single(a, speed)
+            self.assertTrue(numpy.allclose(t_raw, t_raw_i))
+            self.assertTrue(numpy.allclose(raw[i], raw_i))
+            self.assertTrue(numpy.allclose(tavg[i], tavg_i))
+
+    def test_model_sweep_matches_single_simulations(self):
+        tau_values = [0.5, 1.0, 2.0]
+        conn = Connectivity(load_default=True)
+        sim = EnsembleSimulator(connectivity=conn,
+                                coupling=coupling.Linear(a=numpy.r_[0.0126]),
+                                model=models.Generic2dOscillator(),
+                                integrator=integrators.HeunDeterministic(dt=self.dt),
+                                initial_conditions=self._initial_conditions(conn),
+                                monitors=(monitors.Raw(), monitors.TemporalAverage(period=1.0)),
+                                simulation_length=self.length,
+                                sweep={'model.tau': tau_values})
+        sim.configure()
+        (_, raw), (_, tavg) = sim.run()
+        for i, tau in enumerate(tau_values):
+            (_, raw_i), (_, tavg_i) = self._run_single(0.0126, 3.0, models.Generic2dOscillator(tau=numpy.r_[tau]))
+            self.assertTrue(numpy.allclose(raw[i], raw_i))
+            self.assertTrue(numpy.allclose(tavg[i], tavg_i))
+
+    def test_noise_sweep(self):
+        nsig_values = [0.0, 1e-3, 0.0]
+        conn = Connectivity(load_default=True)
+        noise_ = noise.Additive(nsig=numpy.r_[1e-5])
+        noise_.random_stream.seed(42)
+        sim = EnsembleSimulator(connectivity=conn,
+                                coupling=coupling.Linear(a=numpy.r_[0.0126]),
+                                model=models.Generic2dOscillator(),
+                                integrator=integrators.HeunStochastic(dt=self.dt, noise=noise_),
+                                initial_conditions=self._initial_conditions(conn),
+                                monitors=(monitors.Raw(), monitors.TemporalAverage(period=1.0)),
+                                simulation_length=self.length,
+                                sweep={'integrator.noise.nsig': nsig_values})
+        sim.configure()
+        self.assertEqual((2, 3 * 76, 1), sim.integrator.noise.nsig.shape)
+        (_, raw), (_, tavg) = sim.run()
+        # without noise, instances follow the deterministic single simulation,
+        (_, raw_det), (_, tavg_det) = self._run_single(0.0126, 3.0)
+        for i in (0, 2):
+            self.assertTrue(numpy.allclose(raw[i], raw_det))
+            self.assertTrue(numpy.allclose(tavg[i], tavg_det))
+        # while the noisy instance does not
+        self.assertFalse(numpy.allclose(raw[1], raw_det))
+
+    def test_empty_sink_output(self):
+        conn = Connectivity(load_default=True)
+        tavg = monitors.TemporalAverage(period=10.0)
+        tavg.sink = sinks.RingSink(8)
+        sim = EnsembleSimulator(connectivity=conn,
+                                coupling=coupling.Linear(),
+                                monitors=(monitors.Raw(), tavg),
+                                simulation_length=1.0,
+                                sweep={'coupling.a': [0.1, 0.2]})
+        sim.configure()
+        (_, raw), (t_tavg, tavg_data) = sim.run()
+        self.assertEqual(2, raw.shape[0])
+        self.assertEqual((0, ), t_tavg.shape)
+        self.assertEqual((0, ), tavg_data.shape)
+
+    def test_sweep_lengths_must_match(self):
+        sim = EnsembleSimulator(connectivity=Connectivity(load_default=True),
+                                sweep={'coupling.a': [0.1, 0.2], 'model.a': [1.0]})
+        self.assertRaises(ValueError, sim.configure)
+
+    def test_mixing_monitor_rejected(self):
+        sim = EnsembleSimulator(connectivity=Connectivity(load_default=True),
+                                monitors=(monitors.GlobalAverage(), ),
+                                sweep={'coupling.a': [0.1, 0.2]})
+        self.assertRaises(ValueError, sim.configure)
+
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(EnsembleSimulatorTest))
+    return test_suite
+
+
+
+if __name__ == "__main__":
+    #So you can run tests from this package individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)
@@ -44,6 +44,7 @@ import unittest
 import tvb.basic.traits.types_basic as basic
 from tvb.datatypes.connectivity import Connectivity
 from tvb.simulator.coupling import Coupling
+from tvb.simulator.history import SparseHistory, MemmapHistory
 from tvb.simulator.integrators import Identity
 from tvb.simulator.models import Model
 from tvb.simulator.monitors import Raw
@@ -121,12 +122,43 @@ class ExactPropagationTests(BaseTestCase):
 
 
 
+class MemmapHistoryTests(BaseTestCase):
+
+    def build_histories(self, n_hot):
+        rng = numpy.random.RandomState(42)
+        n, n_time = 8, 12
+        weights = rng.uniform(size=(n, n)) * (rng.uniform(size=(n, n)) > 0.5)
+        delays = rng.randint(1, n_time, size=(n, n))
+        delays[0, 1] = n_time - 1
+        cvars = numpy.r_[0, 1]
+        histories = SparseHistory(weights, delays, cvars, 2), MemmapHistory(weights, delays, cvars, 2, n_hot=n_hot)
+        init = rng.uniform(size=(n_time, 3, n, 2))
+        for history in histories:
+            history.initialize(init)
+        return rng, histories
+
+    def test_query_sparse(self):
+        rng, (sparse, memmap) = self.build_histories(n_hot=4)
+        for step in range(5, 40):
+            for expected, actual in zip(sparse.query_sparse(step), memmap.query_sparse(step)):
+                self.assertTrue(numpy.allclose(expected, actual))
+            state = rng.uniform(size=(3, 8, 2))
+            sparse.update(step, state)
+            memmap.update(step, state)
+
+    def test_nbytes_excludes_buffer(self):
+        _, (sparse, memmap) = self.build_histories(n_hot=2)
+        self.assertLess(memmap.nbytes, sparse.nbytes)
+
+
+
 def suite():
     """
     Gather all the tests in a test suite.
     """
     test_suite = unittest.TestSuite()
     test_suite.addTest(unittest.makeSuite(ExactPropagationTests))
+    test_suite.addTest(unittest.makeSuite(MemmapHistoryTests))
     return test_suite
 
 
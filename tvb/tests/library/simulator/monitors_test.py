@@ -44,7 +44,7 @@ if __name__ == "__main__":
     from tvb.tests.library import setup_test_console_env
     setup_test_console_env()
 
-from tvb.datatypes import sensors
+from tvb.datatypes import sensors, equations
 from tvb.simulator import monitors, models, coupling, integrators, noise, simulator
 from tvb.basic.logger.builder import get_logger
 from tvb.tests.library.base_testcase import BaseTestCase
@@ -130,6 +130,40 @@ class MonitorsConfigurationTest(BaseTestCase):
         self.assertEqual(monitor.period, 2000.0)
 
 
+class BoldTest(BaseTestCase):
+    "Test streaming HRF convolution against the former stock & roll implementation."
+
+    def _reference_bold(self, monitor, raw, first_step):
+        n_interim, n_stock = monitor._interim_istep, monitor._stock_steps
+        hrf = monitor.hemodynamic_response_function
+        interim = numpy.zeros((n_interim, ) + raw.shape[1:])
+        stock = numpy.zeros((n_stock, ) + raw.shape[1:])
+        bold = []
+        for step, state in enumerate(raw, first_step):
+            interim[step % n_interim - 1] = state
+            if step % n_interim == 0:
+                stock[step // n_interim % n_stock - 1] = interim.mean(axis=0)
+            if step % monitor.istep == 0:
+                rolled_hrf = numpy.roll(hrf, step // n_interim % n_stock - 1, axis=1)
+                bold.append(numpy.dot(rolled_hrf, stock.transpose((1, 2, 0, 3))).reshape(stock.shape[1:]))
+        return numpy.array(bold)
+
+    def test_bold_convolution(self):
+        for dt, period in ((0.5, 500.0), (0.3, 1000.0)):
+            numpy.random.seed(42)
+            sim = simulator.Simulator(
+                connectivity=connectivity.Connectivity(load_default=True),
+                coupling=coupling.Linear(a=numpy.r_[0.0126]),
+                integrator=integrators.HeunDeterministic(dt=dt),
+                monitors=(monitors.Raw(), monitors.Bold(period=period, hrf_kernel=equations.Gamma()))
+            ).configure()
+            first_step = sim.current_step + 1
+            (_, raw), (_, bold) = sim.run(simulation_length=8000.0)
+            expected = self._reference_bold(sim.monitors[1], raw, first_step)
+            self.assertEqual(expected.shape, bold.shape)
+            self.assertTrue(numpy.allclose(expected, bold))
+
+
 class SubcorticalProjectionTest(BaseTestCase):
     """
     Cortical surface with subcortical regions, sEEG, EEG & MEG, using a stochastic
@@ -217,6 +251,48 @@ class AllAnalyticWithSubcortical(BaseTestCase):
         self.assertEqual(self.sim.connectivity.number_of_regions, n_reg)
 
 
+class ProjectionGainTest(BaseTestCase):
+    "Test projection of temporally averaged source activity, with exact and low rank gain."
+
+    def _run(self, gain_tolerance, precision='float64'):
+        numpy.random.seed(42)
+        sim = simulator.Simulator(
+            connectivity=connectivity.Connectivity.from_file('connectivity_192.zip'),
+            integrator=integrators.HeunDeterministic(dt=2 ** -4),
+            monitors=(monitors.Raw(),
+                      monitors.iEEG(sensors=SensorsInternal(load_default=True),
+                                    region_mapping=RegionMapping.from_file('regionMapping_16k_192.txt'),
+                                    period=1.0, gain_tolerance=gain_tolerance)),
+            precision=precision
+        ).configure()
+        (_, raw), (_, ieeg) = sim.run(simulation_length=10.0)
+        return sim.monitors[1], raw, ieeg
+
+    def test_exact_gain(self):
+        monitor, raw, ieeg = self._run(0.0)
+        self.assertTrue(monitor._gain_factors is None)
+        # the gain commutes with the temporal average of each period
+        expected = numpy.array([monitor.gain.dot(period.mean(axis=0)[0, :, 0]) for period in raw.reshape((10, 16) + raw.shape[1:])])
+        self.assertTrue(numpy.allclose(expected, ieeg[:, 0, :, 0]))
+
+    def test_low_rank_gain(self):
+        monitor, _, ieeg = self._run(1e-3)
+        left, right = monitor._gain_factors
+        self.assertLess(left.shape[1], min(monitor.gain.shape))
+        approx = left.dot(right)
+        self.assertLess(numpy.linalg.norm(approx - monitor.gain) / numpy.linalg.norm(monitor.gain), 1e-3)
+        _, _, exact = self._run(0.0)
+        self.assertLess(numpy.linalg.norm(ieeg - exact) / numpy.linalg.norm(exact), 1e-2)
+
+    def test_float32(self):
+        _, _, exact = self._run(0.0)
+        for gain_tolerance in (0.0, 1e-3):
+            monitor, _, ieeg = self._run(gain_tolerance, 'float32')
+            self.assertEqual(numpy.float32, monitor._state.dtype)
+            self.assertEqual(numpy.float32, ieeg.dtype)
+            self.assertLess(numpy.linalg.norm(ieeg - exact) / numpy.linalg.norm(exact), 1e-2)
+
+
 class NoSubCorticalProjection(SubcorticalProjectionTest):
     "Idem. but with 76 region connectivity"
     n_regions = 76
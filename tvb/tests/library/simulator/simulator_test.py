@@ -45,11 +45,16 @@ if True or __name__ == "__main__":
     from tvb.tests.library import setup_test_console_env
     setup_test_console_env()
 
+import os
+import shutil
+import tempfile
 import numpy
 import unittest
 import itertools
 from tvb.simulator.common import get_logger
 from tvb.simulator import simulator, models, coupling, integrators, monitors, noise
+from tvb.simulator.history import MemmapHistory
+from tvb.datatypes import equations, patterns
 from tvb.datatypes.connectivity import Connectivity
 from tvb.datatypes.cortex import Cortex
 from tvb.datatypes.local_connectivity import LocalConnectivity
@@ -190,6 +195,122 @@ class SimulatorTest(BaseTestCase):
             LOG.debug("Surface simulation finished for defaultConnectivity= %s" % str(default_connectivity))
 
 
+    def test_float32_precision(self):
+        """
+        Single precision simulations must stay in float32 and follow double precision trajectories.
+        """
+        for model_class in (models.Generic2dOscillator, models.ReducedWongWang, models.Epileptor, models.Kuramoto):
+            data = {}
+            for precision in ('float64', 'float32'):
+                model = model_class()
+                initial = model.initial(2 ** -4, (1, model.nvar, 76, 1), numpy.random.RandomState(42))
+                sim = simulator.Simulator(connectivity=Connectivity(load_default=True, speed=numpy.r_[4.0]),
+                                          model=model,
+                                          coupling=coupling.Linear(a=numpy.r_[0.0126]),
+                                          integrator=integrators.HeunDeterministic(dt=2 ** -4),
+                                          initial_conditions=numpy.tile(initial, (1024, 1, 1, 1)),
+                                          monitors=(monitors.Raw(), monitors.TemporalAverage(period=1.0)),
+                                          precision=precision)
+                sim.configure()
+                (_, raw), (_, tavg) = sim.run(simulation_length=20.0)
+                self.assertEqual(numpy.dtype(precision), raw.dtype)
+                self.assertEqual(numpy.dtype(precision), tavg.dtype)
+                data[precision] = tavg
+            error = numpy.abs(data['float64'] - data['float32']).max() / numpy.abs(data['float64']).max()
+            self.assertLess(error, 1e-4, model_class.__name__)
+
+    def test_float32_precision_stochastic(self):
+        """
+        Single precision must also hold for additive white and coloured noise.
+        """
+        for ntau in (0.0, 1.0):
+            data = {}
+            for precision in ('float64', 'float32'):
+                model = models.Generic2dOscillator()
+                initial = model.initial(2 ** -4, (1, model.nvar, 76, 1), numpy.random.RandomState(42))
+                noise_ = noise.Additive(nsig=numpy.r_[1e-4], ntau=ntau)
+                noise_.random_stream.seed(42)
+                sim = simulator.Simulator(connectivity=Connectivity(load_default=True, speed=numpy.r_[4.0]),
+                                          model=model,
+                                          coupling=coupling.Linear(a=numpy.r_[0.0126]),
+                                          integrator=integrators.HeunStochastic(dt=2 ** -4, noise=noise_),
+                                          initial_conditions=numpy.tile(initial, (1024, 1, 1, 1)),
+                                          monitors=(monitors.Raw(), monitors.TemporalAverage(period=1.0)),
+                                          precision=precision)
+                sim.configure()
+                (_, raw), (_, tavg) = sim.run(simulation_length=20.0)
+                self.assertEqual(numpy.dtype(precision), raw.dtype)
+                self.assertEqual(numpy.dtype(precision), tavg.dtype)
+                data[precision] = tavg
+            error = numpy.abs(data['float64'] - data['float32']).max() / numpy.abs(data['float64']).max()
+            self.assertLess(error, 1e-4, "ntau=%s" % ntau)
+
+    def test_unsupported_precision(self):
+        sim = simulator.Simulator(connectivity=Connectivity(load_default=True), precision='float16')
+        self.assertRaises(ValueError, sim.configure)
+
+    def _history_simulator(self, initial, history_on_disk):
+        sim = simulator.Simulator(connectivity=Connectivity(load_default=True, speed=numpy.r_[4.0]),
+                                  coupling=coupling.Linear(a=numpy.r_[0.0126]),
+                                  integrator=integrators.HeunDeterministic(dt=2 ** -4),
+                                  initial_conditions=initial,
+                                  monitors=(monitors.Raw(), ),
+                                  history_on_disk=history_on_disk)
+        # write the memory-mapped initial history in blocks of 7 steps
+        sim._history_block_nbytes = 7 * 2 * 76 * 8
+        return sim.configure()
+
+    def test_history_on_disk(self):
+        """
+        The memory-mapped history, filled block by block, must hold the initial conditions.
+        """
+        initial = numpy.random.RandomState(42).uniform(-1.0, 1.0, size=(1024, 2, 76, 1))
+        (_, raw), = self._history_simulator(initial, False).run(simulation_length=10.0)
+        sim = self._history_simulator(initial, True)
+        self.assertTrue(isinstance(sim.history, MemmapHistory))
+        self.assertTrue(numpy.allclose(initial[-sim.horizon:, sim.model.cvar], sim.history.buffer))
+        (_, raw_), = sim.run(simulation_length=10.0)
+        self.assertTrue(numpy.allclose(raw, raw_))
+        # shorter initial conditions are padded with model.initial
+        sim = self._history_simulator(initial[:10], True)
+        self.assertTrue(numpy.allclose(initial[9], sim.current_state))
+        self.assertTrue(numpy.allclose(initial[:10, sim.model.cvar], sim.history.buffer[:10]))
+
+    def _checkpoint_simulator(self):
+        conn = Connectivity(load_default=True, speed=numpy.r_[4.0])
+        conn.configure()
+        stimulus = patterns.StimuliRegion(connectivity=conn,
+                                          temporal=equations.PulseTrain(parameters={'T': 8.0, 'tau': 2.0,
+                                                                                    'amp': 1.0, 'onset': 5.0}),
+                                          weight=numpy.random.RandomState(42).uniform(size=76))
+        sim = simulator.Simulator(connectivity=conn,
+                                  coupling=coupling.Linear(a=numpy.r_[0.0126]),
+                                  integrator=integrators.HeunStochastic(
+                                      dt=2 ** -4, noise=noise.Additive(nsig=numpy.r_[1e-4], ntau=1.0)),
+                                  stimulus=stimulus,
+                                  monitors=(monitors.Raw(), monitors.TemporalAverage(period=1.0)))
+        return sim.configure()
+
+    def test_checkpoint_restore(self):
+        """
+        Continuing from a checkpoint must reproduce the uninterrupted simulation exactly.
+        """
+        (raw_t, raw), (tavg_t, tavg) = self._checkpoint_simulator().run(simulation_length=40.0)
+        path = os.path.join(tempfile.mkdtemp(), 'checkpoint.npz')
+        try:
+            # checkpoints at 15.25 ms and 30.5 ms, with a partially filled temporal average stock
+            self._checkpoint_simulator().run(simulation_length=40.0, checkpoint_path=path, checkpoint_period=15.25)
+            sim = self._checkpoint_simulator()
+            sim.restore(path)
+            (raw_t_, raw_), (tavg_t_, tavg_) = sim.run(simulation_length=9.5)
+        finally:
+            shutil.rmtree(os.path.dirname(path))
+        self.assertTrue(numpy.array_equal(raw_t[-raw_.shape[0]:], raw_t_))
+        self.assertTrue(numpy.array_equal(raw[-raw_.shape[0]:], raw_))
+        self.assertTrue(numpy.array_equal(tavg_t[-tavg_.shape[0]:], tavg_t_))
+        self.assertTrue(numpy.array_equal(tavg[-tavg_.shape[0]:], tavg_))
+
+
 
 def suite():
     """
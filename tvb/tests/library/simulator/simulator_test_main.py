@@ -45,11 +45,13 @@ if __name__ == "__main__":
 import unittest
 from tvb.tests.library.simulator import common_test
 from tvb.tests.library.simulator import coupling_test
+from tvb.tests.library.simulator import ensemble_test
 from tvb.tests.library.simulator import integrators_test
 from tvb.tests.library.simulator import models_test
 from tvb.tests.library.simulator import monitors_test
 from tvb.tests.library.simulator import noise_test
 from tvb.tests.library.simulator import simulator_test
+from tvb.tests.library.simulator import sinks_test
 from tvb.tests.library.simulator import region_boundaries_test
 from tvb.tests.library.simulator import history_test
 
@@ -61,6 +63,7 @@ def suite():
     test_suite = unittest.TestSuite()
     test_suite.addTest(common_test.suite())
     test_suite.addTest(coupling_test.suite())
+    test_suite.addTest(ensemble_test.suite())
     test_suite.addTest(integrators_test.suite())
     test_suite.addTest(history_test.suite())
     test_suite.addTest(models_test.suite())
@@ -68,6 +71,7 @@ def suite():
     test_suite.addTest(noise_test.suite())
     test_suite.addTest(region_boundaries_test.suite())
     test_suite.addTest(simulator_test.suite())
+    test_suite.addTest(sinks_test.suite())
 
     return test_suite
 
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+#
+#
+# TheVirtualBrain-Framework Package. This package holds all Data Management, and
+# Web-UI helpful to run brain-simulations. To use it, you also need do download
+# TheVirtualBrain-Scientific Package (for simulators). See content of the
+# documentation-folder for more details. See also http://www.thevirtualbrain.org
+#
+# (c) 2012-2017, Baycrest Centre for Geriatric Care ("Baycrest") and others
+#
+# This program is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software Foundation,
+# either version 3 of the License, or (at your option) any later version.
+# This program is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A
+# PARTICULAR PURPOSE.  See the GNU General Public License for more details.
+# You should have received a copy of the GNU General Public License along with this
+# program.  If not, see <http://www.gnu.org/licenses/>.
+#
+#
+# CITATION:
+# When using The Virtual Brain for scientific publications, please cite it as follows:
+#
+#   Paula Sanz Leon, Stuart A. Knock, M. Marmaduke Woodman, Lia Domide,
+#   Jochen Mersmann, Anthony R. McIntosh, Viktor Jirsa (2013)
+#       The Virtual Brain: a simulator of primate brain network dynamics.
+#   Frontiers in Neuroinformatics (7:10. doi: 10.3389/fninf.2013.00010)
+#
+#
+
+"""
+Test monitor sinks against output collected by Simulator.run.
+
+"""
+
+if __name__ == "__main__":
+    from tvb.tests.library import setup_test_console_env
+    setup_test_console_env()
+
+import os
+import shutil
+import tempfile
+import numpy
+import unittest
+from tvb.datatypes.connectivity import Connectivity
+from tvb.simulator import coupling, integrators, monitors, sinks
+from tvb.simulator.simulator import Simulator
+from tvb.tests.library.base_testcase import BaseTestCase
+
+
+
+class SinksTest(BaseTestCase):
+
+    def setUp(self):
+        super(SinksTest, self).setUp()
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _run(self, sink=None):
+        conn = Connectivity(load_default=True, speed=numpy.r_[4.0])
+        initial = numpy.random.RandomState(42).uniform(-1.0, 1.0, size=(1, 2, 76, 1))
+        tavg = monitors.TemporalAverage(period=1.0)
+        tavg.sink = sink
+        sim = Simulator(connectivity=conn,
+                        coupling=coupling.Linear(a=numpy.r_[0.0126]),
+                        integrator=integrators.HeunDeterministic(dt=2 ** -4),
+                        initial_conditions=numpy.tile(initial, (1024, 1, 1, 1)),
+                        monitors=(monitors.Raw(), tavg))
+        sim.configure()
+        (raw_t, raw), (t, x) = sim.run(simulation_length=100.0)
+        self.assertEqual(1600, raw.shape[0])
+        return numpy.array(t), numpy.array(x)
+
+    def _assert_same(self, expected, actual):
+        for expected_i, actual_i in zip(expected, actual):
+            self.assertEqual(expected_i.shape, actual_i.shape)
+            self.assertTrue(numpy.allclose(expected_i, actual_i))
+
+    def test_h5_sink(self):
+        expected = self._run()
+        sink = sinks.H5Sink(os.path.join(self.tmp_dir, 'tavg.h5'), chunk_size=16)
+        self._assert_same(expected, self._run(sink))
+        sink.close()
+        self._assert_same(expected, [numpy.array(ary) for ary in sink.read()])
+        sink.close()
+
+    def test_npy_sink(self):
+        expected = self._run()
+        prefix = os.path.join(self.tmp_dir, 'tavg')
+        sink = sinks.NpySink(prefix, chunk_size=16)
+        self._assert_same(expected, self._run(sink))
+        sink.close()
+        self._assert_same(expected, (numpy.load(prefix + '_time.npy'), numpy.load(prefix + '_data.npy')))
+
+    def _check_append_after_close(self, sink):
+        rng = numpy.random.RandomState(42)
+        t, x = numpy.r_[:11.0], rng.randn(11, 3, 2)
+        for i in range(6):
+            sink.append(t[i], x[i])
+        self._assert_same((t[:6], x[:6]), [numpy.array(ary) for ary in sink.read()])
+        sink.close()
+        self._assert_same((t[:6], x[:6]), [numpy.array(ary) for ary in sink.read()])
+        for i in range(6, 11):
+            sink.append(t[i], x[i])
+        sink.close()
+        self._assert_same((t, x), [numpy.array(ary) for ary in sink.read()])
+        sink.close()
+
+    def test_h5_sink_append_after_close(self):
+        self._check_append_after_close(sinks.H5Sink(os.path.join(self.tmp_dir, 'tavg.h5'), chunk_size=4))
+
+    def test_npy_sink_append_after_close(self):
+        self._check_append_after_close(sinks.NpySink(os.path.join(self.tmp_dir, 'tavg'), chunk_size=4))
+
+    def test_run_closes_sink(self):
+        expected = self._run()
+        filename = os.path.join(self.tmp_dir, 'tavg.h5')
+        sink = sinks.H5Sink(filename, chunk_size=1000)
+        self._run(sink)
+        self.assertTrue(sink._file is None)
+        with sinks.h5py.File(filename, 'r') as h5:
+            self._assert_same(expected, (h5['time'][:], h5['data'][:]))
+        sink.close()
+
+    def test_ring_sink(self):
+        t, x = self._run()
+        self._assert_same((t[-30:], x[-30:]), self._run(sinks.RingSink(30)))
+
+
+
+def suite():
+    """
+    Gather all the tests in a test suite.
+    """
+    test_suite = unittest.TestSuite()
+    test_suite.addTest(unittest.makeSuite(SinksTest))
+    return test_suite
+
+
+
+if __name__ == "__main__":
+    #So you can run tests from this package individually.
+    TEST_RUNNER = unittest.TextTestRunner()
+    TEST_SUITE = suite()
+    TEST_RUNNER.run(TEST_SUITE)